@@ -0,0 +1 @@
+"""Offline benchmarks for the parser and scraper hot paths."""
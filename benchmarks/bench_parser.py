@@ -0,0 +1,46 @@
+"""Compare the parser backends on large pages.
+
+Run with ``python -m benchmarks.bench_parser``.
+"""
+
+import argparse
+import logging
+import time
+
+from src.backend.parser import parse_trending_html
+
+from .corpus import page_of_size
+
+def best_of(repeat: int, fn, *args):
+    """Return the fastest wall time over ``repeat`` runs and the last result."""
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(*args)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="0.5,2,5", help="Page sizes in MB")
+    parser.add_argument("--rows", type=int, default=500, help="Trend rows per page")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per measurement")
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    backends = ("bs4", "lxml", "stream")
+    print(f"{'size':>8}" + "".join(f"{b + ' (ms)':>13}" for b in backends) + f"{'lxml speedup':>14}")
+    for size in (float(s) for s in args.sizes.split(",")):
+        html = page_of_size(size, rows=args.rows)
+        times = {}
+        results = {}
+        for backend in backends:
+            times[backend], results[backend] = best_of(args.repeat, parse_trending_html, html, backend)
+        if any(results[b] != results["bs4"] for b in backends):
+            raise SystemExit(f"Backends disagree on the {size} MB page")
+        print(f"{len(html) / 1e6:>6.1f}MB" + "".join(f"{times[b] * 1000:>13.1f}" for b in backends)
+              + f"{times['bs4'] / times['lxml']:>13.1f}x")
+
+if __name__ == "__main__":
+    main()
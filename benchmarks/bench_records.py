@@ -0,0 +1,81 @@
+"""Memory and time per history point and per trend: pydantic models versus compact records.
+
+Reads the same recorded points both ways, and builds the same scraped
+topics both ways, reporting the Python heap they hold once materialized
+as measured by tracemalloc, and the time to serialize a whole response.
+Run with ``python -m benchmarks.bench_records``.
+"""
+
+import argparse
+import gc
+import random
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+
+from src.backend.history import HistoryStore
+from src.backend.models import Trend, TrendsResponse
+from src.backend.records import TrendRecord, TrendSnapshot
+
+from .corpus import make_title
+from .suite_history import fill_history
+
+def measure(read):
+    """Seconds to materialize every point and the bytes they keep alive."""
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    points = list(read())
+    elapsed = time.perf_counter() - start
+    held, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return len(points), elapsed, held
+
+def scraped_fields(count: int, seed: int = 0):
+    """Field values of ``count`` topics as a parser produces them."""
+    rng = random.Random(seed)
+    return [
+        dict(title=make_title(rng), ranking=rank, search_volume="20K+", change_percentage="+150%",
+             search_volume_min=20000, change_percent=150.0, url="https://trends.google.com/trends/explore")
+        for rank in range(1, count + 1)
+    ]
+
+def serialize_ms(dump, repeat: int = 5) -> float:
+    """Best of ``repeat`` runs of ``dump``, in milliseconds."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        dump()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--snapshots", type=int, default=4000, help="Recorded fetches")
+    parser.add_argument("--trends", type=int, default=50, help="Trends per fetch")
+    parser.add_argument("--topics", type=int, default=100_000, help="Scraped topics built per form")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        store = HistoryStore(str(Path(directory) / "history.sqlite3"))
+        fill_history(store, args.snapshots, args.trends)
+        print(f"{'form':<14} {'points':>8} {'bytes/point':>12} {'us/point':>9}")
+        for name, read in (("HistoryPoint", store.iter_points), ("PointRecord", store.iter_records)):
+            count, elapsed, held = measure(read)
+            print(f"{name:<14} {count:>8} {held / count:>12.0f} {elapsed / count * 1e6:>9.2f}")
+        store.close()
+
+    fields = scraped_fields(args.topics)
+    print(f"\n{'form':<14} {'topics':>8} {'bytes/topic':>12} {'us/topic':>9} {'json ms':>8}")
+    for name, trend, response in (("Trend", Trend, TrendsResponse), ("TrendRecord", TrendRecord, TrendSnapshot)):
+        count, elapsed, held = measure(lambda: (trend(**values) for values in fields))
+        topics = [trend(**values) for values in fields]
+        whole = response(topics=topics, source_url="https://trends.google.com/trending", timestamp=datetime.now(),
+                         total_trends=len(topics), location="US", language="en")
+        dump = whole.model_dump_json if response is TrendsResponse else whole.to_json
+        print(f"{name:<14} {count:>8} {held / count:>12.0f} {elapsed / count * 1e6:>9.2f} {serialize_ms(dump):>8.1f}")
+
+if __name__ == "__main__":
+    main()
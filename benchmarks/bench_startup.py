@@ -0,0 +1,82 @@
+"""Cold start time of the CLI and which modules it pulls in.
+
+Every measurement runs in a fresh interpreter. ``python -X importtime``
+attributes the import time to modules; the check fails when a module
+that should only load on first use is imported at startup, or when
+startup exceeds ``--max-ms``. Run with ``python -m benchmarks.bench_startup``.
+"""
+
+import argparse
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# What each entry point may not import until a command actually needs it
+TARGETS = {
+    "src.backend.cli": ("selenium", "webdriver_manager", "fastapi", "starlette", "uvicorn", "bs4", "soupsieve", "httpx"),
+    "src.backend.scraper": ("selenium", "webdriver_manager", "fastapi", "uvicorn", "bs4", "soupsieve", "httpx"),
+    "src.backend.api": ("selenium", "webdriver_manager", "uvicorn"),
+}
+
+def import_seconds(module: str) -> float:
+    """Wall time of a fresh interpreter that only imports ``module``."""
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-c", f"import {module}"], cwd=ROOT, check=True, capture_output=True)
+    return time.perf_counter() - start
+
+def importtime(module: str) -> Dict[str, Tuple[int, int]]:
+    """``{module: (self_us, cumulative_us)}`` from ``python -X importtime``."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, check=True, capture_output=True, text=True,
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        times[name.strip()] = (int(self_us), int(cumulative_us))
+    return times
+
+def top_level(times: Dict[str, Tuple[int, int]]) -> Dict[str, int]:
+    """Cumulative microseconds per top-level package."""
+    packages: Dict[str, int] = {}
+    for name, (self_us, _) in times.items():
+        package = name.split(".")[0]
+        packages[package] = packages.get(package, 0) + self_us
+    return packages
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5, help="Fresh interpreters per entry point")
+    parser.add_argument("--top", type=int, default=8, help="Packages listed per entry point")
+    parser.add_argument("--max-ms", type=float, help="Fail when importing the CLI takes longer than this")
+    args = parser.parse_args()
+
+    failures: List[str] = []
+    for module, forbidden in TARGETS.items():
+        seconds = [import_seconds(module) for _ in range(args.repeat)]
+        times = importtime(module)
+        median_ms = statistics.median(seconds) * 1000
+        print(f"{module}: median {median_ms:.0f}ms over {args.repeat} runs, "
+              f"{times[module][1] / 1000:.0f}ms importing")
+        for package, us in sorted(top_level(times).items(), key=lambda item: -item[1])[:args.top]:
+            print(f"  {package:<24} {us / 1000:>7.1f}ms")
+        loaded = [name for name in forbidden if name in times]
+        if loaded:
+            failures.append(f"{module} imports {', '.join(loaded)} at startup")
+        if args.max_ms is not None and module == "src.backend.cli" and median_ms > args.max_ms:
+            failures.append(f"{module} took {median_ms:.0f}ms, more than {args.max_ms:.0f}ms")
+
+    for failure in failures:
+        print(f"REGRESSION {failure}")
+    if failures:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+"""Peak memory of whole-document versus streaming table extraction.
+
+Each measurement runs in a fresh interpreter and reports its peak RSS,
+which includes libxml2's allocations that tracemalloc cannot see.
+Run with ``python -m benchmarks.bench_stream``.
+"""
+
+import argparse
+import subprocess
+import sys
+
+MEASURE = """
+import logging, resource
+logging.disable(logging.INFO)
+from benchmarks.corpus import iter_trending_page
+from src.backend.lxml_parser import parse_table_html
+from src.backend.stream_parser import iter_table_trends
+chunks = iter_trending_page({rows}, padding_kb={padding_kb})
+if "{mode}" == "stream":
+    count = sum(1 for _ in iter_table_trends(chunks))
+else:
+    count = len(parse_table_html("".join(chunks)))
+print(count, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss // 1024)
+"""
+
+def measure(mode: str, rows: int, padding_kb: int):
+    code = MEASURE.format(mode=mode, rows=rows, padding_kb=padding_kb)
+    output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True).stdout
+    count, peak_mb = output.split()
+    return int(count), int(peak_mb)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="5,20,50", help="Page sizes in MB")
+    parser.add_argument("--rows", type=int, default=2000, help="Trend rows per page")
+    args = parser.parse_args()
+
+    print(f"{'size':>6} {'rows':>6} {'dom peak':>10} {'stream peak':>12}")
+    for size in (float(s) for s in args.sizes.split(",")):
+        padding_kb = int(size * 1024)
+        dom_rows, dom_peak = measure("dom", args.rows, padding_kb)
+        stream_rows, stream_peak = measure("stream", args.rows, padding_kb)
+        if dom_rows != stream_rows:
+            raise SystemExit(f"Extractors disagree on the {size} MB page")
+        print(f"{size:>4.0f}MB {stream_rows:>6} {dom_peak:>8}MB {stream_peak:>10}MB")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+"""Synthetic Google Trends pages that mimic the structure of rendered pages."""
+
+import random
+from typing import Iterator
+
+ROW_TEMPLATE = """<tr jsname="oKdM2c" class="enOdEe-wZVHld-xMbwt" data-row-id="{rank}">
+<td class="enOdEe-wZVHld-aOtOmf"><div class="checkbox"></div></td>
+<td class="enOdEe-wZVHld-aOtOmf jvkLtd"><div class="mZ3RIc">{title}</div>
+<div class="Rz4wf"><div class="vdw3Ld">{volume_short} searches</div><div class="UQ6yUb">&middot; {hours}h ago</div></div></td>
+<td class="enOdEe-wZVHld-aOtOmf dQOTjf"><div class="lqv0Cb">{volume_short}</div>
+<div class="wqrjjc"><div class="TXt85b">{change}</div><i class="material-icons">arrow_upward</i></div></td>
+<td class="enOdEe-wZVHld-aOtOmf WirRge"><div class="vdw3Ld">{hours} hours ago</div><div class="UQ6yUb">Active</div></td>
+<td class="enOdEe-wZVHld-aOtOmf xm9Xec"><div class="lqv0Cb">
+{buttons}
+</div></td>
+<td class="enOdEe-wZVHld-aOtOmf"><a href="/trends/explore?q={query}&amp;date=now%201-d&amp;geo={geo}" class="yUKKve">Explore</a></td>
+</tr>"""
+
+BUTTON_TEMPLATE = '<button class="mUIrbf-LgbsSe" data-term="{term}"><span class="mUIrbf-vQzf8d">{term}</span></button>'
+
+WORDS = [
+    "election", "weather", "football", "stock", "market", "festival", "concert", "storm",
+    "championship", "release", "update", "earthquake", "premiere", "final", "match", "series",
+    "award", "launch", "holiday", "traffic", "budget", "museum", "marathon", "opening",
+]
+
+SCRIPT_BLOB = "<script nonce=\"x\">(function(){var a={};" + "a['k%d']=function(b){return b*2;};" * 40 + "})();</script>\n"
+STYLE_BLOB = "<style>" + ".c%d{margin:0;padding:4px;color:#202124}" * 40 + "</style>\n"
+
+def make_title(rng: random.Random) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(rng.randint(1, 4))).title()
+
+def iter_rows(count: int, geo: str = "US", seed: int = 0) -> Iterator[str]:
+    """Render ``count`` trend table rows one at a time."""
+    rng = random.Random(seed)
+    for rank in range(1, count + 1):
+        title = make_title(rng)
+        terms = [make_title(rng) for _ in range(rng.randint(0, 6))]
+        yield ROW_TEMPLATE.format(
+            rank=rank,
+            title=title,
+            volume_short=f"{rng.choice([1, 2, 5, 10, 20, 50, 100, 200, 500])}K+",
+            change=f"{rng.choice([100, 200, 500, 1000])}%",
+            hours=rng.randint(1, 23),
+            buttons="\n".join(BUTTON_TEMPLATE.format(term=t) for t in terms),
+            query=title.replace(" ", "+"),
+            geo=geo,
+        )
+
+def make_rows(count: int, geo: str = "US", seed: int = 0) -> str:
+    """Render ``count`` trend table rows."""
+    return "\n".join(iter_rows(count, geo=geo, seed=seed))
+
+def make_trending_page(rows: int = 25, padding_kb: int = 0, geo: str = "US", seed: int = 0) -> str:
+    """Render a page with the modern trends table.
+
+    ``padding_kb`` adds roughly that many kilobytes of inline scripts and
+    styles, which real rendered pages carry in the megabytes.
+    """
+    padding = []
+    size = 0
+    while size < padding_kb * 1024:
+        padding.append(SCRIPT_BLOB)
+        padding.append(STYLE_BLOB)
+        size += len(SCRIPT_BLOB) + len(STYLE_BLOB)
+    return (
+        "<!DOCTYPE html><html lang=\"en\"><head><meta charset=\"utf-8\"><title>Trending now</title>\n"
+        + "".join(padding[: len(padding) // 2])
+        + "</head><body><div role=\"main\"><table class=\"enOdEe-wZVHld-zg7Cn\" role=\"grid\"><tbody jsname=\"cC57zf\">\n"
+        + make_rows(rows, geo=geo, seed=seed)
+        + "\n</tbody></table></div>\n"
+        + "".join(padding[len(padding) // 2:])
+        + "</body></html>"
+    )
+
+def page_of_size(megabytes: float, rows: int = 500, seed: int = 0) -> str:
+    """A trending page padded to roughly ``megabytes`` in size."""
+    rows_html = make_rows(rows, seed=seed)
+    padding_kb = max(0, int(megabytes * 1024 - len(rows_html) / 1024))
+    return make_trending_page(rows=rows, padding_kb=padding_kb, seed=seed)
+
+def iter_trending_page(rows: int, padding_kb: int = 0, seed: int = 0) -> Iterator[str]:
+    """Stream a trending page in chunks without ever holding all of it.
+
+    Padding is emitted between rows so the page keeps its size spread out,
+    as a streamed network response would deliver it.
+    """
+    yield "<!DOCTYPE html><html><head><title>Trending now</title></head><body>"
+    yield "<table class=\"enOdEe-wZVHld-zg7Cn\"><tbody>"
+    blobs_per_row = padding_kb * 1024 / (len(SCRIPT_BLOB) + len(STYLE_BLOB)) / max(rows, 1)
+    owed = 0.0
+    for row in iter_rows(rows, seed=seed):
+        yield row
+        owed += blobs_per_row
+        while owed >= 1:
+            yield "<tr><td>" + SCRIPT_BLOB + STYLE_BLOB + "</td></tr>"
+            owed -= 1
+    yield "</tbody></table></body></html>"
+
+RSS_ITEM_TEMPLATE = """<item>
+<title>{title}</title>
+<ht:approx_traffic>{traffic}+</ht:approx_traffic>
+<link>https://trends.google.com/trending/rss?geo={geo}</link>
+<pubDate>Mon, 1 Jan 2024 {hour:02d}:00:00 -0800</pubDate>
+<ht:picture>https://t0.gstatic.com/images?q=tbn:{rank}</ht:picture>
+<ht:news_item><ht:news_item_title>{news}</ht:news_item_title><ht:news_item_url>https://news.example.com/{rank}</ht:news_item_url></ht:news_item>
+</item>"""
+
+def make_rss_feed(items: int = 20, geo: str = "US", seed: int = 0) -> str:
+    """Render a trending searches RSS feed with ``items`` entries."""
+    rng = random.Random(seed)
+    body = "\n".join(
+        RSS_ITEM_TEMPLATE.format(
+            title=make_title(rng),
+            traffic=rng.choice(["1,000", "20,000", "100,000", "500,000"]),
+            geo=geo,
+            hour=rank % 24,
+            rank=rank,
+            news=" ".join(rng.choice(WORDS) for _ in range(8)),
+        )
+        for rank in range(1, items + 1)
+    )
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        '<rss xmlns:ht="https://trends.google.com/trending/rss" version="2.0"><channel>\n'
+        f"<title>Daily Search Trends</title><link>https://trends.google.com/trending/rss?geo={geo}</link>\n"
+        + body
+        + "\n</channel></rss>"
+    )
+
+def make_legacy_page(items: int = 50, padding_kb: int = 0, seed: int = 0) -> str:
+    """Page without the modern table, exercising the fallback selector cascade."""
+    rng = random.Random(seed)
+    stories = "\n".join(
+        f'<div class="feed-item"><h3>{make_title(rng)}</h3><span class="search-volume">{rng.randint(1, 500)}K+</span>'
+        f'<span class="change">+{rng.randint(5, 900)}%</span><a href="/trends/explore?q={rank}">Explore</a></div>'
+        for rank in range(items)
+    )
+    padding = (SCRIPT_BLOB + STYLE_BLOB) * max(0, padding_kb * 1024 // (len(SCRIPT_BLOB) + len(STYLE_BLOB)))
+    return f"<html><head>{padding}</head><body><div class=\"trending-searches-content\">{stories}</div></body></html>"
+
+def make_text_page(paragraphs: int = 200, padding_kb: int = 0, seed: int = 0) -> str:
+    """Page with no recognisable structure, which ends in the text heuristic fallback."""
+    rng = random.Random(seed)
+    chunks = []
+    for i in range(paragraphs):
+        chunks.append(f"<p><span>{make_title(rng)}</span></p>")
+        if i % 10 == 0:
+            chunks.append(SCRIPT_BLOB)
+    padding = STYLE_BLOB * max(0, padding_kb * 1024 // len(STYLE_BLOB))
+    return f"<html><head>{padding}</head><body><section>{''.join(chunks)}</section></body></html>"
+
+NOISE_BLOB = (
+    "<nav><a>Search</a><a>Trending</a><a>Settings</a><span>12345</span><span>MENU</span></nav>"
+    "<ul><li>var x = 1;</li><li>https://example.com/page</li><li>Privacy</li><li>Help</li></ul>\n"
+)
+
+def make_noise_page(megabytes: float, topics: int = 20, seed: int = 0) -> str:
+    """Page of visible chrome the text heuristic rejects, with scripts, and the topics at the very end.
+
+    Forces the heuristic to scan the whole document before it finds anything.
+    """
+    rng = random.Random(seed)
+    block = NOISE_BLOB * 20 + SCRIPT_BLOB
+    blocks = max(1, int(megabytes * 1024 * 1024 // len(block)))
+    titles = "".join(f"<p>{make_title(rng)} {i}</p>" for i in range(topics))
+    return f"<html><body>{block * blocks}<section>{titles}</section></body></html>"
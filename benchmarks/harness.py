@@ -0,0 +1,115 @@
+"""Minimal benchmark runner modelled on pytest-benchmark.
+
+Benchmarks are plain functions named ``bench_*`` in ``suite_*.py``
+modules. Each receives a ``Benchmark`` and calls it with the code to time,
+just like pytest-benchmark's ``benchmark`` fixture, so the suites can be
+moved under pytest-benchmark unchanged.
+"""
+
+import gc
+import importlib
+import pkgutil
+import statistics
+import time
+from dataclasses import asdict, dataclass
+from typing import Any, Callable, Dict, List, Optional
+
+@dataclass
+class BenchmarkResult:
+    """Timing statistics for one benchmark, in milliseconds."""
+
+    name: str
+    rounds: int
+    min_ms: float
+    median_ms: float
+    mean_ms: float
+    stddev_ms: float
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+class Benchmark:
+    """Callable that times a function over several rounds after a warm-up call."""
+
+    def __init__(self, name: str, rounds: int = 5, warmup: int = 1):
+        self.name = name
+        self.rounds = rounds
+        self.warmup = warmup
+        self.result: Optional[BenchmarkResult] = None
+
+    def __call__(self, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        for _ in range(self.warmup):
+            value = fn(*args, **kwargs)
+        timings = []
+        gc_was_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            for _ in range(self.rounds):
+                start = time.perf_counter()
+                value = fn(*args, **kwargs)
+                timings.append((time.perf_counter() - start) * 1000)
+        finally:
+            if gc_was_enabled:
+                gc.enable()
+        self.result = BenchmarkResult(
+            name=self.name,
+            rounds=self.rounds,
+            min_ms=min(timings),
+            median_ms=statistics.median(timings),
+            mean_ms=statistics.fmean(timings),
+            stddev_ms=statistics.stdev(timings) if len(timings) > 1 else 0.0,
+        )
+        return value
+
+
+def discover(package: str = "benchmarks", pattern: Optional[str] = None) -> Dict[str, Callable[[Benchmark], Any]]:
+    """Find ``bench_*`` functions in the ``suite_*`` modules of a package."""
+    found = {}
+    module = importlib.import_module(package)
+    for info in pkgutil.iter_modules(module.__path__):
+        if not info.name.startswith("suite_"):
+            continue
+        suite = importlib.import_module(f"{package}.{info.name}")
+        for attr in dir(suite):
+            if attr.startswith("bench_"):
+                name = f"{info.name[len('suite_'):]}.{attr[len('bench_'):]}"
+                if pattern is None or pattern in name:
+                    found[name] = getattr(suite, attr)
+    return found
+
+
+def run(benchmarks: Dict[str, Callable[[Benchmark], Any]], rounds: int = 5) -> List[BenchmarkResult]:
+    """Run each benchmark function and collect its timings."""
+    results = []
+    for name, fn in sorted(benchmarks.items()):
+        benchmark = Benchmark(name, rounds=rounds)
+        fn(benchmark)
+        if benchmark.result is None:
+            raise RuntimeError(f"Benchmark {name} never called its benchmark argument")
+        results.append(benchmark.result)
+    return results
+
+
+def compare(results: List[BenchmarkResult], baseline: Dict[str, dict], thresholds: Dict[str, Any]) -> List[str]:
+    """Return a message for every benchmark slower than its baseline allows.
+
+    ``thresholds`` holds a ``default`` allowed slowdown ratio (0.25 means
+    25% slower) and optional per-benchmark overrides under ``benchmarks``.
+    Medians are compared, as they are the least noisy statistic.
+    """
+    default = thresholds.get("default", 0.25)
+    overrides = thresholds.get("benchmarks", {})
+    regressions = []
+    for result in results:
+        previous = baseline.get(result.name)
+        if previous is None:
+            continue
+        allowed = overrides.get(result.name, default)
+        limit = previous["median_ms"] * (1 + allowed)
+        if result.median_ms > limit:
+            regressions.append(
+                f"{result.name}: {result.median_ms:.2f} ms vs baseline {previous['median_ms']:.2f} ms "
+                f"(allowed +{allowed:.0%})"
+            )
+    return regressions
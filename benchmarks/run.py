@@ -0,0 +1,65 @@
+"""Run the benchmark suites, write results and check for regressions.
+
+Run with ``python -m benchmarks.run``. Everything is offline: pages come
+from ``corpus`` and upstream requests go to a local stub server.
+
+    python -m benchmarks.run --save-baseline      # record benchmarks/baseline.json
+    python -m benchmarks.run                      # compare against it
+"""
+
+import argparse
+import json
+import logging
+import platform
+import sys
+from datetime import datetime
+from pathlib import Path
+
+from .harness import compare, discover, run
+
+HERE = Path(__file__).parent
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-k", dest="pattern", help="Only run benchmarks whose name contains this")
+    parser.add_argument("--rounds", type=int, default=5, help="Timed rounds per benchmark")
+    parser.add_argument("--output", default=str(HERE / "results.json"), help="Where to write results")
+    parser.add_argument("--baseline", default=str(HERE / "baseline.json"), help="Results to compare against")
+    parser.add_argument("--thresholds", default=str(HERE / "thresholds.json"), help="Allowed slowdown per benchmark")
+    parser.add_argument("--save-baseline", action="store_true", help="Write results as the new baseline")
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    results = run(discover(pattern=args.pattern), rounds=args.rounds)
+
+    print(f"{'benchmark':<32} {'min (ms)':>10} {'median (ms)':>12} {'stddev':>8}")
+    for result in results:
+        print(f"{result.name:<32} {result.min_ms:>10.2f} {result.median_ms:>12.2f} {result.stddev_ms:>8.2f}")
+
+    document = {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "benchmarks": {result.name: result.to_dict() for result in results},
+    }
+    Path(args.output).write_text(json.dumps(document, indent=2))
+    if args.save_baseline:
+        Path(args.baseline).write_text(json.dumps(document, indent=2))
+        print(f"Saved baseline to {args.baseline}")
+        return
+
+    baseline_path = Path(args.baseline)
+    if not baseline_path.exists():
+        print("No baseline to compare against; run with --save-baseline first")
+        return
+    baseline = json.loads(baseline_path.read_text())["benchmarks"]
+    thresholds = json.loads(Path(args.thresholds).read_text())
+    regressions = compare(results, baseline, thresholds)
+    for message in regressions:
+        print(f"REGRESSION {message}")
+    if regressions:
+        sys.exit(1)
+    print("No regressions against baseline")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""Local HTTP server standing in for trends.google.com in end-to-end benchmarks."""
+
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Tuple
+
+class StubTrendsServer:
+    """Serves fixed documents by path on a random local port.
+
+    ``routes`` maps a path (without query string) to ``(content_type, body)``.
+    Use as a context manager; ``url`` is the base URL while running.
+    """
+
+    def __init__(self, routes: Dict[str, Tuple[str, str]]):
+        encoded = {path: (ctype, body.encode("utf-8")) for path, (ctype, body) in routes.items()}
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                route = encoded.get(self.path.split("?", 1)[0])
+                if route is None:
+                    self.send_response(404)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                content_type, body = route
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def __enter__(self) -> "StubTrendsServer":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._server.shutdown()
+        self._server.server_close()
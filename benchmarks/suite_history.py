@@ -0,0 +1,58 @@
+"""Bulk reads of recorded history: pydantic points versus compact records."""
+
+import atexit
+import shutil
+import tempfile
+from datetime import datetime, timedelta
+from functools import lru_cache
+from pathlib import Path
+import random
+
+from src.backend.history import HistoryStore
+from src.backend.models import TrendRequest
+from src.backend.records import TrendRecord, TrendSnapshot
+
+from .corpus import make_title
+
+GEOS = ["US", "GB", "JP", "DE", "FR", "IN", "BR", "HK"]
+
+def fill_history(store: HistoryStore, snapshots: int, trends: int, seed: int = 0) -> None:
+    """Record ``snapshots`` fetches of ``trends`` topics, titles recurring as they do upstream."""
+    rng = random.Random(seed)
+    titles = list(dict.fromkeys(make_title(rng) for _ in range(trends * 20)))
+    start = datetime(2024, 1, 1)
+    for i in range(snapshots):
+        geo = GEOS[i % len(GEOS)]
+        topics = [
+            TrendRecord(title=title, ranking=rank, search_volume="20K+", search_volume_min=20000,
+                        change_percentage="+150%", change_percent=150.0)
+            for rank, title in enumerate(rng.sample(titles, min(trends, len(titles))), 1)
+        ]
+        store.append(TrendRequest(geo=geo), TrendSnapshot(
+            topics=topics, source_url="https://trends.google.com/trending", timestamp=start + timedelta(minutes=i),
+            total_trends=len(topics), location=geo, language="en",
+        ))
+
+@lru_cache(maxsize=None)
+def history_100k() -> HistoryStore:
+    directory = tempfile.mkdtemp(prefix="bench-history-")
+    atexit.register(shutil.rmtree, directory, True)
+    store = HistoryStore(str(Path(directory) / "history.sqlite3"))
+    fill_history(store, snapshots=2000, trends=50)
+    return store
+
+def bench_iter_points_100k(benchmark):
+    store = history_100k()
+    benchmark(lambda: list(store.iter_points()))
+
+def bench_iter_records_100k(benchmark):
+    store = history_100k()
+    benchmark(lambda: list(store.iter_records()))
+
+def bench_ndjson_points_100k(benchmark):
+    store = history_100k()
+    benchmark(lambda: sum(len(point.model_dump_json()) for point in store.iter_points()))
+
+def bench_ndjson_records_100k(benchmark):
+    store = history_100k()
+    benchmark(lambda: sum(len(record.to_json()) for record in store.iter_records()))
@@ -0,0 +1,67 @@
+"""Microbenchmarks for the HTML and RSS parsing paths."""
+
+from functools import lru_cache
+
+from bs4 import BeautifulSoup
+
+from src.backend import lxml_parser
+from src.backend.parser import extract_trend_from_table_row, extract_trends_from_text, parse_trending_html
+from src.backend.scraper import parse_rss_response
+from src.backend.stream_parser import iter_table_trends
+
+from .corpus import make_legacy_page, make_noise_page, make_rss_feed, make_text_page, page_of_size
+
+@lru_cache(maxsize=None)
+def large_page() -> str:
+    return page_of_size(5, rows=500)
+
+@lru_cache(maxsize=None)
+def small_page() -> str:
+    return page_of_size(0.1, rows=25)
+
+class FakeResponse:
+    def __init__(self, text: str):
+        self.text = text
+
+def bench_table_bs4_5mb(benchmark):
+    benchmark(parse_trending_html, large_page(), "bs4")
+
+def bench_table_lxml_5mb(benchmark):
+    benchmark(parse_trending_html, large_page(), "lxml")
+
+def bench_table_stream_5mb(benchmark):
+    benchmark(parse_trending_html, large_page(), "stream")
+
+def bench_table_lxml_small(benchmark):
+    benchmark(parse_trending_html, small_page(), "lxml")
+
+def bench_extract_row_bs4(benchmark):
+    rows = BeautifulSoup(small_page(), "html.parser").select("tr[jsname='oKdM2c']")
+    benchmark(lambda: [extract_trend_from_table_row(row, i) for i, row in enumerate(rows, 1)])
+
+def bench_extract_row_lxml(benchmark):
+    rows = lxml_parser.ROWS(lxml_parser.parse_document(small_page()))
+    benchmark(lxml_parser.extract_trends_from_rows, rows)
+
+def bench_stream_chunks_5mb(benchmark):
+    html = large_page()
+    benchmark(lambda: sum(1 for _ in iter_table_trends(html)))
+
+def bench_legacy_selectors(benchmark):
+    benchmark(parse_trending_html, make_legacy_page(items=200, padding_kb=512))
+
+def bench_text_heuristic(benchmark):
+    benchmark(parse_trending_html, make_text_page(paragraphs=2000, padding_kb=512))
+
+def bench_text_heuristic_5mb(benchmark):
+    benchmark(parse_trending_html, make_text_page(paragraphs=2000, padding_kb=5 * 1024))
+
+# The heuristic alone on an already parsed page that it has to scan to the end
+def bench_text_scan_1mb(benchmark):
+    benchmark(extract_trends_from_text, BeautifulSoup(make_noise_page(1), "html.parser"))
+
+def bench_text_scan_5mb(benchmark):
+    benchmark(extract_trends_from_text, BeautifulSoup(make_noise_page(5), "html.parser"))
+
+def bench_rss_feed(benchmark):
+    benchmark(parse_rss_response, FakeResponse(make_rss_feed(items=200)))
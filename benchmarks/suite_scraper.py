@@ -0,0 +1,43 @@
+"""End-to-end ``fetch_trends`` benchmarks against a local stub server.
+
+Selenium is disabled so the plain HTTP and RSS tiers are measured,
+including connection reuse in the shared HTTP client.
+"""
+
+from contextlib import contextmanager
+
+from src.backend import history, ratelimit, scraper
+from src.backend.models import TrendRequest
+
+from .corpus import make_rss_feed, make_text_page, page_of_size
+from .stub_server import StubTrendsServer
+
+@contextmanager
+def stubbed_upstream(page: str):
+    routes = {
+        "/trending": ("text/html; charset=utf-8", page),
+        "/rss": ("application/rss+xml", make_rss_feed(items=20)),
+    }
+    saved = (scraper.USE_SELENIUM, scraper.BASE_URL, scraper.REALTIME_URL, history.HISTORY_ENABLED,
+             ratelimit.UPSTREAM_LIMIT_ENABLED)
+    with StubTrendsServer(routes) as server:
+        scraper.USE_SELENIUM = False
+        scraper.BASE_URL = f"{server.url}/trending"
+        scraper.REALTIME_URL = f"{server.url}/rss"
+        # Stub pages are not history worth keeping
+        history.HISTORY_ENABLED = False
+        # Benchmarks deliberately hammer the stub server
+        ratelimit.UPSTREAM_LIMIT_ENABLED = False
+        try:
+            yield
+        finally:
+            (scraper.USE_SELENIUM, scraper.BASE_URL, scraper.REALTIME_URL, history.HISTORY_ENABLED,
+             ratelimit.UPSTREAM_LIMIT_ENABLED) = saved
+
+def bench_fetch_table_page(benchmark):
+    with stubbed_upstream(page_of_size(1, rows=100)):
+        benchmark(scraper.fetch_trends, TrendRequest(geo="US"))
+
+def bench_fetch_rss_fallback(benchmark):
+    with stubbed_upstream(make_text_page(paragraphs=50)):
+        benchmark(scraper.fetch_trends, TrendRequest(geo="US"))
@@ -1,19 +1,129 @@
-from fastapi import FastAPI, Depends, HTTPException
+from fastapi import FastAPI, Depends, HTTPException, Request, Response, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
-import json
-import tempfile
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from contextlib import asynccontextmanager
+import asyncio
+import functools
+import logging
 import os
 from datetime import datetime
-from .models import TrendRequest, TrendsResponse
-from .scraper import fetch_trends
+from typing import AsyncIterator, Callable, List, Optional, Tuple
+from .batch import BATCH_MAX_ITEMS, stream_batch, upstream_host
+from .models import BatchTrendRequest, HistoryPoint, HistorySummary, TrendQuery, TrendRequest, TrendsResponse
+from .records import TrendSnapshot
+from . import scheduler
+from .scheduler import PrefetchScheduler, default_prefetch_keys
+from . import scraper
+from .cache import MISS, cache_key, get_trends_cache
+from .events import EVENTS_POLL_INTERVAL, RESYNC, Subscription, get_event_hub
+from .executor import ServiceBusy, get_scrape_executor
+from .http_client import get_http_client
+from .jobqueue import QueueLoader, close_job_queue, get_job_queue, get_job_wait_executor
+from .ratelimit import UpstreamUnavailable, close_upstream_guard, get_upstream_guard
+from . import debug_capture, export, history, metrics, query
+
+logger = logging.getLogger(__name__)
+
+# Start pooled browsers before serving traffic so the first request doesn't pay for it
+BROWSER_POOL_WARMUP = os.getenv("BROWSER_POOL_WARMUP", "true").lower() == "true"
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Warm up shared resources on startup and release them on shutdown."""
+    if scraper.USE_SELENIUM and BROWSER_POOL_WARMUP:
+        started = await asyncio.to_thread(scraper.get_browser_pool().warm_up)
+        logger.info("Warmed up %s pooled browsers", started)
+    prefetcher = None
+    if scheduler.PREFETCH_ENABLED:
+        prefetcher = PrefetchScheduler(get_trends_cache(), default_prefetch_keys())
+        prefetcher.start()
+    app.state.prefetcher = prefetcher
+    # Every upstream load is diffed against the previous snapshot for streaming clients
+    get_trends_cache().add_listener(get_event_hub().publish)
+    yield
+    get_trends_cache().remove_listener(get_event_hub().publish)
+    if prefetcher is not None:
+        prefetcher.stop()
+    get_trends_cache().close()
+    get_scrape_executor().shutdown()
+    get_http_client().close()
+    debug_capture.get_debug_capture().close()
+    history.close_history_store()
+    close_upstream_guard()
+    close_job_queue()
+    await asyncio.to_thread(scraper.shutdown_browser_pool)
+
+def _cache_lookups() -> dict:
+    stats = get_trends_cache().stats()
+    return {(result,): stats[key] for result, key in (("hit", "hits"), ("stale", "stale_hits"), ("miss", "misses"))}
+
+def _browser_pool_stat(name: str):
+    return lambda: scraper.get_browser_pool().stats()[name] if scraper.USE_SELENIUM else None
+
+# Components already keep their own counters; export them when /metrics is scraped
+metrics.register_callback("trends_cache_lookups_total", "Cache lookups by result", "counter",
+                          _cache_lookups, ["result"])
+metrics.register_callback("trends_cache_hit_ratio", "Fraction of cache lookups answered from cache", "gauge",
+                          lambda: get_trends_cache().stats()["hit_ratio"])
+metrics.register_callback("trends_cache_entries", "Entries in the in-process cache", "gauge",
+                          lambda: get_trends_cache().stats()["entries"])
+metrics.register_callback("trends_browsers_in_use", "Pooled browsers checked out", "gauge",
+                          _browser_pool_stat("in_use"))
+metrics.register_callback("trends_browsers_created", "Pooled browsers currently alive", "gauge",
+                          _browser_pool_stat("created"))
+metrics.register_callback("trends_browsers_recycled_total", "Pooled browsers replaced after their page or memory budget", "counter",
+                          _browser_pool_stat("recycled"))
+metrics.register_callback("trends_scrapes_pending", "Scrapes running or queued", "gauge",
+                          lambda: get_scrape_executor().stats()["pending"])
+metrics.register_callback("trends_scrapes_rejected_total", "Scrapes rejected because the queue was full", "counter",
+                          lambda: get_scrape_executor().stats()["rejected"])
+metrics.register_callback("trends_upstream_requests_total", "HTTP requests sent upstream", "counter",
+                          lambda: get_http_client().stats()["requests"])
+metrics.register_callback("trends_upstream_not_modified_total", "Upstream requests answered with 304 Not Modified", "counter",
+                          lambda: get_http_client().stats()["not_modified"])
+
+def _breaker_hosts(value: Callable[[dict], float]) -> Callable[[], dict]:
+    return lambda: {(host,): value(state) for host, state in get_upstream_guard().stats()["hosts"].items()}
+
+metrics.register_callback("trends_upstream_breaker_open", "1 while requests to the host are refused", "gauge",
+                          _breaker_hosts(lambda state: float(state["state"] != "closed")), ["host"])
+metrics.register_callback("trends_upstream_rate", "Current requests per second allowed to the host", "gauge",
+                          _breaker_hosts(lambda state: state["rate"]), ["host"])
+metrics.register_callback("trends_upstream_throttled_total", "429s and captcha pages received from upstream", "counter",
+                          lambda: get_upstream_guard().stats()["throttled"])
+metrics.register_callback("trends_upstream_rejected_total", "Upstream requests refused by the rate limiter or circuit breaker", "counter",
+                          lambda: get_upstream_guard().stats()["rejected"])
+
+def _job_counts() -> Optional[dict]:
+    queue = get_job_queue()
+    if queue is None:
+        return None
+    stats = queue.stats()
+    return {(status,): stats[status] for status in ("pending", "running", "done", "failed")}
+
+metrics.register_callback("trends_jobs", "Scrape jobs in the shared queue by status", "gauge",
+                          _job_counts, ["status"])
+metrics.register_callback("trends_jobs_oldest_pending_seconds", "Time the oldest queued scrape job has waited", "gauge",
+                          lambda: get_job_queue().stats()["oldest_pending_seconds"] if get_job_queue() is not None else None)
 
 app = FastAPI(
     title="Google Trends API",
     description="API for fetching Google Trends data",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
+@app.middleware("http")
+async def debug_capture_middleware(request: Request, call_next):
+    """Capture the scraped page for requests with ``?debug=1`` or an ``X-Debug-Capture`` header."""
+    if request.query_params.get("debug") == "1" or request.headers.get("x-debug-capture"):
+        token = debug_capture.requested.set(True)
+        try:
+            return await call_next(request)
+        finally:
+            debug_capture.requested.reset(token)
+    return await call_next(request)
+
 # Add CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -23,41 +133,294 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+async def load_trends(params: TrendRequest) -> Tuple[TrendSnapshot, str, float]:
+    """Fetch trends through the response cache.
+
+    Hits in the in-process LRU are answered on the event loop, lookups in
+    the shared backend run in a thread. Misses either wait on a scrape
+    that is already running for the same key or run a new one in the bounded
+    scrape executor, which raises ServiceBusy when saturated. With a job
+    queue the new one is scraped by a worker process and waited for in the
+    job wait pool instead. While upstream
+    is throttling us the last known response is served however old it is,
+    and without one UpstreamUnavailable is raised before anything is queued.
+    """
+    cache = get_trends_cache()
+    cached = cache.get_cached(params, local_only=True)
+    if cached is None and cache.shared is not None:
+        # Shared backend reads block on SQLite; keep them off the event loop
+        cached = await asyncio.to_thread(cache.get_cached, params)
+    if cached is not None:
+        return cached
+    try:
+        get_upstream_guard().check(upstream_host(params))
+        inflight = cache.inflight(params)
+        if inflight is not None:
+            entry = await asyncio.wrap_future(inflight)
+            return entry.value, MISS, 0.0
+        # The lookup above already counted this request as demand
+        load = functools.partial(cache.get, params, count=False)
+        if isinstance(cache.loader, QueueLoader):
+            # Worker processes scrape; this only waits, outside the scrape executor's bound
+            return await get_job_wait_executor().run(load)
+        return await get_scrape_executor().run(load)
+    except UpstreamUnavailable:
+        last_known = await asyncio.to_thread(cache.get_last_known, params)
+        if last_known is not None:
+            return last_known
+        raise
+
+async def get_cached_trends(params: TrendRequest, response: Response) -> TrendSnapshot:
+    """Fetch trends through the response cache and report the cache status in headers."""
+    trends_data, status, age = await load_trends(params)
+    response.headers["X-Cache"] = status
+    response.headers["Age"] = str(int(age))
+    return trends_data
+
+def busy_response(e: ServiceBusy) -> HTTPException:
+    """503 telling the client when to retry."""
+    return HTTPException(
+        status_code=503,
+        detail=str(e),
+        headers={"Retry-After": str(e.retry_after)}
+    )
+
 @app.get("/api/trends", response_model=TrendsResponse)
-async def get_trends(params: TrendRequest = Depends()) -> TrendsResponse:
-    """Return trending topics based on parameters."""
+async def get_trends(
+    response: Response,
+    params: TrendRequest = Depends(),
+    local: TrendQuery = Depends(),
+) -> TrendsResponse:
+    """Return trending topics based on parameters.
+
+    ``local`` parameters filter, sort and page the cached result without a new scrape.
+    """
+    try:
+        query.validate_query(local)
+    except query.InvalidQuery as e:
+        raise HTTPException(status_code=400, detail=str(e))
     try:
-        return fetch_trends(params)
+        trends_data = query.apply_query(await get_cached_trends(params, response), local)
+        if local.fields:
+            return Response(
+                content=query.dump_json(trends_data, local.fields),
+                media_type="application/json",
+                headers={k: response.headers[k] for k in ("X-Cache", "Age")},
+            )
+        return trends_data.to_model()
+    except ServiceBusy as e:
+        raise busy_response(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching trends: {str(e)}")
 
+async def subscribe_to_trends(params: TrendRequest) -> Tuple[Subscription, TrendSnapshot]:
+    """Subscribe to change events for a query and load its current snapshot.
+
+    Subscribing first means no change between the load and the subscription is missed.
+    """
+    hub = get_event_hub()
+    subscription = hub.subscribe(cache_key(params))
+    try:
+        snapshot, _, _ = await load_trends(params)
+    except BaseException:
+        hub.unsubscribe(subscription)
+        raise
+    hub.publish(subscription.key, snapshot)
+    return subscription, snapshot
+
+async def trend_events(
+    params: TrendRequest,
+    subscription: Subscription,
+    snapshot: TrendSnapshot,
+) -> AsyncIterator[Tuple[Optional[str], Optional[str]]]:
+    """Yield ``(event_type, json)`` for a subscription, starting with the current snapshot.
+
+    While the client is idle the query is reloaded every EVENTS_POLL_INTERVAL
+    seconds through the cache, so all subscribers of a query share one
+    upstream fetch per cache TTL. ``(None, None)`` marks those idle ticks.
+    """
+    hub = get_event_hub()
+    try:
+        yield "snapshot", snapshot.to_json().decode("utf-8")
+        while True:
+            try:
+                kind, event = await subscription.get(timeout=EVENTS_POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                yield None, None
+                try:
+                    snapshot, _, _ = await load_trends(params)
+                    hub.publish(subscription.key, snapshot)
+                except Exception as e:
+                    logger.warning("Refreshing subscribed trends failed: %s", e)
+                continue
+            if kind == RESYNC:
+                # Events were dropped for this slow client; send the whole state instead
+                try:
+                    snapshot, _, _ = await load_trends(params)
+                except Exception as e:
+                    logger.warning("Resyncing subscribed trends failed: %s", e)
+                    # Retry on the next tick; the client keeps its state until then
+                    subscription.resync()
+                    yield None, None
+                    await asyncio.sleep(EVENTS_POLL_INTERVAL)
+                    continue
+                yield RESYNC, snapshot.to_json().decode("utf-8")
+            else:
+                yield kind, event.model_dump_json()
+    finally:
+        hub.unsubscribe(subscription)
+
+@app.get("/api/trends/events")
+async def stream_trend_events(params: TrendRequest = Depends()):
+    """Server-Sent Events: a ``snapshot`` of the query, then change events as they happen."""
+    try:
+        subscription, snapshot = await subscribe_to_trends(params)
+    except ServiceBusy as e:
+        raise busy_response(e)
+
+    async def lines():
+        async for kind, data in trend_events(params, subscription, snapshot):
+            if kind is None:
+                yield ": keepalive\n\n"
+            else:
+                yield f"event: {kind}\ndata: {data}\n\n"
+
+    return StreamingResponse(
+        lines(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.websocket("/api/trends/ws")
+async def trend_events_websocket(websocket: WebSocket, params: TrendRequest = Depends()):
+    """WebSocket carrying the same messages as /api/trends/events as ``{"type", "data"}`` objects."""
+    await websocket.accept()
+    try:
+        subscription, snapshot = await subscribe_to_trends(params)
+    except ServiceBusy as e:
+        # 1013: try again later
+        await websocket.close(code=1013, reason=str(e))
+        return
+    try:
+        async for kind, data in trend_events(params, subscription, snapshot):
+            if kind is not None:
+                await websocket.send_text(f'{{"type":"{kind}","data":{data}}}')
+    except WebSocketDisconnect:
+        pass
+
 @app.get("/api/trends/download")
-async def download_trends_json(params: TrendRequest = Depends()):
-    """Download trending topics as JSON file."""
+async def download_trends_json(
+    params: TrendRequest = Depends(),
+    format: str = "json",
+    compression: Optional[str] = None,
+):
+    """Download trending topics as a JSON, NDJSON, CSV or Parquet file, optionally compressed."""
     try:
-        trends_data = fetch_trends(params)
-        
-        # Create temporary file
-        with tempfile.NamedTemporaryFile(mode='w', suffix='.json', delete=False) as f:
-            json.dump(trends_data.dict(), f, indent=2, default=str)
-            temp_file = f.name
+        export.check_export(format, compression)
+    except export.ExportUnavailable as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    try:
+        cache_headers = Response()
+        trends_data = await get_cached_trends(params, cache_headers)
         
         # Generate filename with timestamp
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"google_trends_{params.geo}_{timestamp}.json"
+        filename = export.filename(f"google_trends_{params.geo}_{timestamp}", format, compression)
         
-        return FileResponse(
-            temp_file,
-            media_type='application/json',
-            filename=filename
+        headers = {k: cache_headers.headers[k] for k in ("X-Cache", "Age")}
+        headers["Content-Disposition"] = f'attachment; filename="{filename}"'
+        return StreamingResponse(
+            export.export(trends_data, format, compression),
+            media_type=export.media_type(format, compression),
+            headers=headers,
         )
+    except ServiceBusy as e:
+        raise busy_response(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error generating download: {str(e)}")
 
+@app.get("/api/trends/history", response_model=List[HistoryPoint])
+async def get_trends_history(
+    geo: Optional[str] = None,
+    hl: Optional[str] = None,
+    category: Optional[str] = None,
+    title: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    limit: int = 1000,
+):
+    """Recorded trends between ``start`` and ``end``, oldest first."""
+    if not history.HISTORY_ENABLED:
+        raise HTTPException(status_code=404, detail="Trends history is disabled")
+    if limit < 1 or limit > history.HISTORY_MAX_ROWS:
+        raise HTTPException(status_code=400, detail=f"limit must be between 1 and {history.HISTORY_MAX_ROWS}")
+    return await asyncio.to_thread(
+        history.get_history_store().query,
+        start=start, end=end, geo=geo, hl=hl, category=category, title=title, limit=limit,
+    )
+
+@app.get("/api/trends/history/summary", response_model=List[HistorySummary])
+async def get_trends_history_summary(
+    geo: Optional[str] = None,
+    hl: Optional[str] = None,
+    category: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    order_by: str = "max_search_volume",
+    limit: int = 100,
+):
+    """Per-title aggregates (appearances, best ranking, peak volume, average change) over recorded history."""
+    if not history.HISTORY_ENABLED:
+        raise HTTPException(status_code=404, detail="Trends history is disabled")
+    if order_by not in history.SUMMARY_ORDER:
+        raise HTTPException(status_code=400, detail=f"order_by must be one of {', '.join(history.SUMMARY_ORDER)}")
+    if limit < 1 or limit > history.HISTORY_MAX_ROWS:
+        raise HTTPException(status_code=400, detail=f"limit must be between 1 and {history.HISTORY_MAX_ROWS}")
+    return await asyncio.to_thread(
+        history.get_history_store().summarize,
+        start=start, end=end, geo=geo, hl=hl, category=category, order_by=order_by, limit=limit,
+    )
+
+@app.post("/api/trends/batch")
+async def get_trends_batch(batch: BatchTrendRequest):
+    """Fetch many trend queries concurrently, streaming NDJSON lines as each one finishes."""
+    if not batch.requests:
+        raise HTTPException(status_code=400, detail="Batch contains no requests")
+    if len(batch.requests) > BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"Batch is limited to {BATCH_MAX_ITEMS} requests")
+
+    async def load(params: TrendRequest):
+        trends_data, status, _ = await load_trends(params)
+        return trends_data, status
+
+    async def lines():
+        async for item in stream_batch(batch.requests, load):
+            yield item.model_dump_json() + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
 @app.get("/api/health")
 async def health_check():
     """Health check endpoint."""
-    return {"status": "healthy", "timestamp": datetime.now()}
+    health = {"status": "healthy", "timestamp": datetime.now()}
+    if scraper.USE_SELENIUM:
+        health["browser_pool"] = scraper.get_browser_pool().stats()
+    health["cache"] = get_trends_cache().stats()
+    health["scrape_executor"] = get_scrape_executor().stats()
+    health["http_client"] = get_http_client().stats()
+    health["upstream"] = get_upstream_guard().stats()
+    health["events"] = get_event_hub().stats()
+    if get_job_queue() is not None:
+        health["jobs"] = get_job_queue().stats()
+        health["job_wait_executor"] = get_job_wait_executor().stats()
+    if getattr(app.state, "prefetcher", None) is not None:
+        health["prefetch"] = app.state.prefetcher.stats()
+    return health
+
+@app.get("/metrics")
+async def metrics_endpoint():
+    """Prometheus metrics in the text exposition format."""
+    return PlainTextResponse(metrics.render(), media_type=metrics.CONTENT_TYPE)
 
 @app.get("/")
 async def root():
@@ -68,6 +431,11 @@ async def root():
         "endpoints": {
             "trends": "/api/trends",
             "download": "/api/trends/download",
-            "health": "/api/health"
+            "batch": "/api/trends/batch",
+            "history": "/api/trends/history",
+            "events": "/api/trends/events",
+            "websocket": "/api/trends/ws",
+            "health": "/api/health",
+            "metrics": "/metrics"
         }
     }
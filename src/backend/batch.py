@@ -0,0 +1,96 @@
+"""Concurrent fan-out of many trend requests with a per-host concurrency cap."""
+
+import asyncio
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import AsyncIterator, Awaitable, Callable, Dict, Iterator, List, Optional, Tuple
+from urllib.parse import urlparse
+
+from .models import BatchItemResult, TrendRequest
+from .records import TrendSnapshot
+from .scraper import build_trends_url
+
+logger = logging.getLogger(__name__)
+
+# Largest number of queries accepted in one batch
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "100"))
+# Queries of one batch allowed to hit the same upstream host at once
+BATCH_PER_HOST_CONCURRENCY = int(os.getenv("BATCH_PER_HOST_CONCURRENCY", "4"))
+
+def upstream_host(params: TrendRequest) -> str:
+    """Host a request will be scraped from, used to group concurrency limits."""
+    return urlparse(params.url or build_trends_url(params)).netloc
+
+def _result(index: int, params: TrendRequest, started: float,
+            result: Optional[TrendSnapshot] = None, cache: Optional[str] = None,
+            error: Optional[Exception] = None) -> BatchItemResult:
+    return BatchItemResult(
+        index=index,
+        request=params,
+        result=result.to_model() if result is not None else None,
+        cache=cache,
+        error=f"{type(error).__name__}: {error}" if error is not None else None,
+        elapsed_ms=(time.monotonic() - started) * 1000,
+    )
+
+async def stream_batch(
+    requests: List[TrendRequest],
+    load: Callable[[TrendRequest], Awaitable[Tuple[TrendSnapshot, str]]],
+    per_host: int = BATCH_PER_HOST_CONCURRENCY,
+) -> AsyncIterator[BatchItemResult]:
+    """Run ``load`` for every request and yield results in completion order.
+
+    ``load`` returns ``(response, cache_status)``. A failing item is
+    reported through its ``error`` field and does not affect the others.
+    """
+    semaphores: Dict[str, asyncio.Semaphore] = defaultdict(lambda: asyncio.Semaphore(per_host))
+
+    async def run(index: int, params: TrendRequest) -> BatchItemResult:
+        async with semaphores[upstream_host(params)]:
+            started = time.monotonic()
+            try:
+                result, cache = await load(params)
+                return _result(index, params, started, result=result, cache=cache)
+            except Exception as e:
+                logger.warning("Batch item %s (%s/%s) failed: %s", index, params.geo, params.hl, e)
+                return _result(index, params, started, error=e)
+
+    tasks = [asyncio.ensure_future(run(i, params)) for i, params in enumerate(requests)]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        # The client went away: stop waiting for the rest
+        for task in tasks:
+            task.cancel()
+
+def iter_batch(
+    requests: List[TrendRequest],
+    fetch: Callable[[TrendRequest], TrendSnapshot],
+    per_host: int = BATCH_PER_HOST_CONCURRENCY,
+) -> Iterator[BatchItemResult]:
+    """Blocking counterpart of ``stream_batch`` for the CLI, using threads."""
+    semaphores: Dict[str, threading.BoundedSemaphore] = defaultdict(lambda: threading.BoundedSemaphore(per_host))
+    lock = threading.Lock()
+
+    def run(index: int, params: TrendRequest) -> BatchItemResult:
+        host = upstream_host(params)
+        with lock:
+            semaphore = semaphores[host]
+        with semaphore:
+            started = time.monotonic()
+            try:
+                return _result(index, params, started, result=fetch(params))
+            except Exception as e:
+                logger.warning("Batch item %s (%s/%s) failed: %s", index, params.geo, params.hl, e)
+                return _result(index, params, started, error=e)
+
+    hosts = {upstream_host(params) for params in requests}
+    with ThreadPoolExecutor(max_workers=max(1, min(len(requests), per_host * len(hosts)))) as pool:
+        futures = [pool.submit(run, i, params) for i, params in enumerate(requests)]
+        for future in as_completed(futures):
+            yield future.result()
@@ -0,0 +1,224 @@
+"""Pool of reusable headless browser instances for Selenium rendering."""
+
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from queue import Empty, LifoQueue
+from typing import Any, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+# Pool configuration. Every value can be overridden through the environment.
+POOL_SIZE = int(os.getenv("BROWSER_POOL_SIZE", "2"))
+MAX_PAGES_PER_BROWSER = int(os.getenv("BROWSER_MAX_PAGES", "50"))
+MAX_MEMORY_MB = int(os.getenv("BROWSER_MAX_MEMORY_MB", "1024"))
+CHECKOUT_TIMEOUT = float(os.getenv("BROWSER_CHECKOUT_TIMEOUT", "30"))
+
+# psutil is optional; without it the memory limit is simply not enforced
+try:
+    import psutil
+    HAS_PSUTIL = True
+except ImportError:
+    HAS_PSUTIL = False
+
+
+class BrowserPoolTimeout(Exception):
+    """Raised when no browser becomes available within the checkout timeout."""
+
+
+class PooledBrowser:
+    """A live driver together with the bookkeeping needed for recycling."""
+
+    def __init__(self, driver: Any):
+        self.driver = driver
+        self.pages = 0
+        self.created_at = time.monotonic()
+
+    def memory_mb(self) -> Optional[float]:
+        """Resident memory of the driver process tree in MB, if measurable."""
+        if not HAS_PSUTIL:
+            return None
+        try:
+            pid = self.driver.service.process.pid
+            root = psutil.Process(pid)
+            processes = [root] + root.children(recursive=True)
+            return sum(p.memory_info().rss for p in processes) / (1024 * 1024)
+        except Exception:
+            return None
+
+
+class BrowserPool:
+    """Fixed-size pool of browser drivers with health checks and recycling.
+
+    Drivers are created lazily up to ``size`` (or eagerly via ``warm_up``),
+    handed out with ``checkout``/``checkin`` and replaced once they have
+    served ``max_pages`` pages or grown beyond ``max_memory_mb``.
+    """
+
+    def __init__(
+        self,
+        factory: Callable[[], Any],
+        size: int = POOL_SIZE,
+        max_pages: int = MAX_PAGES_PER_BROWSER,
+        max_memory_mb: int = MAX_MEMORY_MB,
+        checkout_timeout: float = CHECKOUT_TIMEOUT,
+    ):
+        self.factory = factory
+        self.size = max(1, size)
+        self.max_pages = max_pages
+        self.max_memory_mb = max_memory_mb
+        self.checkout_timeout = checkout_timeout
+
+        # LIFO so the most recently used (hottest) browser is reused first
+        self._idle: LifoQueue = LifoQueue()
+        self._lock = threading.Lock()
+        self._created = 0
+        self._in_use = 0
+        self._recycled = 0
+        self._closed = False
+
+    def _create(self) -> PooledBrowser:
+        """Start a new driver. The caller must already hold a reserved slot."""
+        try:
+            browser = PooledBrowser(self.factory())
+        except Exception:
+            with self._lock:
+                self._created -= 1
+            raise
+        logger.info("Started pooled browser (%d/%d)", self._created, self.size)
+        return browser
+
+    def _destroy(self, browser: PooledBrowser) -> None:
+        with self._lock:
+            self._created -= 1
+        try:
+            browser.driver.quit()
+        except Exception as e:
+            logger.debug("Error quitting pooled browser: %s", e)
+
+    def _reserve_slot(self) -> bool:
+        with self._lock:
+            if self._created < self.size:
+                self._created += 1
+                return True
+            return False
+
+    def is_healthy(self, browser: PooledBrowser) -> bool:
+        """Check that the driver session still responds."""
+        try:
+            return browser.driver.execute_script("return 1") == 1
+        except Exception:
+            return False
+
+    def _needs_recycling(self, browser: PooledBrowser) -> bool:
+        if self.max_pages and browser.pages >= self.max_pages:
+            logger.info("Recycling browser after %d pages", browser.pages)
+            return True
+        if self.max_memory_mb:
+            memory = browser.memory_mb()
+            if memory is not None and memory > self.max_memory_mb:
+                logger.info("Recycling browser using %.0f MB", memory)
+                return True
+        return False
+
+    def warm_up(self) -> int:
+        """Start browsers until the pool is full. Returns how many were started."""
+        started = 0
+        while not self._closed and self._reserve_slot():
+            try:
+                self._idle.put(self._create())
+                started += 1
+            except Exception as e:
+                logger.error("Failed to warm up browser pool: %s", e)
+                break
+        return started
+
+    def checkout(self, timeout: Optional[float] = None) -> PooledBrowser:
+        """Borrow a healthy browser, starting one if the pool is not full."""
+        if self._closed:
+            raise RuntimeError("Browser pool is closed")
+        timeout = self.checkout_timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+
+        while True:
+            try:
+                browser = self._idle.get_nowait()
+            except Empty:
+                if self._reserve_slot():
+                    browser = self._create()
+                else:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise BrowserPoolTimeout(
+                            f"No browser available within {timeout:.1f}s"
+                        )
+                    try:
+                        browser = self._idle.get(timeout=remaining)
+                    except Empty:
+                        continue
+
+            if self.is_healthy(browser):
+                with self._lock:
+                    self._in_use += 1
+                return browser
+
+            logger.warning("Discarding unhealthy pooled browser")
+            self._destroy(browser)
+
+    def checkin(self, browser: PooledBrowser, discard: bool = False) -> None:
+        """Return a browser to the pool, recycling it if it is worn out."""
+        with self._lock:
+            self._in_use -= 1
+        browser.pages += 1
+
+        if discard or self._closed or self._needs_recycling(browser):
+            with self._lock:
+                self._recycled += 1
+            self._destroy(browser)
+            return
+        self._idle.put(browser)
+
+    @contextmanager
+    def browser(self, timeout: Optional[float] = None):
+        """Context manager yielding a pooled driver.
+
+        A driver that raised is only returned to the pool if it still
+        passes the health check. One interrupted by ``KeyboardInterrupt``,
+        ``SystemExit`` or ``GeneratorExit`` is discarded, since its page may
+        be in any state.
+        """
+        pooled = self.checkout(timeout)
+        discard = False
+        try:
+            yield pooled.driver
+        except Exception:
+            discard = not self.is_healthy(pooled)
+            raise
+        except BaseException:
+            discard = True
+            raise
+        finally:
+            self.checkin(pooled, discard=discard)
+
+    def close(self) -> None:
+        """Quit every idle browser and refuse further checkouts."""
+        self._closed = True
+        while True:
+            try:
+                browser = self._idle.get_nowait()
+            except Empty:
+                break
+            self._destroy(browser)
+
+    def stats(self) -> dict:
+        """Snapshot of pool occupancy for health checks and metrics."""
+        with self._lock:
+            return {
+                "size": self.size,
+                "created": self._created,
+                "in_use": self._in_use,
+                "idle": self._idle.qsize(),
+                "recycled": self._recycled,
+            }
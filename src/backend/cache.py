@@ -0,0 +1,395 @@
+"""Response cache for trends data with TTL, stale-while-revalidate and single-flight loading."""
+
+import logging
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import Counter, OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Tuple
+
+from .models import TrendRequest
+from .records import TrendSnapshot
+
+logger = logging.getLogger(__name__)
+
+# Seconds an entry is served as fresh
+CACHE_TTL = float(os.getenv("TRENDS_CACHE_TTL", "300"))
+# Additional seconds an expired entry may be served while it is refreshed in the background
+CACHE_STALE_TTL = float(os.getenv("TRENDS_CACHE_STALE_TTL", "900"))
+CACHE_MAX_ENTRIES = int(os.getenv("TRENDS_CACHE_MAX_ENTRIES", "256"))
+# Shared backend: empty for in-process only, or "sqlite" for a file shared between workers
+CACHE_BACKEND = os.getenv("TRENDS_CACHE_BACKEND", "")
+CACHE_PATH = os.getenv("TRENDS_CACHE_PATH", "trends_cache.sqlite3")
+
+# Values reported in the X-Cache response header
+HIT = "HIT"
+STALE = "STALE"
+MISS = "MISS"
+
+def cache_key(params: TrendRequest) -> str:
+    """Build the cache key for a request from every parameter that changes the upstream data."""
+    fields = (params.geo, params.hl, params.hours, params.category, params.sort, params.status, params.url)
+    return "|".join("" if v is None else str(v) for v in fields)
+
+
+@dataclass
+class CacheEntry:
+    """A cached response and the wall-clock time it was stored."""
+
+    value: TrendSnapshot
+    stored_at: float
+    ttl: float
+    stale_ttl: float
+
+    def age(self, now: float) -> float:
+        return max(0.0, now - self.stored_at)
+
+    def is_fresh(self, now: float) -> bool:
+        return self.age(now) < self.ttl
+
+    def is_usable(self, now: float) -> bool:
+        return self.age(now) < self.ttl + self.stale_ttl
+
+
+class CacheBackend(ABC):
+    """Interface for cache storage shared between processes."""
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[CacheEntry]:
+        ...
+
+    @abstractmethod
+    def set(self, key: str, entry: CacheEntry) -> None:
+        ...
+
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        ...
+
+
+class LRUCache(CacheBackend):
+    """Thread-safe in-process LRU map of cache entries."""
+
+    def __init__(self, max_entries: int = CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key: str, entry: CacheEntry) -> None:
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class SQLiteBackend(CacheBackend):
+    """Cache storage in a local SQLite file, standing in for a shared cache server.
+
+    Several API or worker processes on one machine can point at the same file.
+    """
+
+    def __init__(self, path: str = CACHE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=10)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS trends_cache ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+            "stored_at REAL NOT NULL, ttl REAL NOT NULL, stale_ttl REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, stored_at, ttl, stale_ttl FROM trends_cache WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        value, stored_at, ttl, stale_ttl = row
+        return CacheEntry(TrendSnapshot.from_json(value), stored_at, ttl, stale_ttl)
+
+    def set(self, key: str, entry: CacheEntry) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO trends_cache (key, value, stored_at, ttl, stale_ttl) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, entry.value.to_json().decode("utf-8"), entry.stored_at, entry.ttl, entry.stale_ttl),
+            )
+            self._conn.commit()
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM trends_cache WHERE key = ?", (key,))
+            self._conn.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class TrendsCache:
+    """Cache in front of a trends loader such as ``fetch_trends``.
+
+    Lookups go to the in-process LRU first, then to the optional shared
+    backend. Expired entries within the stale window are returned
+    immediately while a background refresh runs, and concurrent misses
+    for the same key share a single upstream load.
+    """
+
+    def __init__(
+        self,
+        loader: Callable[[TrendRequest], TrendSnapshot],
+        local: Optional[LRUCache] = None,
+        shared: Optional[CacheBackend] = None,
+        ttl: float = CACHE_TTL,
+        stale_ttl: float = CACHE_STALE_TTL,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.loader = loader
+        self.local = local if local is not None else LRUCache()
+        self.shared = shared
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.clock = clock
+
+        self._inflight: Dict[str, Future] = {}
+        self._requests: Counter = Counter()
+        self._lock = threading.Lock()
+        self._revalidator = ThreadPoolExecutor(max_workers=2, thread_name_prefix="cache-revalidate")
+        self._listeners: List[Callable[[str, TrendSnapshot], None]] = []
+        self._stats = {"hits": 0, "stale_hits": 0, "misses": 0, "coalesced": 0, "errors": 0, "revalidations": 0}
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self._stats[name] += 1
+
+    def add_listener(self, listener: Callable[[str, TrendSnapshot], None]) -> None:
+        """Call ``listener(key, value)`` whenever a freshly loaded value is stored."""
+        with self._lock:
+            self._listeners.append(listener)
+
+    def remove_listener(self, listener: Callable[[str, TrendSnapshot], None]) -> None:
+        with self._lock:
+            if listener in self._listeners:
+                self._listeners.remove(listener)
+
+    def lookup(self, key: str) -> Optional[CacheEntry]:
+        """Return the cached entry for a key without loading, promoting shared entries locally."""
+        entry = self.local.get(key)
+        if self.shared is not None and (entry is None or not entry.is_fresh(self.clock())):
+            # Another process may have refreshed the key since we last saw it
+            try:
+                shared_entry = self.shared.get(key)
+            except Exception as e:
+                logger.warning("Shared cache read failed: %s", e)
+                shared_entry = None
+            if shared_entry is not None and (entry is None or shared_entry.stored_at > entry.stored_at):
+                entry = shared_entry
+                self.local.set(key, entry)
+        return entry
+
+    def store(self, key: str, value: TrendSnapshot, ttl: Optional[float] = None) -> CacheEntry:
+        """Put a freshly loaded value into both cache tiers."""
+        entry = CacheEntry(value, self.clock(), self.ttl if ttl is None else ttl, self.stale_ttl)
+        self.local.set(key, entry)
+        if self.shared is not None:
+            try:
+                self.shared.set(key, entry)
+            except Exception as e:
+                logger.warning("Shared cache write failed: %s", e)
+        with self._lock:
+            listeners = list(self._listeners)
+        for listener in listeners:
+            try:
+                listener(key, value)
+            except Exception as e:
+                logger.warning("Cache listener failed for %s: %s", key, e)
+        return entry
+
+    def _load(self, key: str, params: TrendRequest, ttl: Optional[float] = None) -> Tuple[CacheEntry, bool]:
+        """Load a key upstream, joining an in-flight load if there is one.
+
+        Returns the entry and whether this call joined someone else's load.
+        """
+        with self._lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._inflight[key] = future
+
+        if not leader:
+            self._count("coalesced")
+            return future.result(), True
+
+        try:
+            entry = self.store(key, self.loader(params), ttl)
+            future.set_result(entry)
+            return entry, False
+        except BaseException as e:
+            self._count("errors")
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def _revalidate(self, key: str, params: TrendRequest) -> None:
+        with self._lock:
+            if key in self._inflight:
+                return
+        self._count("revalidations")
+
+        def refresh():
+            try:
+                self._load(key, params)
+            except Exception as e:
+                logger.warning("Background refresh of %s failed: %s", key, e)
+
+        self._revalidator.submit(refresh)
+
+    def get_cached(self, params: TrendRequest, local_only: bool = False,
+                   count: bool = True) -> Optional[Tuple[TrendSnapshot, str, float]]:
+        """Answer from the cache without loading upstream.
+
+        Returns ``(response, cache_status, age_seconds)`` for fresh or stale
+        entries (scheduling a refresh for stale ones) and None on a miss.
+        With ``local_only`` the shared backend is never read, so the call
+        cannot block; None then also means the shared backend may know more.
+        Lookups are counted as demand for the prefetch scheduler unless
+        ``count`` is False.
+        """
+        key = cache_key(params)
+        now = self.clock()
+        if local_only and self.shared is not None:
+            entry = self.local.get(key)
+            if entry is None or not entry.is_fresh(now):
+                return None
+        else:
+            entry = self.lookup(key)
+        if count:
+            with self._lock:
+                # Bounded like the LRU itself
+                if key in self._requests or len(self._requests) < self.local.max_entries:
+                    self._requests[key] += 1
+
+        if entry is not None and entry.is_fresh(now):
+            self._count("hits")
+            return entry.value, HIT, entry.age(now)
+
+        if entry is not None and entry.is_usable(now):
+            self._count("stale_hits")
+            self._revalidate(key, params)
+            return entry.value, STALE, entry.age(now)
+
+        return None
+
+    def get_last_known(self, params: TrendRequest) -> Optional[Tuple[TrendSnapshot, str, float]]:
+        """Whatever is cached for a request however old, for when upstream cannot be reached."""
+        entry = self.lookup(cache_key(params))
+        if entry is None:
+            return None
+        return entry.value, STALE, entry.age(self.clock())
+
+    def inflight(self, params: TrendRequest) -> Optional[Future]:
+        """Return the future of an upstream load already running for this request, if any."""
+        with self._lock:
+            return self._inflight.get(cache_key(params))
+
+    def get(self, params: TrendRequest, count: bool = True) -> Tuple[TrendSnapshot, str, float]:
+        """Return ``(response, cache_status, age_seconds)`` for a request, loading on a miss.
+
+        Pass ``count=False`` when the caller already counted this request
+        through ``get_cached``.
+        """
+        cached = self.get_cached(params, count=count)
+        if cached is not None:
+            return cached
+
+        key = cache_key(params)
+        self._count("misses")
+        entry, _ = self._load(key, params)
+        return entry.value, MISS, entry.age(self.clock())
+
+    def refresh(self, params: TrendRequest, ttl: Optional[float] = None) -> CacheEntry:
+        """Load a request upstream and store it, regardless of what is cached.
+
+        Joins an identical load already in flight instead of starting another.
+        """
+        entry, _ = self._load(cache_key(params), params, ttl)
+        return entry
+
+    def take_request_count(self, params: TrendRequest) -> int:
+        """Number of lookups for this request since the last call, then reset it."""
+        with self._lock:
+            return self._requests.pop(cache_key(params), 0)
+
+    def invalidate(self, params: TrendRequest) -> None:
+        key = cache_key(params)
+        self.local.delete(key)
+        if self.shared is not None:
+            self.shared.delete(key)
+
+    def stats(self) -> dict:
+        """Counters plus the derived hit ratio for health checks and metrics."""
+        with self._lock:
+            stats = dict(self._stats)
+        lookups = stats["hits"] + stats["stale_hits"] + stats["misses"]
+        stats["hit_ratio"] = (stats["hits"] + stats["stale_hits"]) / lookups if lookups else 0.0
+        stats["entries"] = len(self.local)
+        return stats
+
+    def close(self) -> None:
+        self._revalidator.shutdown(wait=False)
+
+
+_trends_cache: Optional[TrendsCache] = None
+_trends_cache_lock = threading.Lock()
+
+def create_shared_backend() -> Optional[CacheBackend]:
+    """Build the shared backend selected by ``TRENDS_CACHE_BACKEND``."""
+    if CACHE_BACKEND == "sqlite":
+        return SQLiteBackend(CACHE_PATH)
+    if CACHE_BACKEND:
+        logger.warning("Unknown cache backend %r, using in-process cache only", CACHE_BACKEND)
+    return None
+
+def get_trends_cache() -> TrendsCache:
+    """Return the process-wide trends cache, creating it on first use."""
+    global _trends_cache
+    if _trends_cache is None:
+        with _trends_cache_lock:
+            if _trends_cache is None:
+                from .jobqueue import QueueLoader, get_job_queue
+                from .scraper import fetch_trends
+                shared = create_shared_backend()
+                loader = fetch_trends
+                queue = get_job_queue()
+                if queue is not None and shared is None:
+                    logger.warning("JOB_QUEUE_BACKEND needs TRENDS_CACHE_BACKEND to return results; scraping in-process")
+                elif queue is not None:
+                    # Misses are scraped by worker processes and read back from the shared backend
+                    loader = QueueLoader(queue, shared)
+                _trends_cache = TrendsCache(loader, shared=shared)
+    return _trends_cache
@@ -2,22 +2,53 @@
 """CLI script for the Google Trends backend."""
 
 import argparse
+import csv
 import logging
+import os
 import sys
+import threading
 from pathlib import Path
+from datetime import datetime
+from typing import List, Optional, Union
 
-import uvicorn
-from .api import app
+from . import scraper
+from .batch import iter_batch
+from .cache import CACHE_BACKEND, get_trends_cache
+from .history import get_history_store
+from .jobqueue import JOB_QUEUE_BACKEND, run_worker_pool
+from . import scheduler
+from .scheduler import (
+    PREFETCH_GEOS,
+    PREFETCH_HL,
+    PREFETCH_INTERVAL,
+    PrefetchScheduler,
+    default_prefetch_keys,
+    split_list,
+)
 from .scraper import fetch_trends
-from .models import TrendRequest
+from .models import HistoryPoint, TrendRequest, TrendsResponse
+from .records import TrendSnapshot
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def run_server(host: str = "127.0.0.1", port: int = 8000, reload: bool = False):
+def disable_browser():
+    """Scrape without Selenium, which then is never imported."""
+    # The environment variable carries the setting into reloader and worker subprocesses
+    os.environ["USE_SELENIUM"] = "false"
+    scraper.USE_SELENIUM = False
+
+def run_server(host: str = "127.0.0.1", port: int = 8000, reload: bool = False, prefetch: bool = False):
     """Run the FastAPI server."""
+    # FastAPI and uvicorn are only needed here, not for the other commands
+    import uvicorn
+
     logger.info(f"Starting server on {host}:{port}")
+    if prefetch:
+        # The environment variable carries the setting into reloader subprocesses
+        os.environ["PREFETCH_ENABLED"] = "true"
+        scheduler.PREFETCH_ENABLED = True
     uvicorn.run(
         "src.backend.api:app",
         host=host,
@@ -26,32 +57,113 @@ def run_server(host: str = "127.0.0.1", port: int = 8000, reload: bool = False):
         log_level="info"
     )
 
+def print_trends(trends_data: Union[TrendsResponse, TrendSnapshot]):
+    """Print a trends response to console."""
+    print(f"\n{'='*50}")
+    print(f"Google Trends for {trends_data.location} ({trends_data.language})")
+    print(f"Total trends: {trends_data.total_trends}")
+    print(f"Timestamp: {trends_data.timestamp}")
+    print(f"Source: {trends_data.source_url}")
+    print(f"{'='*50}")
+    
+    for i, trend in enumerate(trends_data.topics, 1):
+        print(f"\n{i}. {trend.title}")
+        if trend.search_volume:
+            print(f"   Search Volume: {trend.search_volume}")
+        if trend.change_percentage:
+            print(f"   Change: {trend.change_percentage}")
+        if trend.url:
+            print(f"   URL: {trend.url}")
+
 def fetch_and_print_trends(params: TrendRequest):
     """Fetch trends and print them to console."""
     try:
         logger.info(f"Fetching trends for {params.geo} in {params.hl}")
-        trends_data = fetch_trends(params)
-        
-        print(f"\n{'='*50}")
-        print(f"Google Trends for {trends_data.location} ({trends_data.language})")
-        print(f"Total trends: {trends_data.total_trends}")
-        print(f"Timestamp: {trends_data.timestamp}")
-        print(f"Source: {trends_data.source_url}")
-        print(f"{'='*50}")
-        
-        for i, trend in enumerate(trends_data.topics, 1):
-            print(f"\n{i}. {trend.title}")
-            if trend.search_volume:
-                print(f"   Search Volume: {trend.search_volume}")
-            if trend.change_percentage:
-                print(f"   Change: {trend.change_percentage}")
-            if trend.url:
-                print(f"   URL: {trend.url}")
-                
+        print_trends(fetch_trends(params))
     except Exception as e:
         logger.error(f"Error fetching trends: {e}")
         sys.exit(1)
 
+def fetch_and_print_batch(requests: List[TrendRequest], ndjson: bool = False):
+    """Fetch many regions concurrently, printing each as soon as it finishes."""
+    logger.info(f"Fetching trends for {len(requests)} regions")
+    failures = 0
+    for item in iter_batch(requests, fetch_trends):
+        if item.error:
+            failures += 1
+        if ndjson:
+            print(item.model_dump_json(), flush=True)
+        elif item.error:
+            logger.error(f"Error fetching trends for {item.request.geo} ({item.request.hl}): {item.error}")
+        else:
+            print_trends(item.result)
+    
+    if failures == len(requests):
+        sys.exit(1)
+
+def run_worker(geos: Optional[str] = None, hl: Optional[str] = None, interval: Optional[float] = None,
+               procs: int = 0, prefetch: bool = True):
+    """Run scraping processes and/or the prefetch scheduler in the foreground, writing into the shared cache."""
+    if not CACHE_BACKEND:
+        logger.warning("TRENDS_CACHE_BACKEND is not set; fetched data will not be visible to API processes")
+    if not procs and not prefetch:
+        logger.error("Nothing to run: pass --procs or leave prefetching on")
+        sys.exit(1)
+    if procs and not JOB_QUEUE_BACKEND:
+        logger.error("JOB_QUEUE_BACKEND is not set; scraping processes would have no jobs to run")
+        sys.exit(1)
+    if not prefetch:
+        run_worker_pool(procs)
+        return
+    stop_pool = threading.Event()
+    if procs:
+        # Prefetches are queued like any other miss and scraped by the pool
+        pool = threading.Thread(target=run_worker_pool, args=(procs, stop_pool), name="worker-pool", daemon=True)
+        pool.start()
+    keys = default_prefetch_keys(geos, hl)
+    scheduler = PrefetchScheduler(
+        get_trends_cache(),
+        keys,
+        interval=interval if interval is not None else PREFETCH_INTERVAL,
+    )
+    logger.info(f"Starting prefetch worker for {len(keys)} keys")
+    try:
+        scheduler.run_forever()
+    finally:
+        if procs:
+            stop_pool.set()
+            pool.join()
+
+def export_history(
+    output: Optional[str] = None,
+    fmt: str = "ndjson",
+    geo: Optional[str] = None,
+    hl: Optional[str] = None,
+    title: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+):
+    """Write recorded history as NDJSON or CSV to a file or stdout."""
+    # Rows are written straight from the compact records, without building a model per point
+    records = get_history_store().iter_records(start=start, end=end, geo=geo, hl=hl, title=title)
+    out = open(output, "w", encoding="utf-8", newline="") if output else sys.stdout
+    count = 0
+    try:
+        if fmt == "csv":
+            writer = csv.writer(out)
+            writer.writerow(HistoryPoint.model_fields)
+            for record in records:
+                writer.writerow(["" if value is None else value for value in record.as_row()])
+                count += 1
+        else:
+            for record in records:
+                out.write(record.to_json().decode() + "\n")
+                count += 1
+    finally:
+        if output:
+            out.close()
+    logger.info(f"Exported {count} history points")
+
 def main():
     """Main CLI entry point."""
     parser = argparse.ArgumentParser(description="Google Trends API CLI")
@@ -62,30 +174,80 @@ def main():
     server_parser.add_argument("--host", default="127.0.0.1", help="Host to bind to")
     server_parser.add_argument("--port", type=int, default=8000, help="Port to bind to")
     server_parser.add_argument("--reload", action="store_true", help="Enable auto-reload")
+    server_parser.add_argument("--prefetch", action="store_true", help="Keep hot regions warm with the in-process prefetch scheduler")
+    server_parser.add_argument("--no-browser", action="store_true", help="Never start Chrome; use plain HTTP, RPC and RSS")
+    
+    # Worker command
+    worker_parser = subparsers.add_parser("worker", help="Run scraping processes and the prefetch scheduler without the API")
+    worker_parser.add_argument("--procs", type=int, default=0, help="Scraping processes taking jobs from JOB_QUEUE_BACKEND (default: 0)")
+    worker_parser.add_argument("--no-prefetch", action="store_true", help="Only run the scraping processes")
+    worker_parser.add_argument("--no-browser", action="store_true", help="Never start Chrome; use plain HTTP, RPC and RSS")
+    worker_parser.add_argument("--geos", help=f"Comma-separated locations (default: {PREFETCH_GEOS})")
+    worker_parser.add_argument("--hl", help=f"Comma-separated languages (default: {PREFETCH_HL})")
+    worker_parser.add_argument("--interval", type=float, help=f"Base refresh interval in seconds (default: {PREFETCH_INTERVAL:.0f})")
     
     # Fetch command
     fetch_parser = subparsers.add_parser("fetch", help="Fetch trends and print to console")
-    fetch_parser.add_argument("--geo", default="HK", help="Location (default: HK)")
-    fetch_parser.add_argument("--hl", default="en", help="Language (default: en)")
+    fetch_parser.add_argument("--geo", default="HK", help="Location, or comma-separated locations (default: HK)")
+    fetch_parser.add_argument("--hl", default="en", help="Language, or comma-separated languages (default: en)")
     fetch_parser.add_argument("--hours", type=int, help="Hours to look back")
     fetch_parser.add_argument("--category", help="Category filter")
     fetch_parser.add_argument("--sort", help="Sort method")
     fetch_parser.add_argument("--status", help="Status filter")
+    fetch_parser.add_argument("--ndjson", action="store_true", help="Print one JSON result per line")
+    fetch_parser.add_argument("--no-browser", action="store_true", help="Never start Chrome; use plain HTTP, RPC and RSS")
+    
+    # History command
+    history_parser = subparsers.add_parser("history", help="Work with recorded trends history")
+    history_subparsers = history_parser.add_subparsers(dest="history_command")
+    export_parser = history_subparsers.add_parser("export", help="Export recorded history")
+    export_parser.add_argument("--output", "-o", help="File to write (default: stdout)")
+    export_parser.add_argument("--format", choices=("ndjson", "csv"), default="ndjson", help="Output format (default: ndjson)")
+    export_parser.add_argument("--geo", help="Only this location")
+    export_parser.add_argument("--hl", help="Only this language")
+    export_parser.add_argument("--title", help="Only this trend title")
+    export_parser.add_argument("--start", type=datetime.fromisoformat, help="Earliest fetch time (ISO 8601)")
+    export_parser.add_argument("--end", type=datetime.fromisoformat, help="Fetches before this time (ISO 8601)")
     
     args = parser.parse_args()
+    if getattr(args, "no_browser", False):
+        disable_browser()
     
     if args.command == "server":
-        run_server(host=args.host, port=args.port, reload=args.reload)
+        run_server(host=args.host, port=args.port, reload=args.reload, prefetch=args.prefetch)
+    elif args.command == "worker":
+        run_worker(geos=args.geos, hl=args.hl, interval=args.interval, procs=args.procs, prefetch=not args.no_prefetch)
     elif args.command == "fetch":
-        params = TrendRequest(
+        requests = [
+            TrendRequest(
+                geo=geo,
+                hl=hl,
+                hours=args.hours,
+                category=args.category,
+                sort=args.sort,
+                status=args.status
+            )
+            for geo in split_list(args.geo)
+            for hl in split_list(args.hl)
+        ]
+        if not requests:
+            fetch_parser.error("--geo and --hl need at least one value each")
+        if len(requests) > 1 or args.ndjson:
+            fetch_and_print_batch(requests, ndjson=args.ndjson)
+        else:
+            fetch_and_print_trends(requests[0])
+    elif args.command == "history" and args.history_command == "export":
+        export_history(
+            output=args.output,
+            fmt=args.format,
             geo=args.geo,
             hl=args.hl,
-            hours=args.hours,
-            category=args.category,
-            sort=args.sort,
-            status=args.status
+            title=args.title,
+            start=args.start,
+            end=args.end,
         )
-        fetch_and_print_trends(params)
+    elif args.command == "history":
+        history_parser.print_help()
     else:
         parser.print_help()
 
@@ -0,0 +1,176 @@
+"""Sampled, asynchronous capture of rendered pages for debugging.
+
+Pages are captured for one request in ``DEBUG_CAPTURE_SAMPLE_RATE`` or
+when the current request asked for it (``?debug=1`` or the
+``X-Debug-Capture`` header, see ``requested``). Captures are handed to a
+background writer thread and stored under their SHA-256 digest, so
+identical pages are written once and concurrent requests never share a
+file. The store is rotated to stay under a file count and byte budget.
+"""
+
+import hashlib
+import itertools
+import logging
+import os
+import queue
+import threading
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+DEBUG_CAPTURE_DIR = os.getenv("DEBUG_CAPTURE_DIR", "debug_captures")
+# Capture one request in N; 0 only captures on demand
+DEBUG_CAPTURE_SAMPLE_RATE = int(os.getenv("DEBUG_CAPTURE_SAMPLE_RATE", "0"))
+DEBUG_CAPTURE_MAX_FILES = int(os.getenv("DEBUG_CAPTURE_MAX_FILES", "50"))
+DEBUG_CAPTURE_MAX_BYTES = int(os.getenv("DEBUG_CAPTURE_MAX_BYTES", str(200 * 1024 * 1024)))
+# Pending captures held in memory; further captures are dropped while the writer catches up
+DEBUG_CAPTURE_QUEUE_SIZE = int(os.getenv("DEBUG_CAPTURE_QUEUE_SIZE", "8"))
+
+# Set for the duration of a request that asked for a capture
+requested: ContextVar[bool] = ContextVar("debug_capture_requested", default=False)
+
+
+@dataclass
+class Capture:
+    content: str
+    label: str
+
+
+class CaptureStore:
+    """Directory of content-addressed captures with size-bounded rotation."""
+
+    def __init__(self, directory: str = DEBUG_CAPTURE_DIR, max_files: int = DEBUG_CAPTURE_MAX_FILES,
+                 max_bytes: int = DEBUG_CAPTURE_MAX_BYTES):
+        self.directory = directory
+        self.max_files = max_files
+        self.max_bytes = max_bytes
+
+    def write(self, content: str, label: str = "page") -> str:
+        """Store ``content`` and return its path; an existing identical capture is reused."""
+        data = content.encode("utf-8")
+        digest = hashlib.sha256(data).hexdigest()
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, f"{digest}.html")
+        if os.path.exists(path):
+            # Refresh the mtime so rotation keeps recently seen pages
+            os.utime(path)
+        else:
+            tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+        logger.info("Captured %s page (%d bytes) to %s", label, len(data), path)
+        self.rotate()
+        return path
+
+    def rotate(self) -> None:
+        """Delete the oldest captures until the file and byte budgets are met."""
+        entries = []
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if entry.name.endswith(".html"):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+        entries.sort()
+        total = sum(size for _, size, _ in entries)
+        while entries and (len(entries) > self.max_files or total > self.max_bytes):
+            _, size, path = entries.pop(0)
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+
+class DebugCapture:
+    """Decides which pages to capture and writes them on a background thread."""
+
+    def __init__(self, store: Optional[CaptureStore] = None, sample_rate: int = DEBUG_CAPTURE_SAMPLE_RATE,
+                 queue_size: int = DEBUG_CAPTURE_QUEUE_SIZE):
+        self.store = store or CaptureStore()
+        self.sample_rate = sample_rate
+        self._counter = itertools.count(1)
+        self._queue: "queue.Queue[Optional[Capture]]" = queue.Queue(maxsize=queue_size)
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._stats = {"captured": 0, "dropped": 0, "errors": 0}
+
+    def should_capture(self) -> bool:
+        if requested.get():
+            return True
+        return self.sample_rate > 0 and next(self._counter) % self.sample_rate == 0
+
+    def maybe_capture(self, content: str, label: str = "page") -> bool:
+        """Queue ``content`` for writing if this request is sampled or asked for it."""
+        if not content or not self.should_capture():
+            return False
+        return self.capture(content, label)
+
+    def capture(self, content: str, label: str = "page") -> bool:
+        """Queue ``content`` for writing without blocking; returns False if it was dropped."""
+        self._ensure_writer()
+        try:
+            self._queue.put_nowait(Capture(content, label))
+            return True
+        except queue.Full:
+            with self._lock:
+                self._stats["dropped"] += 1
+            return False
+
+    def _ensure_writer(self) -> None:
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._write_loop, name="debug-capture", daemon=True)
+                    self._thread.start()
+
+    def _write_loop(self) -> None:
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:
+                    return
+                self.store.write(item.content, item.label)
+                with self._lock:
+                    self._stats["captured"] += 1
+            except Exception as e:
+                logger.warning("Failed to write debug capture: %s", e)
+                with self._lock:
+                    self._stats["errors"] += 1
+            finally:
+                self._queue.task_done()
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """Wait until queued captures are written; returns False on timeout."""
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks:
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {**self._stats, "queued": self._queue.qsize(), "sample_rate": self.sample_rate}
+
+    def close(self) -> None:
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join(timeout=5)
+            self._thread = None
+
+
+_debug_capture: Optional[DebugCapture] = None
+_debug_capture_lock = threading.Lock()
+
+def get_debug_capture() -> DebugCapture:
+    """Return the process-wide debug capture, creating it on first use."""
+    global _debug_capture
+    if _debug_capture is None:
+        with _debug_capture_lock:
+            if _debug_capture is None:
+                _debug_capture = DebugCapture()
+    return _debug_capture
@@ -0,0 +1,61 @@
+"""Change events between consecutive snapshots of the same trends query."""
+
+from typing import Dict, List, Optional
+
+from .models import TrendEvent
+from .records import TrendRecord, TrendSnapshot
+
+ENTERED = "entered"
+EXITED = "exited"
+RANK_CHANGED = "rank_changed"
+VOLUME_CHANGED = "volume_changed"
+
+def index_by_title(topics: List[TrendRecord]) -> Dict[str, TrendRecord]:
+    """Map each title to its topic; the first occurrence wins for duplicate titles."""
+    index: Dict[str, TrendRecord] = {}
+    for topic in topics:
+        index.setdefault(topic.title, topic)
+    return index
+
+def _event(kind: str, current: TrendSnapshot, topic: TrendRecord, previous: Optional[TrendRecord] = None,
+           present: bool = True) -> TrendEvent:
+    return TrendEvent(
+        type=kind,
+        title=topic.title,
+        location=current.location,
+        language=current.language,
+        timestamp=current.timestamp,
+        ranking=topic.ranking if present else None,
+        previous_ranking=previous.ranking if previous is not None else None,
+        search_volume=topic.search_volume if present else None,
+        previous_search_volume=previous.search_volume if previous is not None else None,
+        search_volume_min=topic.search_volume_min if present else None,
+        previous_search_volume_min=previous.search_volume_min if previous is not None else None,
+    )
+
+def diff_snapshots(previous: Optional[TrendSnapshot], current: TrendSnapshot,
+                   previous_index: Optional[Dict[str, TrendRecord]] = None) -> List[TrendEvent]:
+    """Events that turn ``previous`` into ``current``, in the order of ``current``.
+
+    Runs in O(n) using a title index; pass ``previous_index`` to reuse one
+    built when ``previous`` was the current snapshot.
+    """
+    if previous is None:
+        return []
+    before = previous_index if previous_index is not None else index_by_title(previous.topics)
+    after = index_by_title(current.topics)
+
+    events = []
+    for title, topic in after.items():
+        old = before.get(title)
+        if old is None:
+            events.append(_event(ENTERED, current, topic))
+            continue
+        if topic.ranking != old.ranking:
+            events.append(_event(RANK_CHANGED, current, topic, old))
+        if topic.search_volume != old.search_volume:
+            events.append(_event(VOLUME_CHANGED, current, topic, old))
+    for title, old in before.items():
+        if title not in after:
+            events.append(_event(EXITED, current, old, old, present=False))
+    return events
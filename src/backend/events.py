@@ -0,0 +1,162 @@
+"""Fan-out of trend change events to streaming subscribers.
+
+The hub remembers the last snapshot of every query key it has seen. When
+a new snapshot arrives (from the cache, or observed by a subscriber) it is
+diffed against the previous one once, and the events are pushed to every
+subscriber of that key. Each subscriber has a bounded queue: a slow client
+whose queue fills up loses its queued events and is sent a ``resync``
+marker instead of making the publisher wait or memory grow.
+"""
+
+import asyncio
+import logging
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Set, Tuple
+
+from .cache import CACHE_MAX_ENTRIES
+from .diff import diff_snapshots, index_by_title
+from .models import TrendEvent
+from .records import TrendRecord, TrendSnapshot
+
+logger = logging.getLogger(__name__)
+
+# Events buffered per subscriber before it is sent a resync instead
+EVENTS_QUEUE_SIZE = int(os.getenv("EVENTS_QUEUE_SIZE", "256"))
+# Seconds between refreshes of a subscribed query (served by the cache unless stale)
+EVENTS_POLL_INTERVAL = float(os.getenv("EVENTS_POLL_INTERVAL", "15"))
+
+RESYNC = "resync"
+
+
+class Subscription:
+    """One streaming client's view of a query key."""
+
+    def __init__(self, key: str, loop: asyncio.AbstractEventLoop, max_queue: int = EVENTS_QUEUE_SIZE):
+        self.key = key
+        self.loop = loop
+        self.queue: "asyncio.Queue[TrendEvent]" = asyncio.Queue(maxsize=max_queue)
+        self.dropped = 0
+        self._resync_pending = False
+
+    def _deliver(self, events: List[TrendEvent]) -> None:
+        """Queue events on the subscriber's loop, or switch to a resync once the queue is full.
+
+        A resync replaces everything queued: the client reloads the whole
+        state, so neither the queued events nor any arriving until it has
+        done so may be applied on top of it.
+        """
+        for event in events:
+            if not self._resync_pending and self.queue.full():
+                self._resync_pending = True
+                self.dropped += self.queue.qsize()
+                while not self.queue.empty():
+                    self.queue.get_nowait()
+            if self._resync_pending:
+                self.dropped += 1
+            else:
+                self.queue.put_nowait(event)
+
+    def resync(self) -> None:
+        """Make the next ``get`` return a resync again, e.g. after reloading the state failed.
+
+        Call from the subscriber's loop. Events queued since the last resync
+        are dropped with it.
+        """
+        self._resync_pending = True
+        self.dropped += self.queue.qsize()
+        while not self.queue.empty():
+            self.queue.get_nowait()
+
+    async def get(self, timeout: Optional[float] = None) -> Tuple[str, Optional[TrendEvent]]:
+        """Next ``(type, event)``; ``(RESYNC, None)`` after events were dropped.
+
+        After a resync only events published from then on are returned.
+        Raises ``asyncio.TimeoutError`` when nothing arrives within ``timeout``.
+        """
+        if self._resync_pending:
+            self._resync_pending = False
+            return RESYNC, None
+        event = await asyncio.wait_for(self.queue.get(), timeout)
+        return event.type, event
+
+
+class EventHub:
+    """Diffs snapshots per key and pushes the events to subscribers."""
+
+    def __init__(self, max_keys: int = CACHE_MAX_ENTRIES, max_queue: int = EVENTS_QUEUE_SIZE):
+        self.max_keys = max_keys
+        self.max_queue = max_queue
+        self._snapshots: "OrderedDict[str, Tuple[TrendSnapshot, Dict[str, TrendRecord]]]" = OrderedDict()
+        self._subscribers: Dict[str, Set[Subscription]] = {}
+        self._lock = threading.Lock()
+        self._stats = {"published": 0, "events": 0}
+
+    def subscribe(self, key: str) -> Subscription:
+        """Register the calling event loop's task for events of ``key``."""
+        subscription = Subscription(key, asyncio.get_running_loop(), self.max_queue)
+        with self._lock:
+            self._subscribers.setdefault(key, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.key)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.key]
+
+    def publish(self, key: str, snapshot: TrendSnapshot) -> List[TrendEvent]:
+        """Record ``snapshot`` as the latest for ``key`` and push the resulting events.
+
+        Safe to call from any thread. Publishing the snapshot that is already
+        the latest is a no-op, so observers may publish whatever they read.
+        """
+        with self._lock:
+            previous = self._snapshots.get(key)
+            if previous is not None and previous[0] is snapshot:
+                return []
+            index = index_by_title(snapshot.topics)
+            self._snapshots[key] = (snapshot, index)
+            self._snapshots.move_to_end(key)
+            while len(self._snapshots) > self.max_keys:
+                self._snapshots.popitem(last=False)
+            subscribers = list(self._subscribers.get(key, ()))
+
+        if previous is None:
+            return []
+        events = diff_snapshots(previous[0], snapshot, previous[1])
+        with self._lock:
+            self._stats["published"] += 1
+            self._stats["events"] += len(events)
+        if events:
+            for subscription in subscribers:
+                try:
+                    subscription.loop.call_soon_threadsafe(subscription._deliver, events)
+                except RuntimeError:
+                    # The subscriber's loop is closed; it will unsubscribe itself
+                    pass
+        return events
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                **self._stats,
+                "keys": len(self._snapshots),
+                "subscribers": sum(len(s) for s in self._subscribers.values()),
+            }
+
+
+_event_hub: Optional[EventHub] = None
+_event_hub_lock = threading.Lock()
+
+def get_event_hub() -> EventHub:
+    """Return the process-wide event hub, creating it on first use."""
+    global _event_hub
+    if _event_hub is None:
+        with _event_hub_lock:
+            if _event_hub is None:
+                _event_hub = EventHub()
+    return _event_hub
@@ -0,0 +1,101 @@
+"""Bounded thread pool that keeps blocking scrapes off the event loop."""
+
+import asyncio
+import contextvars
+import functools
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+# Scrapes allowed to run at the same time
+SCRAPE_MAX_CONCURRENCY = int(os.getenv("SCRAPE_MAX_CONCURRENCY", "4"))
+# Scrapes allowed to wait for a free slot before new ones are rejected
+SCRAPE_MAX_QUEUE = int(os.getenv("SCRAPE_MAX_QUEUE", "16"))
+# Seconds suggested to rejected clients through the Retry-After header
+SCRAPE_RETRY_AFTER = int(os.getenv("SCRAPE_RETRY_AFTER", "5"))
+
+
+class ServiceBusy(Exception):
+    """Raised when the scrape queue is full and a request must be rejected."""
+
+    def __init__(self, retry_after: int = SCRAPE_RETRY_AFTER, message: Optional[str] = None):
+        super().__init__(message or f"Scrape queue is full, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+class BoundedExecutor:
+    """Thread pool with a cap on running plus queued jobs.
+
+    Jobs beyond ``max_workers`` wait in the pool's queue; once
+    ``max_workers + max_queue`` jobs are pending, ``run`` raises
+    ``ServiceBusy`` immediately instead of letting requests pile up.
+    """
+
+    def __init__(
+        self,
+        max_workers: int = SCRAPE_MAX_CONCURRENCY,
+        max_queue: int = SCRAPE_MAX_QUEUE,
+        retry_after: int = SCRAPE_RETRY_AFTER,
+        thread_name_prefix: str = "scrape",
+    ):
+        self.max_workers = max(1, max_workers)
+        self.max_queue = max(0, max_queue)
+        self.retry_after = retry_after
+        self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix=thread_name_prefix)
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._rejected = 0
+
+    def _admit(self) -> None:
+        with self._lock:
+            if self._pending >= self.max_workers + self.max_queue:
+                self._rejected += 1
+                raise ServiceBusy(self.retry_after)
+            self._pending += 1
+
+    def _release(self) -> None:
+        with self._lock:
+            self._pending -= 1
+
+    async def run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        """Run a blocking callable in the pool, preserving the caller's context variables."""
+        self._admit()
+        try:
+            call = functools.partial(contextvars.copy_context().run, fn, *args)
+            future = self._pool.submit(call)
+        except BaseException:
+            self._release()
+            raise
+        # Release on completion rather than when the caller stops waiting, so a
+        # disconnected client doesn't free a slot its scrape is still using
+        future.add_done_callback(lambda _: self._release())
+        return await asyncio.wrap_future(future)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "max_workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "pending": self._pending,
+                "rejected": self._rejected,
+            }
+
+    def shutdown(self) -> None:
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+_scrape_executor = None
+_scrape_executor_lock = threading.Lock()
+
+def get_scrape_executor() -> BoundedExecutor:
+    """Return the process-wide scrape executor, creating it on first use."""
+    global _scrape_executor
+    if _scrape_executor is None:
+        with _scrape_executor_lock:
+            if _scrape_executor is None:
+                _scrape_executor = BoundedExecutor()
+    return _scrape_executor
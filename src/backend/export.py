@@ -0,0 +1,167 @@
+"""Streaming serialization of trend responses for downloads.
+
+Every format is produced as an iterator of byte chunks straight from the
+cached ``TrendRecord``s, optionally compressed on the fly, so downloads
+never build pydantic models or touch the filesystem.
+"""
+
+import csv
+import importlib.util
+import io
+import re
+import zlib
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+
+from pydantic_core import to_json
+
+from .records import TREND_FIELDS, TrendRecord, TrendSnapshot
+
+# Optional encoders: Parquet needs pyarrow, brotli and zstd need their bindings.
+# They are only imported by the first export that uses them.
+HAS_PYARROW = importlib.util.find_spec("pyarrow") is not None
+HAS_BROTLI = importlib.util.find_spec("brotli") is not None
+HAS_ZSTD = importlib.util.find_spec("zstandard") is not None
+
+FORMATS = ("json", "ndjson", "csv", "parquet")
+COMPRESSIONS = ("gzip", "br", "zstd")
+
+MEDIA_TYPES = {
+    "json": "application/json",
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+    "parquet": "application/vnd.apache.parquet",
+}
+COMPRESSED_MEDIA_TYPES = {"gzip": "application/gzip", "br": "application/x-brotli", "zstd": "application/zstd"}
+COMPRESSED_EXTENSIONS = {"gzip": "gz", "br": "br", "zstd": "zst"}
+
+CSV_COLUMNS = list(TREND_FIELDS)
+
+# Characters replaced in download file names
+UNSAFE_FILENAME = re.compile(r"[^A-Za-z0-9_.-]")
+
+# Topics serialized per yielded chunk
+CHUNK_TOPICS = 100
+
+
+class ExportUnavailable(ValueError):
+    """Raised for unknown formats or ones whose optional dependency is missing."""
+
+
+def _chunks(topics: List[TrendRecord], size: int = CHUNK_TOPICS) -> Iterator[List[TrendRecord]]:
+    for start in range(0, len(topics), size):
+        yield topics[start:start + size]
+
+def iter_json(data: TrendSnapshot) -> Iterator[bytes]:
+    """Same bytes as ``data.to_json()``, produced a few topics at a time."""
+    # The envelope is everything but the topics, which come first in the model
+    envelope = to_json(data.as_dict(topics=False))
+    yield b'{"topics":['
+    first = True
+    for chunk in _chunks(data.topics):
+        encoded = b",".join(topic.to_json() for topic in chunk)
+        yield encoded if first else b"," + encoded
+        first = False
+    yield b"]," + envelope[1:] if envelope != b"{}" else b"]}"
+
+def iter_ndjson(data: TrendSnapshot) -> Iterator[bytes]:
+    """One JSON object per topic."""
+    for chunk in _chunks(data.topics):
+        yield b"".join(topic.to_json() + b"\n" for topic in chunk)
+
+def iter_csv(data: TrendSnapshot) -> Iterator[bytes]:
+    """Topics as CSV with a header row; related queries are joined with ``; ``."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(CSV_COLUMNS)
+    for chunk in _chunks(data.topics):
+        for topic in chunk:
+            row = topic.as_dict()
+            if row["related_queries"]:
+                row["related_queries"] = "; ".join(row["related_queries"])
+            writer.writerow(["" if row[column] is None else row[column] for column in CSV_COLUMNS])
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+def iter_parquet(data: TrendSnapshot) -> Iterator[bytes]:
+    """Topics as a single Parquet file built in memory."""
+    if not HAS_PYARROW:
+        raise ExportUnavailable("Parquet export requires pyarrow (pip install pyarrow)")
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    rows = [topic.as_dict() for topic in data.topics]
+    table = pa.Table.from_pylist(rows, schema=pa.schema([
+        ("title", pa.string()),
+        ("search_volume", pa.string()),
+        ("ranking", pa.int32()),
+        ("change_percentage", pa.string()),
+        ("related_queries", pa.list_(pa.string())),
+        ("url", pa.string()),
+        ("search_volume_min", pa.int64()),
+        ("change_percent", pa.float64()),
+    ]))
+    sink = pa.BufferOutputStream()
+    pq.write_table(table, sink, compression="zstd")
+    yield sink.getvalue().to_pybytes()
+
+SERIALIZERS: Dict[str, Callable[[TrendSnapshot], Iterator[bytes]]] = {
+    "json": iter_json,
+    "ndjson": iter_ndjson,
+    "csv": iter_csv,
+    "parquet": iter_parquet,
+}
+
+def _compressor(compression: str):
+    if compression == "gzip":
+        return zlib.compressobj(6, zlib.DEFLATED, 31)
+    if compression == "br" and HAS_BROTLI:
+        import brotli
+        return brotli.Compressor()
+    if compression == "zstd" and HAS_ZSTD:
+        import zstandard
+        return zstandard.ZstdCompressor().compressobj()
+    raise ExportUnavailable(f"Compression {compression!r} is not available")
+
+def compress(chunks: Iterable[bytes], compression: str) -> Iterator[bytes]:
+    """Compress a stream of chunks incrementally."""
+    compressor = _compressor(compression)
+    for chunk in chunks:
+        # brotli's Compressor has process(); zlib and zstd use compress()
+        out = compressor.process(chunk) if compression == "br" else compressor.compress(chunk)
+        if out:
+            yield out
+    tail = compressor.finish() if compression == "br" else compressor.flush()
+    if tail:
+        yield tail
+
+def check_export(fmt: str, compression: Optional[str] = None) -> None:
+    """Raise ``ExportUnavailable`` before any work is done for unsupported options."""
+    if fmt not in FORMATS:
+        raise ExportUnavailable(f"Unknown format {fmt!r}, expected one of {', '.join(FORMATS)}")
+    if fmt == "parquet" and not HAS_PYARROW:
+        raise ExportUnavailable("Parquet export requires pyarrow (pip install pyarrow)")
+    if compression is not None:
+        if compression not in COMPRESSIONS:
+            raise ExportUnavailable(f"Unknown compression {compression!r}, expected one of {', '.join(COMPRESSIONS)}")
+        _compressor(compression)
+
+def export(data: TrendSnapshot, fmt: str = "json", compression: Optional[str] = None) -> Iterator[bytes]:
+    """Serialize ``data`` as ``fmt``, optionally compressed, as an iterator of bytes."""
+    check_export(fmt, compression)
+    chunks = SERIALIZERS[fmt](data)
+    return compress(chunks, compression) if compression else chunks
+
+def media_type(fmt: str, compression: Optional[str] = None) -> str:
+    return COMPRESSED_MEDIA_TYPES[compression] if compression else MEDIA_TYPES[fmt]
+
+def filename(stem: str, fmt: str, compression: Optional[str] = None) -> str:
+    """Download file name, safe to quote in a Content-Disposition header.
+
+    ``stem`` comes partly from query parameters, so anything but
+    ``[A-Za-z0-9_.-]`` is replaced with ``_``.
+    """
+    name = f"{UNSAFE_FILENAME.sub('_', stem)}.{fmt}"
+    return f"{name}.{COMPRESSED_EXTENSIONS[compression]}" if compression else name
@@ -0,0 +1,164 @@
+"""Deadline-bounded, hedged execution of fallback tiers.
+
+``race`` starts the first tier at once and each further tier either after
+``hedge_delay`` seconds or as soon as every running tier has finished
+without a result, whichever comes first. Tiers are ranked by fidelity, how
+much of each trend they return: an acceptable result wins as soon as no
+richer tier can still answer. A poorer result that comes in first is held
+back until the richer tiers have failed or the deadline is close. The
+losing tiers are told to stop through a shared event and abandoned.
+Nothing runs past the overall deadline.
+"""
+
+import contextvars
+import logging
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from itertools import chain
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from .executor import SCRAPE_MAX_CONCURRENCY
+
+logger = logging.getLogger(__name__)
+
+# Overall budget for one fetch across every tier, in seconds
+FETCH_DEADLINE = float(os.getenv("FETCH_DEADLINE", "20"))
+# Seconds a tier gets to itself before the next one is started alongside it
+HEDGE_DELAY = float(os.getenv("HEDGE_DELAY", "2"))
+# Seconds before the deadline at which a held lower-fidelity result is taken
+# rather than waiting any longer for a richer tier
+FALLBACK_MARGIN = float(os.getenv("FETCH_FALLBACK_MARGIN", "2"))
+
+
+class Deadline:
+    """A fixed point in time that budgets are carved from."""
+
+    def __init__(self, seconds: float, clock: Callable[[], float] = time.monotonic):
+        self.clock = clock
+        self.started = clock()
+        self.expires = self.started + seconds
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires - self.clock())
+
+    def cap(self, seconds: float) -> float:
+        """``seconds``, shortened to what is left of the deadline."""
+        return min(seconds, self.remaining())
+
+    def elapsed(self) -> float:
+        return self.clock() - self.started
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+
+@dataclass
+class Tier:
+    """A named way of producing a result.
+
+    ``run`` receives the deadline and an event that is set once another tier
+    has won, so long-running work can stop early. ``fidelity`` ranks how
+    much data its results carry; higher is richer.
+    """
+
+    name: str
+    run: Callable[[Deadline, threading.Event], Any]
+    fidelity: int = 0
+
+
+@dataclass
+class RaceResult:
+    """The winning tier and its value (None when no tier was accepted) and every tier error."""
+
+    tier: Optional[str]
+    value: Any
+    errors: Dict[str, BaseException] = field(default_factory=dict)
+
+
+_hedge_pool: Optional[ThreadPoolExecutor] = None
+_hedge_pool_lock = threading.Lock()
+
+def get_hedge_pool() -> ThreadPoolExecutor:
+    """Threads running tiers; sized so every scrape can run a few tiers at once."""
+    global _hedge_pool
+    if _hedge_pool is None:
+        with _hedge_pool_lock:
+            if _hedge_pool is None:
+                _hedge_pool = ThreadPoolExecutor(max_workers=SCRAPE_MAX_CONCURRENCY * 3, thread_name_prefix="tier")
+    return _hedge_pool
+
+def race(
+    tiers: Sequence[Tier],
+    deadline: Deadline,
+    accept: Callable[[Any], bool] = bool,
+    hedge_delay: float = HEDGE_DELAY,
+    fallback_margin: float = FALLBACK_MARGIN,
+    pool: Optional[ThreadPoolExecutor] = None,
+) -> RaceResult:
+    """Run ``tiers`` hedged against each other and return the richest accepted result.
+
+    An accepted result is returned at once unless a tier of higher fidelity
+    is still running or yet to start. It is then held, and returned once
+    every richer tier has finished without a result or when less than
+    ``fallback_margin`` seconds of the deadline are left.
+    """
+    pool = pool or get_hedge_pool()
+    cancelled = threading.Event()
+    running: Dict[Future, Tier] = {}
+    errors: Dict[str, BaseException] = {}
+    upcoming: List[Tier] = list(tiers)
+    held: Optional[Tuple[Tier, Any]] = None
+    next_start = deadline.clock()
+
+    def richer_pending(fidelity: int) -> bool:
+        return any(tier.fidelity > fidelity for tier in chain(running.values(), upcoming))
+
+    try:
+        while True:
+            if upcoming and (not running or deadline.clock() >= next_start) and not deadline.expired:
+                tier = upcoming.pop(0)
+                # Tiers see the caller's context variables, e.g. a requested debug capture
+                call = contextvars.copy_context().run
+                running[pool.submit(call, tier.run, deadline, cancelled)] = tier
+                next_start = deadline.clock() + hedge_delay
+                continue
+            if held is not None:
+                tier, value = held
+                if not richer_pending(tier.fidelity):
+                    return RaceResult(tier.name, value, errors)
+                if deadline.remaining() <= fallback_margin:
+                    logger.warning("Fetch deadline close, taking %s's result over %s", tier.name,
+                                   ", ".join(t.name for t in chain(running.values(), upcoming) if t.fidelity > tier.fidelity))
+                    return RaceResult(tier.name, value, errors)
+            if not running or deadline.expired:
+                if running:
+                    logger.warning("Fetch deadline reached with %s still running",
+                                   ", ".join(tier.name for tier in running.values()))
+                return RaceResult(None, None, errors)
+
+            timeout = deadline.remaining()
+            if upcoming:
+                timeout = min(timeout, max(0.0, next_start - deadline.clock()))
+            if held is not None:
+                timeout = min(timeout, max(0.0, deadline.remaining() - fallback_margin))
+            done, _ = wait(list(running), timeout=timeout, return_when=FIRST_COMPLETED)
+            for future in done:
+                tier = running.pop(future)
+                try:
+                    value = future.result()
+                except Exception as e:
+                    logger.warning("Tier %s failed: %s", tier.name, e)
+                    errors[tier.name] = e
+                    continue
+                if not accept(value):
+                    logger.info("Tier %s returned no usable result", tier.name)
+                elif held is None or tier.fidelity > held[0].fidelity:
+                    held = tier, value
+    finally:
+        cancelled.set()
+        for future in running:
+            future.cancel()
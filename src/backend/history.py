@@ -0,0 +1,438 @@
+"""Append-only history of fetched trends in SQLite.
+
+Every upstream fetch is stored as a snapshot row plus one compact row per
+trend. Titles are dictionary-encoded in their own table so the per-trend
+rows only hold integers and short strings, and indexes on
+``(geo, fetched_at)`` and ``(title_id, snapshot_id)`` keep range and
+per-title scans fast at millions of rows. Reads go through a memory-mapped
+connection of their own so they never wait on writers, and fetches hand
+their snapshot to a background writer so they never wait on SQLite either.
+Snapshots older than ``HISTORY_MAX_AGE_DAYS`` are pruned as new ones arrive.
+"""
+
+import logging
+import os
+import queue
+import sqlite3
+import sys
+import threading
+import time
+from datetime import datetime
+from typing import Iterator, List, Optional, Tuple
+
+from pydantic_core import to_json
+
+from .models import HistoryPoint, HistorySummary, TrendRequest
+from .records import TrendSnapshot
+
+logger = logging.getLogger(__name__)
+
+# Off by default: the database grows with every upstream fetch
+HISTORY_ENABLED = os.getenv("HISTORY_ENABLED", "false").lower() == "true"
+HISTORY_PATH = os.getenv("HISTORY_PATH", "trends_history.sqlite3")
+# Days of snapshots kept before the newest one (0 keeps everything)
+HISTORY_MAX_AGE_DAYS = float(os.getenv("HISTORY_MAX_AGE_DAYS", "30"))
+# Snapshots waiting for the background writer before new ones are dropped
+HISTORY_QUEUE_SIZE = int(os.getenv("HISTORY_QUEUE_SIZE", "64"))
+# Bytes of the database file mapped into memory for reads
+HISTORY_MMAP_SIZE = int(os.getenv("HISTORY_MMAP_SIZE", str(256 * 1024 * 1024)))
+# Largest number of points returned by one query
+HISTORY_MAX_ROWS = int(os.getenv("HISTORY_MAX_ROWS", "10000"))
+
+# Remembered title ids; cleared when full
+TITLE_CACHE_SIZE = 100_000
+# Seconds of recorded time between two retention passes
+PRUNE_INTERVAL = 3600
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS titles (
+    id INTEGER PRIMARY KEY,
+    title TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS snapshots (
+    id INTEGER PRIMARY KEY,
+    fetched_at REAL NOT NULL,
+    geo TEXT NOT NULL,
+    hl TEXT NOT NULL,
+    category TEXT NOT NULL DEFAULT '',
+    source_url TEXT
+);
+CREATE INDEX IF NOT EXISTS snapshots_geo_time ON snapshots (geo, fetched_at);
+CREATE INDEX IF NOT EXISTS snapshots_time ON snapshots (fetched_at);
+CREATE TABLE IF NOT EXISTS points (
+    snapshot_id INTEGER NOT NULL,
+    position INTEGER NOT NULL,
+    title_id INTEGER NOT NULL,
+    ranking INTEGER,
+    search_volume TEXT,
+    change_percentage TEXT,
+    search_volume_min INTEGER,
+    change_percent REAL,
+    PRIMARY KEY (snapshot_id, position)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS points_title ON points (title_id, snapshot_id);
+"""
+
+# Columns added after the first release, created on open for older databases
+MIGRATIONS = {
+    "search_volume_min": "ALTER TABLE points ADD COLUMN search_volume_min INTEGER",
+    "change_percent": "ALTER TABLE points ADD COLUMN change_percent REAL",
+}
+
+FROM_POINTS = "FROM points p JOIN snapshots s ON s.id = p.snapshot_id JOIN titles t ON t.id = p.title_id"
+SELECT_POINTS = (
+    "SELECT s.fetched_at, s.geo, s.hl, s.category, t.title, p.ranking, p.search_volume, p.change_percentage, "
+    f"p.search_volume_min, p.change_percent {FROM_POINTS}"
+)
+
+# Orderings accepted by HistoryStore.summarize
+SUMMARY_ORDER = {
+    "max_search_volume": "max_search_volume DESC",
+    "appearances": "appearances DESC",
+    "best_ranking": "best_ranking ASC",
+    "avg_change_percent": "avg_change_percent DESC",
+    "last_seen": "last_seen DESC",
+}
+
+
+class PointRecord:
+    """Compact, unvalidated form of a ``HistoryPoint`` for bulk reads and exports.
+
+    A slotted object over the raw column values, with the time kept as a
+    timestamp. Its strings repeat across rows (geo, language, category,
+    title and the display forms of volume and change) and are interned by
+    ``HistoryStore.iter_records``, so a million points share one copy of
+    each. Convert to the pydantic model
+    only where an API response is built.
+    """
+
+    __slots__ = ("fetched_at", "geo", "hl", "category", "title", "ranking", "search_volume",
+                 "change_percentage", "search_volume_min", "change_percent")
+
+    def __init__(self, fetched_at: float, geo: str, hl: str, category: Optional[str], title: str,
+                 ranking: Optional[int] = None, search_volume: Optional[str] = None,
+                 change_percentage: Optional[str] = None, search_volume_min: Optional[int] = None,
+                 change_percent: Optional[float] = None):
+        self.fetched_at = fetched_at
+        self.geo = geo
+        self.hl = hl
+        self.category = category
+        self.title = title
+        self.ranking = ranking
+        self.search_volume = search_volume
+        self.change_percentage = change_percentage
+        self.search_volume_min = search_volume_min
+        self.change_percent = change_percent
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, PointRecord) and self.as_row() == other.as_row()
+
+    def __repr__(self) -> str:
+        return f"PointRecord({self.title!r}, geo={self.geo!r}, fetched_at={self.fetched_at!r})"
+
+    def as_row(self) -> tuple:
+        """Values in ``HistoryPoint`` field order, with the time as a datetime."""
+        return (datetime.fromtimestamp(self.fetched_at), self.geo, self.hl, self.category, self.title,
+                self.ranking, self.search_volume, self.change_percentage, self.search_volume_min,
+                self.change_percent)
+
+    def to_model(self) -> HistoryPoint:
+        return HistoryPoint(**dict(zip(HistoryPoint.model_fields, self.as_row())))
+
+    def to_json(self) -> bytes:
+        """Same bytes as ``to_model().model_dump_json()``, without building the model."""
+        return to_json(dict(zip(HistoryPoint.model_fields, self.as_row())))
+
+
+class HistoryStore:
+    """SQLite-backed time series of trend snapshots."""
+
+    def __init__(self, path: str = HISTORY_PATH, mmap_size: int = HISTORY_MMAP_SIZE,
+                 max_age_days: float = HISTORY_MAX_AGE_DAYS, queue_size: int = HISTORY_QUEUE_SIZE):
+        self.path = path
+        self.mmap_size = mmap_size
+        self.max_age = max_age_days * 86400
+        self._lock = threading.Lock()
+        self._queue: "queue.Queue[Optional[Tuple[TrendRequest, TrendSnapshot]]]" = queue.Queue(maxsize=queue_size)
+        self._thread: Optional[threading.Thread] = None
+        self._next_prune = 0.0
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=10)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(points)")}
+        for column, statement in MIGRATIONS.items():
+            if column not in columns:
+                self._conn.execute(statement)
+        self._conn.commit()
+        self._title_ids = {}
+
+    def _reader(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=10)
+        conn.execute(f"PRAGMA mmap_size={int(self.mmap_size)}")
+        return conn
+
+    def _title_id_map(self, titles: List[str]) -> dict:
+        missing = [title for title in set(titles) if title not in self._title_ids]
+        if missing:
+            if len(self._title_ids) + len(missing) > TITLE_CACHE_SIZE:
+                self._title_ids.clear()
+                missing = list(set(titles))
+            self._conn.executemany("INSERT OR IGNORE INTO titles (title) VALUES (?)", [(t,) for t in missing])
+            for start in range(0, len(missing), 500):
+                chunk = missing[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                for title_id, title in self._conn.execute(
+                    f"SELECT id, title FROM titles WHERE title IN ({placeholders})", chunk
+                ):
+                    self._title_ids[title] = title_id
+        return self._title_ids
+
+    def append(self, params: TrendRequest, response: TrendSnapshot) -> int:
+        """Record one fetch and return its snapshot id."""
+        fetched_at = response.timestamp.timestamp()
+        with self._lock:
+            try:
+                cursor = self._conn.execute(
+                    "INSERT INTO snapshots (fetched_at, geo, hl, category, source_url) VALUES (?, ?, ?, ?, ?)",
+                    (fetched_at, params.geo, params.hl, params.category or "", response.source_url),
+                )
+                snapshot_id = cursor.lastrowid
+                title_ids = self._title_id_map([topic.title for topic in response.topics])
+                self._conn.executemany(
+                    "INSERT INTO points (snapshot_id, position, title_id, ranking, search_volume, change_percentage, "
+                    "search_volume_min, change_percent) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    [
+                        (snapshot_id, position, title_ids[topic.title], topic.ranking, topic.search_volume,
+                         topic.change_percentage, topic.search_volume_min, topic.change_percent)
+                        for position, topic in enumerate(response.topics)
+                    ],
+                )
+                self._conn.commit()
+            except Exception:
+                self._conn.rollback()
+                # Ids of titles inserted by the rolled back transaction are gone
+                self._title_ids.clear()
+                raise
+        if self.max_age > 0 and fetched_at >= self._next_prune:
+            self._next_prune = fetched_at + PRUNE_INTERVAL
+            self.prune(datetime.fromtimestamp(fetched_at - self.max_age))
+        return snapshot_id
+
+    def prune(self, before: datetime) -> int:
+        """Delete snapshots fetched before ``before``, their points and titles no longer seen; returns the count."""
+        cutoff = before.timestamp()
+        with self._lock:
+            try:
+                self._conn.execute(
+                    "DELETE FROM points WHERE snapshot_id IN (SELECT id FROM snapshots WHERE fetched_at < ?)", (cutoff,)
+                )
+                deleted = self._conn.execute("DELETE FROM snapshots WHERE fetched_at < ?", (cutoff,)).rowcount
+                if deleted:
+                    self._conn.execute("DELETE FROM titles WHERE id NOT IN (SELECT title_id FROM points)")
+                    self._title_ids.clear()
+                self._conn.commit()
+            except Exception:
+                self._conn.rollback()
+                raise
+        return deleted
+
+    def submit(self, params: TrendRequest, response: TrendSnapshot) -> bool:
+        """Queue a fetch for the background writer without blocking; returns False if it was dropped."""
+        self._ensure_writer()
+        try:
+            self._queue.put_nowait((params, response))
+            return True
+        except queue.Full:
+            logger.warning("Trends history writer is behind, dropping a snapshot")
+            return False
+
+    def _ensure_writer(self) -> None:
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._write_loop, name="history-writer", daemon=True)
+                    self._thread.start()
+
+    def _write_loop(self) -> None:
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:
+                    return
+                self.append(*item)
+            except Exception as e:
+                logger.warning("Could not record trends history: %s", e)
+            finally:
+                self._queue.task_done()
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """Wait until queued snapshots are written; returns False on timeout."""
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks:
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+    def _where(
+        self,
+        start: Optional[datetime],
+        end: Optional[datetime],
+        geo: Optional[str],
+        hl: Optional[str],
+        category: Optional[str],
+        title: Optional[str],
+    ) -> Tuple[str, list]:
+        clauses, args = [], []
+        if start is not None:
+            clauses.append("s.fetched_at >= ?")
+            args.append(start.timestamp())
+        if end is not None:
+            clauses.append("s.fetched_at < ?")
+            args.append(end.timestamp())
+        if geo:
+            clauses.append("s.geo = ?")
+            args.append(geo)
+        if hl:
+            clauses.append("s.hl = ?")
+            args.append(hl)
+        if category is not None:
+            clauses.append("s.category = ?")
+            args.append(category)
+        if title:
+            # Resolve the title once so the scan uses the (title_id, snapshot_id) index
+            clauses.append("p.title_id = (SELECT id FROM titles WHERE title = ?)")
+            args.append(title)
+        return (" WHERE " + " AND ".join(clauses) if clauses else ""), args
+
+    def iter_records(
+        self,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        geo: Optional[str] = None,
+        hl: Optional[str] = None,
+        category: Optional[str] = None,
+        title: Optional[str] = None,
+        limit: Optional[int] = None,
+        batch_size: int = 1000,
+    ) -> Iterator[PointRecord]:
+        """Yield recorded points in time order as ``PointRecord``, reading ``batch_size`` rows at a time."""
+        where, args = self._where(start, end, geo, hl, category, title)
+        sql = f"{SELECT_POINTS}{where} ORDER BY s.fetched_at, p.snapshot_id, p.position"
+        if limit is not None:
+            sql += " LIMIT ?"
+            args.append(limit)
+        intern = sys.intern
+        conn = self._reader()
+        try:
+            cursor = conn.execute(sql, args)
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                for (fetched_at, row_geo, row_hl, row_category, row_title, ranking, volume, change,
+                     volume_min, change_percent) in rows:
+                    yield PointRecord(
+                        fetched_at, intern(row_geo), intern(row_hl), intern(row_category) if row_category else None,
+                        intern(row_title), ranking, intern(volume) if volume else volume,
+                        intern(change) if change else change, volume_min, change_percent,
+                    )
+        finally:
+            conn.close()
+
+    def iter_points(self, **filters) -> Iterator[HistoryPoint]:
+        """Recorded points matching ``filters`` (see ``iter_records``) as pydantic models."""
+        for record in self.iter_records(**filters):
+            yield record.to_model()
+
+    def query(self, limit: int = HISTORY_MAX_ROWS, **filters) -> List[HistoryPoint]:
+        """Recorded points matching ``filters`` (see ``iter_records``), oldest first."""
+        return list(self.iter_points(limit=min(limit, HISTORY_MAX_ROWS), **filters))
+
+    def summarize(
+        self,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        geo: Optional[str] = None,
+        hl: Optional[str] = None,
+        category: Optional[str] = None,
+        order_by: str = "max_search_volume",
+        limit: int = 100,
+    ) -> List[HistorySummary]:
+        """Per-title aggregates over the matching points, computed inside SQLite."""
+        if order_by not in SUMMARY_ORDER:
+            raise ValueError(f"Unknown order {order_by!r}, expected one of {', '.join(SUMMARY_ORDER)}")
+        where, args = self._where(start, end, geo, hl, category, None)
+        sql = (
+            "SELECT t.title, count(*) AS appearances, min(s.fetched_at) AS first_seen, "
+            "max(s.fetched_at) AS last_seen, min(p.ranking) AS best_ranking, "
+            "max(p.search_volume_min) AS max_search_volume, avg(p.change_percent) AS avg_change_percent "
+            f"{FROM_POINTS}{where} GROUP BY p.title_id "
+            f"ORDER BY {SUMMARY_ORDER[order_by]} NULLS LAST, t.title LIMIT ?"
+        )
+        conn = self._reader()
+        try:
+            rows = conn.execute(sql, args + [min(limit, HISTORY_MAX_ROWS)]).fetchall()
+        finally:
+            conn.close()
+        return [
+            HistorySummary(
+                title=title,
+                appearances=appearances,
+                first_seen=datetime.fromtimestamp(first_seen),
+                last_seen=datetime.fromtimestamp(last_seen),
+                best_ranking=best_ranking,
+                max_search_volume=max_search_volume,
+                avg_change_percent=avg_change_percent,
+            )
+            for title, appearances, first_seen, last_seen, best_ranking, max_search_volume, avg_change_percent in rows
+        ]
+
+    def stats(self) -> dict:
+        conn = self._reader()
+        try:
+            snapshots, = conn.execute("SELECT count(*) FROM snapshots").fetchone()
+            titles, = conn.execute("SELECT count(*) FROM titles").fetchone()
+        finally:
+            conn.close()
+        return {"snapshots": snapshots, "titles": titles}
+
+    def close(self) -> None:
+        """Write out queued snapshots, then close the database."""
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join(timeout=5)
+            self._thread = None
+        with self._lock:
+            self._conn.close()
+
+
+_history_store: Optional[HistoryStore] = None
+_history_store_lock = threading.Lock()
+
+def get_history_store() -> HistoryStore:
+    """Return the process-wide history store, creating it on first use."""
+    global _history_store
+    if _history_store is None:
+        with _history_store_lock:
+            if _history_store is None:
+                _history_store = HistoryStore()
+    return _history_store
+
+def record(params: TrendRequest, response: TrendSnapshot) -> None:
+    """Queue a fetch for the history; failures are logged and never fail or slow the fetch."""
+    if not HISTORY_ENABLED:
+        return
+    try:
+        get_history_store().submit(params, response)
+    except Exception as e:
+        logger.warning("Could not record trends history: %s", e)
+
+def close_history_store() -> None:
+    """Close the process-wide history store if it was opened."""
+    global _history_store
+    with _history_store_lock:
+        if _history_store is not None:
+            _history_store.close()
+            _history_store = None
@@ -0,0 +1,210 @@
+"""Shared HTTP client with connection pooling and conditional GETs for upstream requests."""
+
+import copy
+import importlib.util
+import logging
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional, TypeVar
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from .ratelimit import UpstreamGuard, get_upstream_guard
+
+logger = logging.getLogger(__name__)
+
+# Connection pool tuning for the requests-based path
+HTTP_POOL_CONNECTIONS = int(os.getenv("HTTP_POOL_CONNECTIONS", "10"))
+HTTP_POOL_MAXSIZE = int(os.getenv("HTTP_POOL_MAXSIZE", "20"))
+HTTP_RETRIES = int(os.getenv("HTTP_RETRIES", "2"))
+# Use HTTP/2 through httpx when it (and h2) is installed
+HTTP2_ENABLED = os.getenv("HTTP2_ENABLED", "false").lower() == "true"
+# Number of URLs whose ETag/Last-Modified and parsed result are remembered
+HTTP_VALIDATOR_CACHE_SIZE = int(os.getenv("HTTP_VALIDATOR_CACHE_SIZE", "256"))
+
+# httpx is optional and only imported when HTTP/2 is used; HTTP/2 additionally needs the h2 package
+HAS_HTTP2 = importlib.util.find_spec("httpx") is not None and importlib.util.find_spec("h2") is not None
+
+T = TypeVar("T")
+
+
+@dataclass
+class Validators:
+    """Cache validators of the last 200 response for a URL and what it parsed to."""
+
+    etag: Optional[str]
+    last_modified: Optional[str]
+    parsed: Any
+
+
+class HttpClient:
+    """Keep-alive HTTP client shared by every scrape in the process.
+
+    Connections to trends.google.com are pooled and reused instead of
+    doing a TCP and TLS handshake per request. ``fetch_parsed`` sends
+    ``If-None-Match``/``If-Modified-Since`` when it has seen a URL before,
+    and on ``304 Not Modified`` returns the previously parsed result
+    without downloading or parsing the body again.
+
+    Network errors are raised as ``requests.exceptions.RequestException``
+    whichever transport is in use. With a ``guard``, every request first
+    waits for its host's rate limit and every outcome is reported to the
+    host's circuit breaker.
+    """
+
+    def __init__(
+        self,
+        headers: Optional[Dict[str, str]] = None,
+        pool_connections: int = HTTP_POOL_CONNECTIONS,
+        pool_maxsize: int = HTTP_POOL_MAXSIZE,
+        retries: int = HTTP_RETRIES,
+        http2: bool = HTTP2_ENABLED,
+        validator_cache_size: int = HTTP_VALIDATOR_CACHE_SIZE,
+        guard: Optional[UpstreamGuard] = None,
+    ):
+        self.guard = guard
+        self.validator_cache_size = validator_cache_size
+        self._validators: "OrderedDict[str, Validators]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"requests": 0, "not_modified": 0}
+
+        self._httpx = None
+        self._session = None
+        if http2 and not HAS_HTTP2:
+            logger.warning("HTTP/2 requested but httpx[http2] is not installed, using HTTP/1.1")
+        if http2 and HAS_HTTP2:
+            import httpx
+
+            self._httpx = httpx.Client(
+                http2=True,
+                headers=headers,
+                follow_redirects=True,
+                limits=httpx.Limits(max_connections=pool_maxsize, max_keepalive_connections=pool_maxsize),
+                transport=httpx.HTTPTransport(http2=True, retries=retries),
+            )
+        else:
+            self._session = requests.Session()
+            if headers:
+                self._session.headers.update(headers)
+            retry = Retry(
+                total=retries,
+                backoff_factor=0.3,
+                status_forcelist=(502, 503, 504),
+                allowed_methods=frozenset(["GET"]),
+            )
+            adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize, max_retries=retry)
+            self._session.mount("https://", adapter)
+            self._session.mount("http://", adapter)
+
+    @property
+    def http_version(self) -> str:
+        return "HTTP/2" if self._httpx is not None else "HTTP/1.1"
+
+    def get(self, url: str, timeout: float, headers: Optional[Dict[str, str]] = None):
+        """GET a URL over a pooled connection. The response may be from requests or httpx.
+
+        Raises ``UpstreamUnavailable`` when the guard refuses the request or
+        the response is a captcha page.
+        """
+        return self._send("GET", url, timeout, headers)
+
+    def post(self, url: str, data: Dict[str, str], timeout: float, headers: Optional[Dict[str, str]] = None):
+        """POST form fields over a pooled connection, guarded like ``get``. Never retried."""
+        return self._send("POST", url, timeout, headers, data)
+
+    def _send(self, method: str, url: str, timeout: float, headers: Optional[Dict[str, str]],
+              data: Optional[Dict[str, str]] = None):
+        if self.guard is not None:
+            # Waiting for a token longer than the caller would wait for the response helps no one
+            self.guard.acquire(url, max_wait=timeout)
+        with self._lock:
+            self._stats["requests"] += 1
+        try:
+            if self._httpx is not None:
+                import httpx
+
+                try:
+                    response = self._httpx.request(method, url, timeout=timeout, headers=headers, data=data)
+                except httpx.HTTPError as e:
+                    raise requests.exceptions.RequestException(str(e)) from e
+            else:
+                response = self._session.request(method, url, timeout=timeout, headers=headers, data=data)
+        except requests.exceptions.RequestException as e:
+            if self.guard is not None:
+                self.guard.record(url, error=e)
+            raise
+        if self.guard is not None:
+            # Only successful bodies can be a captcha served in place of the page
+            text = response.text if response.status_code == 200 else ""
+            self.guard.observe(url, response.status_code, text, str(response.url))
+        return response
+
+    def fetch_parsed(self, url: str, parse: Callable[[Any], T], timeout: float) -> T:
+        """GET ``url`` conditionally and return ``parse(response)``.
+
+        A ``304`` reuses the parsed result of the last successful response.
+        Callers get their own copy of it, since trends are mutated further
+        down the fetch path. Non-2xx responses raise
+        ``requests.exceptions.HTTPError``.
+        """
+        with self._lock:
+            known = self._validators.get(url)
+
+        headers = {}
+        if known is not None:
+            if known.etag:
+                headers["If-None-Match"] = known.etag
+            if known.last_modified:
+                headers["If-Modified-Since"] = known.last_modified
+
+        response = self.get(url, timeout=timeout, headers=headers)
+        if response.status_code == 304 and known is not None:
+            with self._lock:
+                self._stats["not_modified"] += 1
+                self._validators.move_to_end(url)
+            logger.info("Not modified since last fetch, reusing parsed result: %s", url)
+            return copy.deepcopy(known.parsed)
+
+        if response.status_code >= 400:
+            raise requests.exceptions.HTTPError(
+                f"{response.status_code} error for url: {url}", response=response
+            )
+
+        parsed = parse(response)
+        etag = response.headers.get("etag")
+        last_modified = response.headers.get("last-modified")
+        if etag or last_modified:
+            with self._lock:
+                self._validators[url] = Validators(etag, last_modified, copy.deepcopy(parsed))
+                self._validators.move_to_end(url)
+                while len(self._validators) > self.validator_cache_size:
+                    self._validators.popitem(last=False)
+        return parsed
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {**self._stats, "http_version": self.http_version, "validators": len(self._validators)}
+
+    def close(self) -> None:
+        if self._httpx is not None:
+            self._httpx.close()
+        if self._session is not None:
+            self._session.close()
+
+
+_http_client: Optional[HttpClient] = None
+_http_client_lock = threading.Lock()
+
+def get_http_client() -> HttpClient:
+    """Return the process-wide HTTP client, creating it on first use."""
+    global _http_client
+    if _http_client is None:
+        with _http_client_lock:
+            if _http_client is None:
+                from .scraper import get_headers
+                _http_client = HttpClient(headers=get_headers(), guard=get_upstream_guard())
+    return _http_client
@@ -0,0 +1,447 @@
+"""Scrape jobs handed from API processes to a separate pool of worker processes.
+
+With ``JOB_QUEUE_BACKEND=sqlite`` a cache miss in an API process enqueues
+the ``TrendRequest`` instead of scraping in-process, then waits for the
+job to finish and reads the result from the shared cache, where the
+worker stored it. ``cli.py worker --procs N`` runs the scraping
+processes, so API and scraping capacity are sized independently.
+
+Identical jobs are deduplicated: while a request is pending or running,
+enqueuing it again returns the job already in the queue. A job whose
+worker died is handed to another worker once its lease expires.
+"""
+
+import logging
+import multiprocessing
+import os
+import signal
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import Callable, Iterable, Optional
+
+from .cache import CacheBackend, TrendsCache, cache_key, create_shared_backend
+from .models import TrendRequest
+from .ratelimit import UpstreamUnavailable
+from .records import TrendSnapshot
+
+logger = logging.getLogger(__name__)
+
+# Queue backend: empty to scrape in the API process, or "sqlite" for a file shared with workers
+JOB_QUEUE_BACKEND = os.getenv("JOB_QUEUE_BACKEND", "")
+JOB_QUEUE_PATH = os.getenv("JOB_QUEUE_PATH", "trend_jobs.sqlite3")
+# Seconds an API request waits for a worker to finish its job
+JOB_WAIT_TIMEOUT = float(os.getenv("JOB_WAIT_TIMEOUT", "30"))
+# API requests allowed to wait on queued jobs at once. Waiting only polls the
+# queue, so this is bounded apart from SCRAPE_MAX_CONCURRENCY
+JOB_MAX_WAITERS = int(os.getenv("JOB_MAX_WAITERS", "64"))
+# Seconds a claimed job may run before it is handed to another worker
+JOB_LEASE = float(os.getenv("JOB_LEASE", "120"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+# Seconds between queue polls of waiting requests and idle workers
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "0.2"))
+# Seconds finished jobs are kept for waiters before they are deleted
+JOB_RETENTION = float(os.getenv("JOB_RETENTION", "3600"))
+# Seconds the whole pool gets to finish running jobs on shutdown before workers are terminated
+JOB_SHUTDOWN_TIMEOUT = float(os.getenv("JOB_SHUTDOWN_TIMEOUT", str(JOB_LEASE)))
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+class JobFailed(RuntimeError):
+    """Raised to the waiting request when a worker could not complete its job."""
+
+
+@dataclass
+class Job:
+    """One queued scrape and its progress."""
+
+    id: int
+    key: str
+    params: TrendRequest
+    status: str
+    attempts: int
+    enqueued_at: float
+    error: Optional[str] = None
+    # Set when the job failed because upstream was throttling us
+    retry_after: Optional[float] = None
+
+    @property
+    def finished(self) -> bool:
+        return self.status in (DONE, FAILED)
+
+
+class JobQueue(ABC):
+    """Interface for queues shared between API and worker processes."""
+
+    @abstractmethod
+    def enqueue(self, params: TrendRequest) -> Job:
+        """Queue a scrape, or return the identical one already pending or running."""
+
+    @abstractmethod
+    def claim(self, worker: str) -> Optional[Job]:
+        """Take the oldest pending job (or one whose lease expired), if any."""
+
+    @abstractmethod
+    def complete(self, job_id: int) -> None:
+        ...
+
+    @abstractmethod
+    def fail(self, job_id: int, error: str, retry_after: Optional[float] = None) -> None:
+        ...
+
+    @abstractmethod
+    def get(self, job_id: int) -> Optional[Job]:
+        ...
+
+    @abstractmethod
+    def stats(self) -> dict:
+        ...
+
+    def close(self) -> None:
+        pass
+
+    def wait(
+        self,
+        job_id: int,
+        timeout: float = JOB_WAIT_TIMEOUT,
+        poll_interval: float = JOB_POLL_INTERVAL,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+    ) -> Optional[Job]:
+        """Poll until the job has finished; None if it hasn't within ``timeout`` seconds."""
+        deadline = clock() + timeout
+        while True:
+            job = self.get(job_id)
+            if job is None or job.finished:
+                return job
+            if clock() >= deadline:
+                return None
+            sleep(poll_interval)
+
+
+class SQLiteJobQueue(JobQueue):
+    """Jobs in a local SQLite file, standing in for a shared queue server such as Redis.
+
+    Every change is one immediate transaction, so concurrent producers
+    never queue the same request twice and concurrent workers never claim
+    the same job.
+    """
+
+    COLUMNS = "id, key, params, status, attempts, enqueued_at, error, retry_after"
+
+    def __init__(
+        self,
+        path: str = JOB_QUEUE_PATH,
+        lease: float = JOB_LEASE,
+        max_attempts: int = JOB_MAX_ATTEMPTS,
+        retention: float = JOB_RETENTION,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.path = path
+        self.lease = lease
+        self.max_attempts = max(1, max_attempts)
+        self.retention = retention
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=10, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS trend_jobs ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, key TEXT NOT NULL, params TEXT NOT NULL, "
+            "status TEXT NOT NULL, attempts INTEGER NOT NULL DEFAULT 0, enqueued_at REAL NOT NULL, "
+            "claimed_at REAL, finished_at REAL, worker TEXT, error TEXT, retry_after REAL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS trend_jobs_status ON trend_jobs (status, id)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS trend_jobs_key ON trend_jobs (key, status)")
+
+    def _transaction(self, work: Callable[[float], object]) -> object:
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                # Wall-clock time, read inside the transaction, is comparable across processes
+                result = work(self.clock())
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return result
+
+    def _job(self, row) -> Job:
+        id, key, params, status, attempts, enqueued_at, error, retry_after = row
+        return Job(id, key, TrendRequest.model_validate_json(params), status, attempts, enqueued_at, error, retry_after)
+
+    def _select(self, where: str, args: tuple) -> Optional[Job]:
+        row = self._conn.execute(f"SELECT {self.COLUMNS} FROM trend_jobs WHERE {where}", args).fetchone()
+        return self._job(row) if row is not None else None
+
+    def enqueue(self, params: TrendRequest) -> Job:
+        key = cache_key(params)
+
+        def work(now: float) -> Job:
+            existing = self._select("key = ? AND status IN (?, ?) ORDER BY id LIMIT 1", (key, PENDING, RUNNING))
+            if existing is not None:
+                return existing
+            cursor = self._conn.execute(
+                "INSERT INTO trend_jobs (key, params, status, enqueued_at) VALUES (?, ?, ?, ?)",
+                (key, params.model_dump_json(), PENDING, now),
+            )
+            return Job(cursor.lastrowid, key, params, PENDING, 0, now)
+
+        return self._transaction(work)
+
+    def claim(self, worker: str) -> Optional[Job]:
+        def work(now: float) -> Optional[Job]:
+            # Jobs of workers that died mid-scrape run again, up to max_attempts in total
+            self._conn.execute(
+                "UPDATE trend_jobs SET status = ?, finished_at = ?, error = ? "
+                "WHERE status = ? AND claimed_at < ? AND attempts >= ?",
+                (FAILED, now, "Worker lease expired", RUNNING, now - self.lease, self.max_attempts),
+            )
+            self._conn.execute(
+                "DELETE FROM trend_jobs WHERE status IN (?, ?) AND finished_at < ?",
+                (DONE, FAILED, now - self.retention),
+            )
+            job = self._select(
+                "status = ? OR (status = ? AND claimed_at < ?) ORDER BY id LIMIT 1",
+                (PENDING, RUNNING, now - self.lease),
+            )
+            if job is None:
+                return None
+            self._conn.execute(
+                "UPDATE trend_jobs SET status = ?, attempts = attempts + 1, claimed_at = ?, worker = ? WHERE id = ?",
+                (RUNNING, now, worker, job.id),
+            )
+            job.status = RUNNING
+            job.attempts += 1
+            return job
+
+        return self._transaction(work)
+
+    def _finish(self, job_id: int, status: str, error: Optional[str], retry_after: Optional[float]) -> None:
+        self._transaction(lambda now: self._conn.execute(
+            "UPDATE trend_jobs SET status = ?, finished_at = ?, error = ?, retry_after = ? WHERE id = ?",
+            (status, now, error, retry_after, job_id),
+        ))
+
+    def complete(self, job_id: int) -> None:
+        self._finish(job_id, DONE, None, None)
+
+    def fail(self, job_id: int, error: str, retry_after: Optional[float] = None) -> None:
+        self._finish(job_id, FAILED, error, retry_after)
+
+    def get(self, job_id: int) -> Optional[Job]:
+        with self._lock:
+            return self._select("id = ?", (job_id,))
+
+    def stats(self) -> dict:
+        """Jobs per status and how long the oldest pending one has waited."""
+        with self._lock:
+            counts = dict(self._conn.execute("SELECT status, COUNT(*) FROM trend_jobs GROUP BY status").fetchall())
+            oldest = self._conn.execute(
+                "SELECT MIN(enqueued_at) FROM trend_jobs WHERE status = ?", (PENDING,)
+            ).fetchone()[0]
+        stats = {status: counts.get(status, 0) for status in (PENDING, RUNNING, DONE, FAILED)}
+        stats["oldest_pending_seconds"] = max(0.0, self.clock() - oldest) if oldest is not None else 0.0
+        return stats
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class QueueLoader:
+    """Cache loader that has a worker scrape the request and reads back what it stored.
+
+    Used in place of ``fetch_trends`` by API processes when a job queue is
+    configured. Requests are answered from the shared cache backend, which
+    the worker writes into.
+    """
+
+    def __init__(self, queue: JobQueue, shared: CacheBackend, timeout: float = JOB_WAIT_TIMEOUT):
+        self.queue = queue
+        self.shared = shared
+        self.timeout = timeout
+
+    def __call__(self, params: TrendRequest) -> TrendSnapshot:
+        from .batch import upstream_host
+        from .executor import ServiceBusy
+
+        job = self.queue.enqueue(params)
+        finished = self.queue.wait(job.id, timeout=self.timeout)
+        if finished is None:
+            raise ServiceBusy(message=f"No scrape worker finished {job.key!r} within {self.timeout:.0f}s")
+        if finished.status == FAILED:
+            if finished.retry_after is not None:
+                # Let the API fall back to the last known response, as for an in-process scrape
+                raise UpstreamUnavailable(upstream_host(params), finished.retry_after, finished.error or "throttled")
+            raise JobFailed(finished.error or f"Job {job.id} failed")
+        entry = self.shared.get(job.key)
+        if entry is None:
+            raise JobFailed(f"Job {job.id} finished but left no cache entry for {job.key!r}")
+        return entry.value
+
+
+def run_job(queue: JobQueue, cache: TrendsCache, job: Job) -> None:
+    """Scrape one claimed job into the cache and record the outcome."""
+    entry = cache.lookup(job.key)
+    if entry is not None and entry.stored_at >= job.enqueued_at and entry.is_fresh(cache.clock()):
+        # Someone else refreshed the key after the job was queued
+        logger.info("Job %s: %s already fresh in the cache", job.id, job.key)
+        queue.complete(job.id)
+        return
+    try:
+        cache.refresh(job.params)
+    except UpstreamUnavailable as e:
+        logger.warning("Job %s: %s", job.id, e)
+        queue.fail(job.id, e.reason, retry_after=e.retry_after)
+    except Exception as e:
+        logger.exception("Job %s failed", job.id)
+        queue.fail(job.id, str(e) or type(e).__name__)
+    else:
+        queue.complete(job.id)
+
+def run_jobs(
+    queue: JobQueue,
+    cache: TrendsCache,
+    stop: threading.Event,
+    worker: str,
+    poll_interval: float = JOB_POLL_INTERVAL,
+) -> int:
+    """Claim and run jobs until ``stop`` is set; returns how many were run."""
+    done = 0
+    while not stop.is_set():
+        job = queue.claim(worker)
+        if job is None:
+            stop.wait(poll_interval)
+            continue
+        logger.info("Worker %s running job %s (%s, attempt %d)", worker, job.id, job.key, job.attempts)
+        run_job(queue, cache, job)
+        done += 1
+    return done
+
+def worker_main(stop, worker: str) -> None:
+    """Entry point of one scraping process."""
+    from .scraper import fetch_trends, shutdown_browser_pool
+
+    # Ctrl-C reaches the whole process group; the parent sets ``stop`` so running jobs can finish
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    logging.basicConfig(level=logging.INFO)
+    queue = create_job_queue()
+    if queue is None:
+        raise SystemExit("JOB_QUEUE_BACKEND is not set; workers have no queue to take jobs from")
+    cache = TrendsCache(fetch_trends, shared=create_shared_backend())
+    try:
+        run_jobs(queue, cache, stop, worker)
+    finally:
+        cache.close()
+        queue.close()
+        shutdown_browser_pool()
+
+def stop_processes(
+    processes: Iterable,
+    stopping,
+    timeout: float = JOB_SHUTDOWN_TIMEOUT,
+    kill_timeout: float = 5.0,
+    clock: Callable[[], float] = time.monotonic,
+) -> None:
+    """Ask every process to stop, then wait for all of them against one deadline.
+
+    Processes still running once ``timeout`` seconds have passed are
+    terminated, and killed if they ignore that for ``kill_timeout``.
+    """
+    processes = list(processes)
+    stopping.set()
+    deadline = clock() + timeout
+    for process in processes:
+        process.join(timeout=max(0.0, deadline - clock()))
+    stuck = [process for process in processes if process.is_alive()]
+    for process in stuck:
+        logger.warning("Scraping process %s did not stop in time, terminating it", process.name)
+        process.terminate()
+    deadline = clock() + kill_timeout
+    for process in stuck:
+        process.join(timeout=max(0.0, deadline - clock()))
+        if process.is_alive():
+            process.kill()
+            process.join()
+
+def run_worker_pool(procs: int, stop: Optional[threading.Event] = None, check_interval: float = 1.0) -> None:
+    """Run ``procs`` scraping processes until ``stop`` is set or interrupted, replacing any that die."""
+    # Spawned rather than forked: the parent may already hold threads and browser sessions
+    context = multiprocessing.get_context("spawn")
+    stopping = context.Event()
+    processes = {}
+
+    def start(index: int) -> None:
+        name = f"scraper-{index}"
+        process = context.Process(target=worker_main, args=(stopping, name), name=name, daemon=True)
+        process.start()
+        processes[index] = process
+
+    stop = stop or threading.Event()
+    for index in range(procs):
+        start(index)
+    logger.info("Started %d scraping processes", procs)
+    try:
+        while not stop.wait(check_interval):
+            for index, process in list(processes.items()):
+                if not process.is_alive():
+                    logger.warning("Scraping process %s exited with %s, restarting it", process.name, process.exitcode)
+                    start(index)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop_processes(processes.values(), stopping)
+
+
+_job_queue: Optional[JobQueue] = None
+_job_queue_lock = threading.Lock()
+_wait_executor = None
+
+def create_job_queue() -> Optional[JobQueue]:
+    """Build the queue selected by ``JOB_QUEUE_BACKEND``; None scrapes in-process."""
+    if JOB_QUEUE_BACKEND == "sqlite":
+        return SQLiteJobQueue(JOB_QUEUE_PATH)
+    if JOB_QUEUE_BACKEND:
+        logger.warning("Unknown job queue backend %r, scraping in-process", JOB_QUEUE_BACKEND)
+    return None
+
+def get_job_queue() -> Optional[JobQueue]:
+    """Return the process-wide job queue, creating it on first use; None when not configured."""
+    global _job_queue
+    if _job_queue is None and JOB_QUEUE_BACKEND:
+        with _job_queue_lock:
+            if _job_queue is None:
+                _job_queue = create_job_queue()
+    return _job_queue
+
+def get_job_wait_executor():
+    """Return the process-wide pool that API requests wait on queued jobs in.
+
+    ``QueueLoader`` blocks a thread until a worker finishes, so running it in
+    the scrape executor would cap in-flight misses at SCRAPE_MAX_CONCURRENCY
+    however many worker processes there are.
+    """
+    global _wait_executor
+    if _wait_executor is None:
+        with _job_queue_lock:
+            if _wait_executor is None:
+                from .executor import BoundedExecutor
+                _wait_executor = BoundedExecutor(max_workers=JOB_MAX_WAITERS, thread_name_prefix="job-wait")
+    return _wait_executor
+
+def close_job_queue() -> None:
+    global _job_queue, _wait_executor
+    with _job_queue_lock:
+        if _job_queue is not None:
+            _job_queue.close()
+            _job_queue = None
+        if _wait_executor is not None:
+            _wait_executor.shutdown()
+            _wait_executor = None
@@ -0,0 +1,129 @@
+"""Compiled lxml backend for the Google Trends table layout.
+
+Produces the same ``TrendRecord`` objects as ``parser.extract_trend_from_table_row``
+but parses with libxml2 and uses XPath expressions compiled once at import.
+"""
+
+import logging
+from typing import Iterable, List, Optional
+
+from lxml import etree
+
+from .metrics import span
+from .records import TrendRecord
+
+logger = logging.getLogger(__name__)
+
+def _has_class(name: str) -> str:
+    """XPath predicate matching one class token, like CSS ``.name``."""
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')"
+
+# Text nodes that BeautifulSoup's get_text() reports: no script/style contents, no templates
+TEXT = etree.XPath(".//text()[not(parent::script or parent::style or ancestor::template)]")
+
+ROWS = etree.XPath("//tr[@jsname='oKdM2c']")
+TITLE = etree.XPath(f".//td[{_has_class('jvkLtd')}]//div[{_has_class('mZ3RIc')}]")
+VOLUME = etree.XPath(f".//td[{_has_class('dQOTjf')}]//div[{_has_class('lqv0Cb')}]")
+CHANGE = etree.XPath(
+    f".//td[{_has_class('dQOTjf')}]//div[{_has_class('wqrjjc')}]//div[{_has_class('TXt85b')}]"
+)
+LINK = etree.XPath(".//a[@href]")
+BREAKDOWN = etree.XPath(f".//td[{_has_class('xm9Xec')}]")
+TERM_BUTTONS = etree.XPath(".//button[@data-term]")
+BUTTONS = etree.XPath(".//button")
+
+def parse_document(html: str) -> Optional[etree._Element]:
+    """Parse an HTML string into an lxml tree, or None for empty input."""
+    if not html:
+        return None
+    # Encode ourselves: lxml refuses str input that carries an encoding declaration
+    parser = etree.HTMLParser(encoding="utf-8", huge_tree=True)
+    return etree.fromstring(html.encode("utf-8"), parser)
+
+def text_of(element: etree._Element) -> str:
+    """Equivalent of BeautifulSoup's ``get_text(strip=True)``."""
+    return "".join(s.strip() for s in TEXT(element))
+
+def _first(xpath: etree.XPath, element: etree._Element) -> Optional[etree._Element]:
+    matches = xpath(element)
+    return matches[0] if matches else None
+
+def extract_trend_from_row(row: etree._Element, ranking: int) -> Optional[TrendRecord]:
+    """Extract trend data from a table row element parsed by lxml."""
+    title = ""
+    search_volume = None
+    change_percentage = None
+    url = None
+    related_queries = []
+
+    title_element = _first(TITLE, row)
+    if title_element is not None:
+        title = text_of(title_element)
+
+    volume_element = _first(VOLUME, row)
+    if volume_element is not None:
+        search_volume = text_of(volume_element)
+        # Ensure it has proper suffix
+        if search_volume and not search_volume.endswith("searches") and any(c.isdigit() for c in search_volume):
+            search_volume += " searches"
+
+    change_element = _first(CHANGE, row)
+    if change_element is not None:
+        change_percentage = text_of(change_element)
+
+    link_element = _first(LINK, row)
+    if link_element is not None:
+        href = link_element.get("href")
+        # Make sure it's a valid Google Trends URL
+        if href and ('trends.google.com' in href or href.startswith('/')):
+            url = href if href.startswith('http') else f"https://trends.google.com{href}"
+
+    breakdown_section = _first(BREAKDOWN, row)
+    if breakdown_section is not None:
+        for button in TERM_BUTTONS(breakdown_section):
+            term = button.get("data-term")
+            if term and term != title and term not in related_queries:
+                related_queries.append(term)
+
+        # If no data-term attributes, try to extract from button text
+        if not related_queries:
+            for button in BUTTONS(breakdown_section):
+                term = text_of(button)
+                if term and term != title and len(term) > 2 and term not in related_queries:
+                    related_queries.append(term)
+
+    if not title:
+        logger.warning("Could not create trend from row %d", ranking)
+        return None
+
+    return TrendRecord(
+        title=title,
+        ranking=ranking,
+        search_volume=search_volume,
+        change_percentage=change_percentage,
+        url=url,
+        related_queries=related_queries if related_queries else None
+    )
+
+def extract_trends_from_rows(rows: Iterable[etree._Element]) -> List[TrendRecord]:
+    """Extract trends from table rows, ranking them by position."""
+    trends = []
+    for i, row in enumerate(rows):
+        trend = extract_trend_from_row(row, i + 1)
+        if trend:
+            trends.append(trend)
+    return trends
+
+def parse_table_html(html: str) -> List[TrendRecord]:
+    """Parse the ``tr[jsname='oKdM2c']`` rows of a Google Trends page."""
+    with span("parse.document"):
+        document = parse_document(html)
+    if document is None:
+        return []
+    rows = ROWS(document)
+    if not rows:
+        logger.warning("Table structure detected but no trend rows found")
+        return []
+    logger.info("Found %d trend rows in table structure", len(rows))
+    with span("parse.rows"):
+        return extract_trends_from_rows(rows)
@@ -15,6 +15,22 @@ class TrendRequest(BaseModel):
     status: Optional[str] = None
     url: Optional[str] = None
 
+class TrendQuery(BaseModel):
+    """Local filtering, sorting and paging applied to a cached result set.
+
+    None of these reach Google: they are evaluated against the topics of
+    the cached response for the matching ``TrendRequest``.
+    """
+
+    min_volume: Optional[int] = None
+    title_contains: Optional[str] = None
+    # ranking, title, search_volume_min or change_percent; prefix with "-" for descending
+    order_by: Optional[str] = None
+    limit: Optional[int] = None
+    offset: int = 0
+    # Comma-separated topic fields to return, e.g. "title,search_volume_min"
+    fields: Optional[str] = None
+
 class Trend(BaseModel):
     """Single trending topic."""
 
@@ -24,6 +40,9 @@ class Trend(BaseModel):
     change_percentage: Optional[str] = None
     related_queries: Optional[List[str]] = None
     url: Optional[str] = None
+    # Numeric forms of search_volume (lower bound) and change_percentage, filled in by the parser
+    search_volume_min: Optional[int] = None
+    change_percent: Optional[float] = None
     
 class TrendsResponse(BaseModel):
     """Response returned by the API."""
@@ -34,3 +53,64 @@ class TrendsResponse(BaseModel):
     total_trends: int
     location: str
     language: str
+    # Which fallback tier produced the topics and how long the fetch took
+    source_tier: Optional[str] = None
+    fetch_ms: Optional[float] = None
+
+class TrendEvent(BaseModel):
+    """A change between two consecutive snapshots of the same trends query.
+
+    ``type`` is ``entered``, ``exited``, ``rank_changed`` or ``volume_changed``.
+    """
+
+    type: str
+    title: str
+    location: str
+    language: str
+    timestamp: datetime
+    ranking: Optional[int] = None
+    previous_ranking: Optional[int] = None
+    search_volume: Optional[str] = None
+    previous_search_volume: Optional[str] = None
+    search_volume_min: Optional[int] = None
+    previous_search_volume_min: Optional[int] = None
+
+class BatchTrendRequest(BaseModel):
+    """Body of a batch request: many trend queries answered in one call."""
+
+    requests: List[TrendRequest]
+
+class BatchItemResult(BaseModel):
+    """Outcome of one query in a batch, streamed back as soon as it finishes."""
+
+    index: int
+    request: TrendRequest
+    result: Optional[TrendsResponse] = None
+    error: Optional[str] = None
+    cache: Optional[str] = None
+    elapsed_ms: float
+
+class HistoryPoint(BaseModel):
+    """One trend as seen in one recorded fetch."""
+
+    fetched_at: datetime
+    geo: str
+    hl: str
+    category: Optional[str] = None
+    title: str
+    ranking: Optional[int] = None
+    search_volume: Optional[str] = None
+    change_percentage: Optional[str] = None
+    search_volume_min: Optional[int] = None
+    change_percent: Optional[float] = None
+
+class HistorySummary(BaseModel):
+    """Aggregates of one title over a range of recorded history."""
+
+    title: str
+    appearances: int
+    first_seen: datetime
+    last_seen: datetime
+    best_ranking: Optional[int] = None
+    max_search_volume: Optional[int] = None
+    avg_change_percent: Optional[float] = None
@@ -0,0 +1,93 @@
+"""Numeric values for the display strings Google Trends shows.
+
+``search_volume`` strings such as "500K+ searches", "2 Mio.+" or "10万+"
+become the volume's lower bound as an int, and ``change_percentage``
+strings such as "+1,000%" become a float. Parsing is regex based and
+memoized, and ``normalize_trends`` parses each distinct string of a batch
+once, since the same few volume buckets repeat across a page.
+"""
+
+import re
+from functools import lru_cache
+from typing import Iterable, Optional
+
+from .records import TrendRecord
+
+# Multipliers for volume suffixes across the locales Google Trends serves
+SUFFIXES = {
+    "k": 10**3, "tsd": 10**3, "mil": 10**3, "천": 10**3, "千": 10**3, "ngàn": 10**3, "nghìn": 10**3,
+    "rb": 10**3, "ribu": 10**3, "bin": 10**3, "тыс": 10**3,
+    "万": 10**4, "萬": 10**4, "만": 10**4,
+    "lakh": 10**5, "lac": 10**5,
+    "m": 10**6, "mio": 10**6, "mln": 10**6, "mn": 10**6, "mi": 10**6, "jt": 10**6, "juta": 10**6,
+    "tr": 10**6, "triệu": 10**6, "млн": 10**6, "million": 10**6, "millones": 10**6, "milhões": 10**6,
+    "亿": 10**8, "億": 10**8, "억": 10**8,
+    "crore": 10**7, "cr": 10**7,
+    "bn": 10**9, "mrd": 10**9, "billion": 10**9,
+}
+
+_SUFFIX_PATTERN = "|".join(sorted((re.escape(s) for s in SUFFIXES), key=len, reverse=True))
+# Digits with any grouping or decimal separators (apostrophes and spaces included)
+_NUMBER = r"(\d[\d.,'\s]*\d|\d)"
+VOLUME_RE = re.compile(rf"{_NUMBER}\s*({_SUFFIX_PATTERN})?(?![^\W\d_])", re.IGNORECASE)
+CHANGE_RE = re.compile(rf"([+\-\u2212\u2191\u2193]?)\s*{_NUMBER}\s*%")
+
+def _to_number(digits: str) -> float:
+    """Interpret separators in a localized number: "1,000", "1.000", "1,5", "1 234,5"."""
+    # Apostrophes and (non-breaking, thin) spaces only ever group digits
+    digits = re.sub(r"['\s]", "", digits)
+    last_dot, last_comma = digits.rfind("."), digits.rfind(",")
+    decimal = max(last_dot, last_comma)
+    if decimal == -1:
+        return float(digits)
+    if last_dot != -1 and last_comma != -1:
+        # Both present: the last one is the decimal separator
+        return float(re.sub(r"\D", "", digits[:decimal]) + "." + digits[decimal + 1:])
+    separator = digits[decimal]
+    if digits.count(separator) > 1:
+        return float(digits.replace(separator, ""))
+    # A single separator followed by three digits groups thousands ("1,000"), otherwise it is decimal ("1.5")
+    integer, fraction = digits.split(separator)
+    if len(fraction) == 3:
+        return float(integer + fraction)
+    return float(f"{integer}.{fraction}")
+
+@lru_cache(maxsize=4096)
+def parse_volume(text: Optional[str]) -> Optional[int]:
+    """Lower bound of a search volume string, e.g. "500K+ searches" -> 500000."""
+    if not text:
+        return None
+    match = VOLUME_RE.search(text)
+    if not match:
+        return None
+    digits, suffix = match.groups()
+    if suffix:
+        if digits.count(",") + digits.count(".") == 1:
+            # Before a suffix a lone separator is decimal: "1,5 Mio." or "1.5M"
+            digits = digits.replace(",", ".")
+            number = float(re.sub(r"['\s]", "", digits))
+        else:
+            number = _to_number(digits)
+        return int(round(number * SUFFIXES[suffix.lower()]))
+    return int(_to_number(digits))
+
+@lru_cache(maxsize=4096)
+def parse_change(text: Optional[str]) -> Optional[float]:
+    """Percentage change as a float, e.g. "+1,000%" -> 1000.0 and "-25%" -> -25.0."""
+    if not text:
+        return None
+    match = CHANGE_RE.search(text)
+    if not match:
+        return None
+    sign, digits = match.groups()
+    number = _to_number(digits)
+    return -number if sign in ("-", "\u2212", "\u2193") else number
+
+def normalize_trends(trends: Iterable[TrendRecord]) -> None:
+    """Fill ``search_volume_min`` and ``change_percent`` for a batch of trends in place."""
+    trends = list(trends)
+    volumes = {text: parse_volume(text) for text in {t.search_volume for t in trends}}
+    changes = {text: parse_change(text) for text in {t.change_percentage for t in trends}}
+    for trend in trends:
+        trend.search_volume_min = volumes[trend.search_volume]
+        trend.change_percent = changes[trend.change_percentage]
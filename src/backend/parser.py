@@ -1,165 +1,359 @@
-from bs4 import BeautifulSoup
-from typing import List
+from collections import OrderedDict
+from dataclasses import dataclass
+from functools import lru_cache
+from importlib.util import find_spec
+from typing import TYPE_CHECKING, Iterator, List, Optional, Sequence, Tuple
+import os
 import re
 import logging
+import threading
 
-from .models import Trend
+from .metrics import span
+from .normalize import normalize_trends
+from .records import TrendRecord
+
+if TYPE_CHECKING:
+    from bs4 import BeautifulSoup, NavigableString, Tag
+    from soupsieve import SoupSieve
 
 logger = logging.getLogger(__name__)
 
-def parse_trending_html(html: str) -> List[Trend]:
-    """Parse Google Trends HTML into a list of Trend objects."""
-    soup = BeautifulSoup(html, "html.parser")
+# The compiled lxml backend is used for the table layout when available
+HAS_LXML = find_spec("lxml") is not None
+
+PARSER_BACKENDS = ("lxml", "stream", "bs4")
+PARSER_BACKEND = os.getenv("PARSER_BACKEND", "lxml")
+
+# Table layout for the BeautifulSoup backend
+TABLE_ROWS = "tr[jsname='oKdM2c']"
+ROW_TITLE = "td.jvkLtd div.mZ3RIc"
+ROW_VOLUME = "td.dQOTjf div.lqv0Cb"
+ROW_CHANGE = "td.dQOTjf div.wqrjjc div.TXt85b"
+ROW_BREAKDOWN = "td.xm9Xec"
+BREAKDOWN_TERMS = "button[data-term]"
+BREAKDOWN_BUTTONS = "button"
+LINK = "a[href]"
+
+# Fields of a trend element in a fallback layout: title candidates in order of
+# preference, then volume and change. Found together in one walk of the element.
+TITLE_SELECTORS = [".mZ3RIc", "h3", "h2", ".title", "[data-entity-name]", "a"]
+VOLUME = ".search-volume, .volume, [data-volume]"
+CHANGE = ".change, .percentage, [data-change]"
+FIELD_SELECTORS = TITLE_SELECTORS + [VOLUME, CHANGE, LINK]
+
+@lru_cache(maxsize=None)
+def compiled(selector: str) -> "SoupSieve":
+    """The selector compiled once, on first use, instead of on every select() call.
+
+    soupsieve (and with it bs4) is only imported once a page actually needs
+    the BeautifulSoup backend or the fallback layouts.
+    """
+    import soupsieve
+
+    return soupsieve.compile(selector)
+
+
+@dataclass(frozen=True)
+class SelectorPlan:
+    """One fallback layout: the elements holding trends and how to read them.
+
+    ``marker`` must occur in the raw HTML for the selector to match at all,
+    so plans can be ruled out with a substring search before parsing.
+    ``titles_only`` elements are the title itself rather than a container.
+    """
+
+    selector: str
+    marker: str
+    titles_only: bool = False
+
+    @property
+    def pattern(self) -> "SoupSieve":
+        return compiled(self.selector)
+
+
+# Legacy and alternative layouts, in order of preference
+SELECTOR_PLANS: Tuple[SelectorPlan, ...] = (
+    SelectorPlan("td.jvkLtd div.mZ3RIc", "mZ3RIc", titles_only=True),  # Legacy structure matching the table
+    SelectorPlan("div[jsname='oKdM2c']", "oKdM2c"),
+    SelectorPlan(".trending-story", "trending-story"),
+    SelectorPlan(".trending-topic", "trending-topic"),
+    SelectorPlan("article", "<article"),
+    SelectorPlan("[data-entity-type='trending_story']", "trending_story"),
+    # Additional selectors for different Google Trends layouts
+    SelectorPlan(".trending-queries-table tr", "trending-queries-table"),
+    SelectorPlan(".trending-searches-content div", "trending-searches-content"),
+    SelectorPlan(".feed-item", "feed-item"),
+    SelectorPlan(".trending-story-title", "trending-story-title"),
+)
+
+# Winning plan per (geo, layout fingerprint)
+PLAN_CACHE_SIZE = 256
+_plan_cache: "OrderedDict[Tuple[str, int], int]" = OrderedDict()
+_plan_cache_lock = threading.Lock()
+
+def layout_fingerprint(html: str) -> int:
+    """Bitmask of the selector plans whose marker occurs in ``html``."""
+    lowered = None
+    fingerprint = 0
+    for i, plan in enumerate(SELECTOR_PLANS):
+        if plan.marker.startswith("<"):
+            # Tag names are case-insensitive
+            if lowered is None:
+                lowered = html.lower()
+            found = plan.marker in lowered
+        else:
+            found = plan.marker in html
+        if found:
+            fingerprint |= 1 << i
+    return fingerprint
+
+def match_plans(root: "Tag", plans: Sequence[SelectorPlan]) -> List[List["Tag"]]:
+    """Elements matched by each plan, in document order, from a single walk of the tree."""
+    from bs4 import Tag
+
+    patterns = [plan.pattern for plan in plans]
+    matches: List[List["Tag"]] = [[] for _ in plans]
+    for node in root.descendants:
+        if isinstance(node, Tag):
+            for pattern, matched in zip(patterns, matches):
+                if pattern.match(node):
+                    matched.append(node)
+    return matches
+
+def first_matches(element: "Tag", selectors: Sequence[str]) -> List[Optional["Tag"]]:
+    """First descendant matching each selector, like ``select_one`` for each but in one walk."""
+    from bs4 import Tag
+
+    patterns = [compiled(selector) for selector in selectors]
+    found: List[Optional["Tag"]] = [None] * len(patterns)
+    missing = len(patterns)
+    for node in element.descendants:
+        if not isinstance(node, Tag):
+            continue
+        for i, pattern in enumerate(patterns):
+            if found[i] is None and pattern.match(node):
+                found[i] = node
+                missing -= 1
+        if not missing:
+            break
+    return found
+
+def apply_plan(plan: SelectorPlan, elements: List["Tag"]) -> List[TrendRecord]:
+    if plan.titles_only:
+        titles = [node.get_text(strip=True) for node in elements]
+        return [TrendRecord(title=t, ranking=i+1) for i, t in enumerate(titles) if t and len(t) > 2]
+    trends = []
+    for i, element in enumerate(elements):
+        trend = extract_trend_data(element, i + 1)
+        if trend and trend.title and len(trend.title) > 2:
+            trends.append(trend)
+    return trends
+
+def parse_with_plans(soup: "BeautifulSoup", html: str, geo: Optional[str] = None) -> List[TrendRecord]:
+    """Trends from the first selector plan that yields any.
+
+    Plans whose marker is absent from ``html`` are skipped, the rest are
+    matched together in one traversal. The winner is remembered for the
+    page's geo and layout fingerprint, and tried alone next time.
+    """
+    fingerprint = layout_fingerprint(html)
+    key = (geo or "", fingerprint)
+    with _plan_cache_lock:
+        cached = _plan_cache.get(key)
+    if cached is not None:
+        plan = SELECTOR_PLANS[cached]
+        trends = apply_plan(plan, plan.pattern.select(soup))
+        if trends:
+            logger.info("Extracted %d trends using cached selector: %s", len(trends), plan.selector)
+            return trends
+
+    candidates = [i for i in range(len(SELECTOR_PLANS)) if fingerprint & (1 << i)]
+    matches = match_plans(soup, [SELECTOR_PLANS[i] for i in candidates])
+    for index, elements in zip(candidates, matches):
+        if not elements:
+            continue
+        plan = SELECTOR_PLANS[index]
+        logger.info("Found %d elements with selector: %s", len(elements), plan.selector)
+        trends = apply_plan(plan, elements)
+        if trends:
+            logger.info("Successfully extracted %d trends using selector: %s", len(trends), plan.selector)
+            with _plan_cache_lock:
+                _plan_cache[key] = index
+                _plan_cache.move_to_end(key)
+                while len(_plan_cache) > PLAN_CACHE_SIZE:
+                    _plan_cache.popitem(last=False)
+            return trends
+
+    with _plan_cache_lock:
+        _plan_cache.pop(key, None)
+    return []
+
+# Text heuristic: strings that are page chrome or code rather than topics
+TEXT_MAX_CANDIDATES = 20
+HIDDEN_TAGS = frozenset(["script", "style"])
+UI_WORDS = frozenset(['search', 'trending', 'more', 'news', 'google', 'trends', 'privacy', 'terms', 'help', 'settings'])
+SKIP_PREFIXES = ('http', 'www', 'google', 'search', 'trend')
+CODE_MARKERS = re.compile(r"\(\)|\{\}|\[\]|[=;<>]|function|var |const ")
+WEB_WORDS = re.compile(r"onload|gtag|function|script|css|javascript")
+
+def iter_visible_strings(root: "Tag") -> Iterator["NavigableString"]:
+    """Text nodes of ``root`` in document order, leaving out script and style contents and comments."""
+    from bs4 import NavigableString, Tag
+
+    stack = [iter(root.contents)]
+    while stack:
+        for node in stack[-1]:
+            if isinstance(node, Tag):
+                if node.name not in HIDDEN_TAGS:
+                    stack.append(iter(node.contents))
+                    break
+            elif type(node) is NavigableString:
+                yield node
+        else:
+            stack.pop()
+
+def has_text(soup: "BeautifulSoup", length: int) -> bool:
+    """Whether the page's stripped text adds up to at least ``length`` characters."""
+    total = 0
+    for text in soup.stripped_strings:
+        total += len(text)
+        if total >= length:
+            return True
+    return False
+
+def extract_trends_from_text(soup: "BeautifulSoup") -> List[TrendRecord]:
+    """Last resort: short visible strings that look like topics, in one pass.
+
+    Stops as soon as TEXT_MAX_CANDIDATES unique candidates have been found.
+    """
+    candidates = {}
+    for node in iter_visible_strings(soup):
+        text = node.strip()
+        if not 3 < len(text) < 100 or text.startswith(SKIP_PREFIXES) or text.isdigit():
+            continue
+        lowered = text.lower()
+        if lowered in UI_WORDS or CODE_MARKERS.search(text) or WEB_WORDS.search(lowered):
+            continue
+        # Skip if it's all uppercase (likely a UI element)
+        if text.isupper() and len(text) < 10:
+            continue
+        candidates[text] = None
+        if len(candidates) >= TEXT_MAX_CANDIDATES:
+            break
+    return [TrendRecord(title=t, ranking=i+1) for i, t in enumerate(candidates)]
+
+def make_soup(html: str) -> "BeautifulSoup":
+    from bs4 import BeautifulSoup
+
+    with span("parse.document"):
+        return BeautifulSoup(html, "html.parser")
+
+def parse_trending_html(html: str, backend: Optional[str] = None, geo: Optional[str] = None) -> List[TrendRecord]:
+    """Parse Google Trends HTML into a list of ``TrendRecord``s.
+
+    ``backend`` selects how the modern table layout is parsed: ``"lxml"``
+    (compiled XPath, the default when lxml is installed), ``"stream"``
+    (single pass that only builds the rows) or ``"bs4"``. All give
+    identical results; other layouts always use BeautifulSoup, through the
+    selector plans (remembered per ``geo``) and finally a text heuristic.
+    """
+    backend = backend or PARSER_BACKEND
+    if backend not in PARSER_BACKENDS:
+        raise ValueError(f"Unknown parser backend: {backend}")
     trends = []
+    soup = None
     
-    logger.info(f"Parsing HTML of length: {len(html)}")
+    logger.info("Parsing HTML of length: %d", len(html))
     
     # Check if this is a JavaScript-heavy page that hasn't loaded content yet
-    if "enOdEe-wZVHld-zg7Cn" in html or "jsname='oKdM2c'" in html:
+    if ("enOdEe-wZVHld-zg7Cn" in html or "jsname='oKdM2c'" in html) and backend != "bs4" and HAS_LXML:
         logger.info("Detected Google Trends table structure in HTML")
+        from . import lxml_parser, stream_parser
+
+        if backend == "stream":
+            with span("parse.stream"):
+                trends = list(stream_parser.iter_table_trends(html))
+        else:
+            trends = lxml_parser.parse_table_html(html)
+
+    elif "enOdEe-wZVHld-zg7Cn" in html or "jsname='oKdM2c'" in html:
+        logger.info("Detected Google Trends table structure in HTML")
+        soup = make_soup(html)
         
         # Handle the current Google Trends table structure
         # Look for table rows with trend data
-        trend_rows = soup.select("tr[jsname='oKdM2c']")
+        trend_rows = compiled(TABLE_ROWS).select(soup)
         
         if trend_rows:
-            logger.info(f"Found {len(trend_rows)} trend rows in table structure")
-            for i, row in enumerate(trend_rows):
-                trend = extract_trend_from_table_row(row, i + 1)
-                if trend:
-                    trends.append(trend)
-                    logger.debug(f"Added trend {i+1}: {trend.title}")
+            logger.info("Found %d trend rows in table structure", len(trend_rows))
+            with span("parse.rows"):
+                for i, row in enumerate(trend_rows):
+                    trend = extract_trend_from_table_row(row, i + 1)
+                    if trend:
+                        trends.append(trend)
         else:
             logger.warning("Table structure detected but no trend rows found")
             
-    else:
+    if not trends:
+        # The table markers also appear in other layouts (e.g. div rows), so fall through
         logger.info("No modern table structure found, trying alternative parsing methods")
+        if soup is None:
+            soup = make_soup(html)
         
         # Check if this is a mostly empty page (JavaScript not executed)
-        text_content = soup.get_text(strip=True)
-        if len(text_content) < 1000:  # Suspiciously small content
+        if not has_text(soup, 1000):  # Suspiciously small content
             logger.warning("HTML content is very small, likely JavaScript-rendered page")
-            logger.info("Content preview: " + text_content[:200] + "...")
+            logger.debug("Content preview: %.200s...", soup.get_text(strip=True))
             
         # Fallback: Handle legacy or alternative HTML structures
-        # Look for various possible selectors for trending topics
-        selectors = [
-            "td.jvkLtd div.mZ3RIc",  # Legacy structure matching the table
-            "div[jsname='oKdM2c']",
-            ".trending-story",
-            ".trending-topic",
-            "article",
-            "[data-entity-type='trending_story']",
-            # Additional selectors for different Google Trends layouts
-            ".trending-queries-table tr",
-            ".trending-searches-content div",
-            ".feed-item",
-            ".trending-story-title"
-        ]
-        
-        for selector in selectors:
-            elements = soup.select(selector)
-            if elements:
-                logger.info(f"Found {len(elements)} elements with selector: {selector}")
-                if selector == "td.jvkLtd div.mZ3RIc":
-                    # Handle legacy structure
-                    titles = [node.get_text(strip=True) for node in elements]
-                    trends = [Trend(title=t, ranking=i+1) for i, t in enumerate(titles) if t and len(t) > 2]
-                else:
-                    # Handle other structures
-                    for i, element in enumerate(elements):
-                        trend = extract_trend_data(element, i + 1)
-                        if trend and trend.title and len(trend.title) > 2:
-                            trends.append(trend)
-                
-                if trends:
-                    logger.info(f"Successfully extracted {len(trends)} trends using selector: {selector}")
-                    break
+        with span("parse.plans"):
+            trends = parse_with_plans(soup, html, geo)
         
         # Final fallback: try to extract any meaningful text that could be trends
         if not trends:
             logger.info("No structured data found, attempting intelligent text extraction")
-            # Look for text patterns that might be trending topics
-            text_elements = soup.find_all(text=True)
-            potential_trends = []
-            
-            for text in text_elements:
-                text = text.strip()
-                if (len(text) > 3 and len(text) < 100 and 
-                    not text.startswith(('http', 'www', 'google', 'search', 'trend')) and 
-                    not text.isdigit() and
-                    not text.lower() in ['search', 'trending', 'more', 'news', 'google', 'trends', 'privacy', 'terms', 'help', 'settings']):
-                    potential_trends.append(text)
-            
-            # Filter out likely non-trend text
-            filtered_trends = []
-            for text in potential_trends:
-                # Skip if it looks like code or technical content
-                if any(char in text for char in ['()', '{}', '[]', '=', ';', '<', '>', 'function', 'var ', 'const ']):
-                    continue
-                # Skip if it's all uppercase (likely a UI element)
-                if text.isupper() and len(text) < 10:
-                    continue
-                # Skip if it contains common web elements
-                if any(word in text.lower() for word in ['onload', 'gtag', 'function', 'script', 'css', 'javascript']):
-                    continue
-                filtered_trends.append(text)
-            
-            # Take unique trends and limit to reasonable number
-            unique_trends = list(dict.fromkeys(filtered_trends))[:20]
-            trends = [Trend(title=t, ranking=i+1) for i, t in enumerate(unique_trends) if len(t) > 2]
+            with span("parse.text"):
+                trends = extract_trends_from_text(soup)
     
-    logger.info(f"Parsed {len(trends)} trends from HTML")
+    logger.info("Parsed %d trends from HTML", len(trends))
+    normalize_trends(trends)
     
     # Log the first few trends for debugging
-    for i, trend in enumerate(trends[:5]):
-        logger.info(f"Trend {i+1}: {trend.title} (volume: {trend.search_volume}, change: {trend.change_percentage})")
+    if logger.isEnabledFor(logging.DEBUG):
+        for i, trend in enumerate(trends[:5]):
+            logger.debug("Trend %d: %s (volume: %s, change: %s)", i + 1, trend.title, trend.search_volume, trend.change_percentage)
     
     return trends
 
-def extract_trend_data(element, ranking: int) -> Trend:
+def extract_trend_data(element, ranking: int) -> TrendRecord:
     """Extract trend data from a single HTML element."""
-    title = ""
     search_volume = None
     change_percentage = None
     url = None
     
-    # Extract title
-    title_selectors = [
-        ".mZ3RIc",
-        "h3",
-        "h2",
-        ".title",
-        "[data-entity-name]",
-        "a"
-    ]
-    
-    for selector in title_selectors:
-        title_element = element.select_one(selector)
-        if title_element:
-            title = title_element.get_text(strip=True)
-            break
+    *titles, volume_element, change_element, link_element = first_matches(element, FIELD_SELECTORS)
+    
+    # Extract title from the first title candidate present
+    title_element = next((candidate for candidate in titles if candidate is not None), None)
+    title = title_element.get_text(strip=True) if title_element is not None else ""
     
     # If no title found, try to get any text content
     if not title:
         title = element.get_text(strip=True)
     
     # Extract search volume if available
-    volume_element = element.select_one(".search-volume, .volume, [data-volume]")
     if volume_element:
         search_volume = volume_element.get_text(strip=True)
     
     # Extract change percentage if available
-    change_element = element.select_one(".change, .percentage, [data-change]")
     if change_element:
         change_percentage = change_element.get_text(strip=True)
     
     # Extract URL if available
-    link_element = element.select_one("a[href]")
     if link_element:
         url = link_element.get('href')
     
-    return Trend(
+    return TrendRecord(
         title=title,
         ranking=ranking,
         search_volume=search_volume,
@@ -167,7 +361,7 @@ def extract_trend_data(element, ranking: int) -> Trend:
         url=url
     ) if title else None
 
-def extract_trend_from_table_row(row, ranking: int) -> Trend:
+def extract_trend_from_table_row(row, ranking: int) -> TrendRecord:
     """Extract trend data from a Google Trends table row."""
     title = ""
     search_volume = None
@@ -175,64 +369,62 @@ def extract_trend_from_table_row(row, ranking: int) -> Trend:
     url = None
     related_queries = []
     
-    logger.debug(f"Processing row {ranking}: {row}")
-    
     # Extract title from the main trend cell
     # Based on the HTML structure: <td class="jvkLtd"><div class="mZ3RIc">TITLE</div></td>
-    title_element = row.select_one("td.jvkLtd div.mZ3RIc")
+    title_element = compiled(ROW_TITLE).select_one(row)
     if title_element:
         title = title_element.get_text(strip=True)
-        logger.debug(f"Found title: {title}")
+        logger.debug("Found title: %s", title)
     
     # Extract search volume from the volume cell
     # Based on the HTML structure: <td class="dQOTjf"><div class="lqv0Cb">VOLUME</div></td>
-    volume_element = row.select_one("td.dQOTjf div.lqv0Cb")
+    volume_element = compiled(ROW_VOLUME).select_one(row)
     if volume_element:
         search_volume = volume_element.get_text(strip=True)
-        logger.debug(f"Found search volume: {search_volume}")
+        logger.debug("Found search volume: %s", search_volume)
         # Ensure it has proper suffix
         if search_volume and not search_volume.endswith("searches") and any(c.isdigit() for c in search_volume):
             search_volume += " searches"
     
     # Extract change percentage from the change indicator
     # Based on the HTML structure: <td class="dQOTjf"><div class="wqrjjc"><div class="TXt85b">CHANGE</div></div></td>
-    change_element = row.select_one("td.dQOTjf div.wqrjjc div.TXt85b")
+    change_element = compiled(ROW_CHANGE).select_one(row)
     if change_element:
         change_percentage = change_element.get_text(strip=True)
-        logger.debug(f"Found change percentage: {change_percentage}")
+        logger.debug("Found change percentage: %s", change_percentage)
     
     # Extract URL from any links in the row
-    link_element = row.select_one("a[href]")
+    link_element = compiled(LINK).select_one(row)
     if link_element:
         href = link_element.get('href')
         # Make sure it's a valid Google Trends URL
         if href and ('trends.google.com' in href or href.startswith('/')):
             url = href if href.startswith('http') else f"https://trends.google.com{href}"
-            logger.debug(f"Found URL: {url}")
+            logger.debug("Found URL: %s", url)
     
     # Extract related queries from the breakdown section
     # Based on the HTML structure: <td class="xm9Xec">...breakdown buttons...</td>
-    breakdown_section = row.select_one("td.xm9Xec")
+    breakdown_section = compiled(ROW_BREAKDOWN).select_one(row)
     if breakdown_section:
         # Look for buttons with data-term attribute
-        breakdown_buttons = breakdown_section.select("button[data-term]")
+        breakdown_buttons = compiled(BREAKDOWN_TERMS).select(breakdown_section)
         for button in breakdown_buttons:
             term = button.get('data-term')
             if term and term != title and term not in related_queries:
                 related_queries.append(term)
-                logger.debug(f"Found related query: {term}")
+                logger.debug("Found related query: %s", term)
         
         # If no data-term attributes, try to extract from button text
         if not related_queries:
-            button_elements = breakdown_section.select("button")
+            button_elements = compiled(BREAKDOWN_BUTTONS).select(breakdown_section)
             for button in button_elements:
                 term = button.get_text(strip=True)
                 if term and term != title and len(term) > 2 and term not in related_queries:
                     related_queries.append(term)
-                    logger.debug(f"Found related query from button text: {term}")
+                    logger.debug("Found related query from button text: %s", term)
     
     # Create the trend object
-    trend = Trend(
+    trend = TrendRecord(
         title=title,
         ranking=ranking,
         search_volume=search_volume,
@@ -242,8 +434,8 @@ def extract_trend_from_table_row(row, ranking: int) -> Trend:
     ) if title else None
     
     if trend:
-        logger.debug(f"Created trend: {trend.title} (ranking: {trend.ranking})")
+        logger.debug("Created trend: %s (ranking: %d)", trend.title, trend.ranking)
     else:
-        logger.warning(f"Could not create trend from row {ranking}")
+        logger.warning("Could not create trend from row %d", ranking)
     
     return trend
@@ -0,0 +1,140 @@
+"""Filtering, sorting and pagination of cached trend results.
+
+``apply_query`` answers a ``TrendQuery`` from a ``TrendSnapshot`` without
+touching Google. Per response, an index with case-folded titles and one
+sort permutation per ordering is built on first use and kept while the
+response stays cached, so re-slicing the same result set only walks a
+precomputed list.
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Set, Tuple
+
+from pydantic_core import to_json
+
+from .cache import CACHE_MAX_ENTRIES
+from .models import TrendQuery
+from .records import TREND_FIELDS, TrendSnapshot
+
+# Orderings accepted by TrendQuery.order_by (optionally prefixed with "-")
+ORDER_KEYS = ("ranking", "title", "search_volume_min", "change_percent")
+TOPIC_FIELDS = TREND_FIELDS
+
+
+class InvalidQuery(ValueError):
+    """Raised for query parameters that cannot be applied."""
+
+
+class ResultIndex:
+    """Precomputed lookups over the topics of one response."""
+
+    def __init__(self, response: TrendSnapshot):
+        self.response = response
+        self.topics = response.topics
+        self.titles = [topic.title.casefold() for topic in self.topics]
+        self.volumes = [topic.search_volume_min for topic in self.topics]
+        self._orders: Dict[Tuple[str, bool], List[int]] = {}
+        self._lock = threading.Lock()
+
+    def order(self, key: str, descending: bool = False) -> List[int]:
+        """Topic positions sorted by ``key``; topics without a value go last either way."""
+        cached = self._orders.get((key, descending))
+        if cached is not None:
+            return cached
+        values = [getattr(topic, key) for topic in self.topics]
+        if key == "title":
+            values = self.titles
+        present = [i for i, value in enumerate(values) if value is not None]
+        missing = [i for i, value in enumerate(values) if value is None]
+        # sort() is stable even when reversed, so ties keep the upstream order
+        present.sort(key=values.__getitem__, reverse=descending)
+        order = present + missing
+        with self._lock:
+            self._orders[(key, descending)] = order
+        return order
+
+
+_indexes: "OrderedDict[int, ResultIndex]" = OrderedDict()
+_indexes_lock = threading.Lock()
+
+def index_for(response: TrendSnapshot) -> ResultIndex:
+    """The index of ``response``, built once and kept for as many responses as the cache holds."""
+    key = id(response)
+    with _indexes_lock:
+        index = _indexes.get(key)
+        # The index holds a reference to its response, so a matching id is the same object
+        if index is not None and index.response is response:
+            _indexes.move_to_end(key)
+            return index
+    index = ResultIndex(response)
+    with _indexes_lock:
+        _indexes[key] = index
+        _indexes.move_to_end(key)
+        while len(_indexes) > CACHE_MAX_ENTRIES:
+            _indexes.popitem(last=False)
+    return index
+
+def parse_fields(fields: Optional[str]) -> Optional[Set[str]]:
+    """The requested topic fields, or None for all of them."""
+    if not fields:
+        return None
+    requested = {name.strip() for name in fields.split(",") if name.strip()}
+    unknown = requested - set(TOPIC_FIELDS)
+    if unknown:
+        raise InvalidQuery(f"Unknown fields: {', '.join(sorted(unknown))}")
+    return requested
+
+def validate_query(query: TrendQuery) -> None:
+    """Raise ``InvalidQuery`` for parameters ``apply_query`` would reject."""
+    if query.order_by and query.order_by.lstrip("-") not in ORDER_KEYS:
+        raise InvalidQuery(f"order_by must be one of {', '.join(ORDER_KEYS)}, optionally prefixed with '-'")
+    if query.limit is not None and query.limit < 0:
+        raise InvalidQuery("limit must not be negative")
+    if query.offset < 0:
+        raise InvalidQuery("offset must not be negative")
+    parse_fields(query.fields)
+
+def selects_all(query: TrendQuery) -> bool:
+    """True when the query keeps every topic in upstream order (``fields`` aside)."""
+    return query.model_copy(update={"fields": None}) == TrendQuery()
+
+def apply_query(response: TrendSnapshot, query: TrendQuery) -> TrendSnapshot:
+    """The topics of ``response`` matching ``query``, sorted and paged.
+
+    ``total_trends`` is the number of matching topics before paging.
+    """
+    validate_query(query)
+    if selects_all(query):
+        return response
+    index = index_for(response)
+
+    if query.order_by:
+        order = index.order(query.order_by.lstrip("-"), descending=query.order_by.startswith("-"))
+    else:
+        order = range(len(index.topics))
+
+    needle = query.title_contains.casefold() if query.title_contains else None
+    min_volume = query.min_volume
+    if needle is None and min_volume is None:
+        matches = order
+    else:
+        titles, volumes = index.titles, index.volumes
+        matches = [
+            i for i in order
+            if (needle is None or needle in titles[i])
+            and (min_volume is None or (volumes[i] is not None and volumes[i] >= min_volume))
+        ]
+
+    end = None if query.limit is None else query.offset + query.limit
+    topics = [index.topics[i] for i in matches[query.offset:end]]
+    return response.replace(topics=topics, total_trends=len(matches))
+
+def dump_json(response: TrendSnapshot, fields: Optional[str]) -> str:
+    """Serialize ``response`` with only the requested topic fields."""
+    requested = parse_fields(fields)
+    if requested is None:
+        return response.to_json().decode("utf-8")
+    names = [name for name in TOPIC_FIELDS if name in requested]
+    topics = [{name: getattr(topic, name) for name in names} for topic in response.topics]
+    return to_json({"topics": topics, **response.as_dict(topics=False)}).decode("utf-8")
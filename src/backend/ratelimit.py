@@ -0,0 +1,401 @@
+"""Rate limiting and circuit breaking for requests to upstream hosts.
+
+Every request to Google goes through an ``UpstreamGuard``. A token bucket
+per host spaces requests out; with the SQLite backend the buckets live in a
+file so every worker on the machine draws from the same budget. The rate
+adapts: it is halved whenever the host throttles us and creeps back up
+with each successful response.
+
+A circuit breaker per host opens on 429s, captcha pages or repeated 5xx
+and network errors. While it is open, requests fail immediately with
+``UpstreamUnavailable`` so callers can answer from the cache instead of
+waiting on scrapes that are bound to fail. After an exponentially growing,
+jittered delay a single probe request is let through; its outcome closes
+the breaker or opens it again for longer.
+"""
+
+import logging
+import math
+import os
+import random
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Callable, Dict, Optional
+from urllib.parse import urlparse
+
+from .executor import ServiceBusy
+
+logger = logging.getLogger(__name__)
+
+# Token bucket per upstream host
+UPSTREAM_LIMIT_ENABLED = os.getenv("UPSTREAM_LIMIT_ENABLED", "true").lower() == "true"
+UPSTREAM_RATE = float(os.getenv("UPSTREAM_RATE", "1.0"))
+UPSTREAM_BURST = float(os.getenv("UPSTREAM_BURST", "5"))
+# Longest a request waits for a token before giving up
+UPSTREAM_MAX_WAIT = float(os.getenv("UPSTREAM_MAX_WAIT", "10"))
+# Shared buckets: empty for in-process only, or "sqlite" for a file shared between workers
+UPSTREAM_LIMIT_BACKEND = os.getenv("UPSTREAM_LIMIT_BACKEND", "")
+UPSTREAM_LIMIT_PATH = os.getenv("UPSTREAM_LIMIT_PATH", "upstream_limits.sqlite3")
+# Consecutive 5xx or network failures that open the breaker (429s and captchas open it at once)
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("BREAKER_FAILURE_THRESHOLD", "3"))
+BREAKER_BASE_BACKOFF = float(os.getenv("BREAKER_BASE_BACKOFF", "30"))
+BREAKER_MAX_BACKOFF = float(os.getenv("BREAKER_MAX_BACKOFF", "900"))
+# Fraction of each backoff that is randomized so workers don't probe in lockstep
+BREAKER_JITTER = float(os.getenv("BREAKER_JITTER", "0.5"))
+
+# Lowest fraction of UPSTREAM_RATE the adaptive limiter slows down to
+MIN_RATE_FACTOR = 1 / 16
+# Fraction of UPSTREAM_RATE regained per successful response
+RATE_RECOVERY = 0.05
+
+# Only the start of a page is searched for captcha markers; the interstitial is small
+CAPTCHA_SCAN_CHARS = 65536
+CAPTCHA_MARKERS = (
+    "unusual traffic from your computer network",
+    "g-recaptcha",
+    'id="captcha-form"',
+)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class UpstreamUnavailable(ServiceBusy):
+    """Raised instead of contacting a host whose breaker is open or whose budget is spent."""
+
+    def __init__(self, host: str, retry_after: float, reason: str):
+        seconds = max(1, math.ceil(retry_after))
+        super().__init__(seconds, f"Upstream {host} unavailable ({reason}), retry after {seconds}s")
+        self.host = host
+        self.reason = reason
+
+
+def looks_like_captcha(text: str, url: str = "") -> bool:
+    """True for Google's "unusual traffic" interstitial instead of real content."""
+    if "/sorry/" in url:
+        return True
+    head = text[:CAPTCHA_SCAN_CHARS]
+    return any(marker in head for marker in CAPTCHA_MARKERS)
+
+def _refill(tokens: float, elapsed: float, rate: float, burst: float) -> float:
+    return min(burst, tokens + max(0.0, elapsed) * rate)
+
+
+class Limiter(ABC):
+    """Interface for token bucket storage, keyed by host."""
+
+    @abstractmethod
+    def try_acquire(self, host: str, rate: float, burst: float) -> float:
+        """Take a token and return 0, or return the seconds until one is available."""
+
+    def close(self) -> None:
+        pass
+
+
+class LocalLimiter(Limiter):
+    """Token buckets held in this process."""
+
+    def __init__(self, clock: Callable[[], float] = time.monotonic):
+        self.clock = clock
+        self._buckets: Dict[str, tuple] = {}
+        self._lock = threading.Lock()
+
+    def try_acquire(self, host: str, rate: float, burst: float) -> float:
+        with self._lock:
+            now = self.clock()
+            tokens, updated = self._buckets.get(host, (burst, now))
+            tokens = _refill(tokens, now - updated, rate, burst)
+            if tokens >= 1:
+                self._buckets[host] = (tokens - 1, now)
+                return 0.0
+            self._buckets[host] = (tokens, now)
+            return (1 - tokens) / rate
+
+
+class SQLiteLimiter(Limiter):
+    """Token buckets in a local SQLite file, standing in for a shared rate limit server.
+
+    Every process pointing at the same file draws from the same buckets.
+    Each acquisition is one immediate transaction, so concurrent workers
+    never both spend the last token.
+    """
+
+    def __init__(self, path: str = UPSTREAM_LIMIT_PATH, clock: Callable[[], float] = time.time):
+        self.path = path
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=10, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS upstream_buckets ("
+            "host TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)"
+        )
+
+    def try_acquire(self, host: str, rate: float, burst: float) -> float:
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                # Wall-clock time, read inside the transaction, is comparable across processes
+                now = self.clock()
+                row = self._conn.execute(
+                    "SELECT tokens, updated FROM upstream_buckets WHERE host = ?", (host,)
+                ).fetchone()
+                tokens = burst if row is None else _refill(row[0], now - row[1], rate, burst)
+                wait = 0.0 if tokens >= 1 else (1 - tokens) / rate
+                if tokens >= 1:
+                    tokens -= 1
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO upstream_buckets (host, tokens, updated) VALUES (?, ?, ?)",
+                    (host, tokens, now),
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return wait
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class CircuitBreaker:
+    """Closed, open or half-open state of one upstream host."""
+
+    def __init__(
+        self,
+        failure_threshold: int = BREAKER_FAILURE_THRESHOLD,
+        base_backoff: float = BREAKER_BASE_BACKOFF,
+        max_backoff: float = BREAKER_MAX_BACKOFF,
+        jitter: float = BREAKER_JITTER,
+        clock: Callable[[], float] = time.monotonic,
+        rand: Callable[[], float] = random.random,
+    ):
+        self.failure_threshold = max(1, failure_threshold)
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.jitter = min(1.0, max(0.0, jitter))
+        self.clock = clock
+        self.rand = rand
+        self.state = CLOSED
+        self.reason: Optional[str] = None
+        self.failures = 0
+        self.trips = 0
+        self.open_until = 0.0
+        self._probe_started: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def _open(self, reason: str) -> None:
+        self.trips += 1
+        backoff = min(self.max_backoff, self.base_backoff * 2 ** (self.trips - 1))
+        backoff *= 1 - self.jitter * self.rand()
+        self.state = OPEN
+        self.reason = reason
+        self.open_until = self.clock() + backoff
+        self._probe_started = None
+        logger.warning("Circuit breaker opened (%s) for %.0fs", reason, backoff)
+
+    def retry_after(self) -> float:
+        """Seconds until a request may be attempted, 0 when one may be sent now."""
+        with self._lock:
+            if self.state == CLOSED:
+                return 0.0
+            if self.state == OPEN:
+                return max(0.0, self.open_until - self.clock())
+            # Half-open: only the probe goes through, unless it never reported back
+            return max(0.0, self._probe_started + self.base_backoff - self.clock())
+
+    def allow(self) -> bool:
+        """Whether a request may be sent now; in the half-open state only one probe is let through."""
+        with self._lock:
+            now = self.clock()
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN:
+                if now < self.open_until:
+                    return False
+                self.state = HALF_OPEN
+                self._probe_started = now
+                return True
+            if now >= self._probe_started + self.base_backoff:
+                # The last probe was lost without an outcome; send another
+                self._probe_started = now
+                return True
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self.state != CLOSED:
+                logger.info("Circuit breaker closed after a successful probe")
+            self.state = CLOSED
+            self.reason = None
+            self.failures = 0
+            self.trips = 0
+            self._probe_started = None
+
+    def record_failure(self, reason: str, trip: bool = False) -> None:
+        """Count a failure; ``trip`` opens the breaker regardless of the threshold."""
+        with self._lock:
+            self.failures += 1
+            if self.state == HALF_OPEN or trip or self.failures >= self.failure_threshold:
+                self._open(reason)
+
+    def stats(self) -> dict:
+        retry_after = self.retry_after()
+        with self._lock:
+            return {"state": self.state, "reason": self.reason, "failures": self.failures,
+                    "trips": self.trips, "retry_after": retry_after}
+
+
+class UpstreamGuard:
+    """Token buckets and circuit breakers for every upstream host."""
+
+    def __init__(
+        self,
+        limiter: Optional[Limiter] = None,
+        rate: float = UPSTREAM_RATE,
+        burst: float = UPSTREAM_BURST,
+        max_wait: float = UPSTREAM_MAX_WAIT,
+        breaker_factory: Callable[[], CircuitBreaker] = CircuitBreaker,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        self.limiter = limiter or LocalLimiter()
+        self.rate = rate
+        self.burst = burst
+        self.max_wait = max_wait
+        self.breaker_factory = breaker_factory
+        self.sleep = sleep
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._rate_factors: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._stats = {"throttled": 0, "rejected": 0, "waited_seconds": 0.0}
+
+    def breaker(self, host: str) -> CircuitBreaker:
+        with self._lock:
+            breaker = self._breakers.get(host)
+            if breaker is None:
+                breaker = self._breakers[host] = self.breaker_factory()
+            return breaker
+
+    def retry_after(self, host: str) -> float:
+        """Seconds until requests to ``host`` are attempted again, 0 when they are."""
+        with self._lock:
+            breaker = self._breakers.get(host)
+        return breaker.retry_after() if breaker is not None else 0.0
+
+    def current_rate(self, host: str) -> float:
+        with self._lock:
+            return self.rate * self._rate_factors.get(host, 1.0)
+
+    def _reject(self, host: str, retry_after: float, reason: str) -> UpstreamUnavailable:
+        with self._lock:
+            self._stats["rejected"] += 1
+        return UpstreamUnavailable(host, retry_after, reason)
+
+    def check(self, host: str) -> None:
+        """Raise ``UpstreamUnavailable`` without waiting if ``host`` is not being contacted."""
+        breaker = self.breaker(host)
+        retry_after = breaker.retry_after()
+        if retry_after > 0:
+            raise self._reject(host, retry_after, breaker.reason or "circuit open")
+
+    def acquire(self, url: str, max_wait: Optional[float] = None) -> None:
+        """Wait for permission to request ``url``, or raise ``UpstreamUnavailable``.
+
+        ``max_wait`` shortens the guard's own limit on waiting for a token,
+        e.g. to what is left of a fetch deadline.
+        """
+        host = urlparse(url).netloc
+        self.check(host)
+        breaker = self.breaker(host)
+
+        if UPSTREAM_LIMIT_ENABLED:
+            deadline = time.monotonic() + (self.max_wait if max_wait is None else min(self.max_wait, max_wait))
+            while True:
+                wait = self.limiter.try_acquire(host, self.current_rate(host), self.burst)
+                if wait <= 0:
+                    break
+                if time.monotonic() + wait > deadline:
+                    raise self._reject(host, wait, "rate limited")
+                with self._lock:
+                    self._stats["waited_seconds"] += wait
+                self.sleep(wait)
+
+        if not breaker.allow():
+            raise self._reject(host, breaker.retry_after(), breaker.reason or "circuit open")
+
+    def record(self, url: str, status: Optional[int] = None, captcha: bool = False,
+               error: Optional[BaseException] = None) -> None:
+        """Feed the outcome of a request to ``url`` into its host's breaker and rate."""
+        host = urlparse(url).netloc
+        breaker = self.breaker(host)
+        if captcha or status == 429:
+            reason = "captcha" if captcha else "429 Too Many Requests"
+            with self._lock:
+                self._stats["throttled"] += 1
+                factor = self._rate_factors.get(host, 1.0)
+                self._rate_factors[host] = max(MIN_RATE_FACTOR, factor / 2)
+            breaker.record_failure(reason, trip=True)
+        elif error is not None or (status is not None and status >= 500):
+            breaker.record_failure(f"{status} error" if error is None else type(error).__name__)
+        else:
+            with self._lock:
+                factor = self._rate_factors.get(host, 1.0)
+                if factor < 1.0:
+                    self._rate_factors[host] = min(1.0, factor + RATE_RECOVERY)
+            breaker.record_success()
+
+    def observe(self, url: str, status: Optional[int], text: str = "", final_url: str = "") -> None:
+        """Record a response and raise ``UpstreamUnavailable`` if the host is throttling us.
+
+        Both a 429 and a captcha page served in place of the content count.
+        """
+        captcha = looks_like_captcha(text, final_url or url)
+        self.record(url, status=status, captcha=captcha)
+        if captcha or status == 429:
+            host = urlparse(url).netloc
+            raise self._reject(host, self.retry_after(host), "captcha" if captcha else "429 Too Many Requests")
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            hosts = list(self._breakers.items())
+        stats["hosts"] = {
+            host: {**breaker.stats(), "rate": self.current_rate(host)} for host, breaker in hosts
+        }
+        return stats
+
+    def close(self) -> None:
+        self.limiter.close()
+
+
+_upstream_guard: Optional[UpstreamGuard] = None
+_upstream_guard_lock = threading.Lock()
+
+def create_limiter() -> Limiter:
+    """Build the token bucket storage selected by ``UPSTREAM_LIMIT_BACKEND``."""
+    if UPSTREAM_LIMIT_BACKEND == "sqlite":
+        return SQLiteLimiter(UPSTREAM_LIMIT_PATH)
+    if UPSTREAM_LIMIT_BACKEND:
+        logger.warning("Unknown rate limit backend %r, using in-process buckets only", UPSTREAM_LIMIT_BACKEND)
+    return LocalLimiter()
+
+def get_upstream_guard() -> UpstreamGuard:
+    """Return the process-wide upstream guard, creating it on first use."""
+    global _upstream_guard
+    if _upstream_guard is None:
+        with _upstream_guard_lock:
+            if _upstream_guard is None:
+                _upstream_guard = UpstreamGuard(create_limiter())
+    return _upstream_guard
+
+def close_upstream_guard() -> None:
+    """Release the process-wide guard's storage if it was created."""
+    global _upstream_guard
+    with _upstream_guard_lock:
+        if _upstream_guard is not None:
+            _upstream_guard.close()
+            _upstream_guard = None
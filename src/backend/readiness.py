@@ -0,0 +1,118 @@
+"""Event-driven readiness detection for pages rendered in Selenium.
+
+Instead of fixed sleeps, ``wait_for_rows`` polls the number of trend rows
+(and a MutationObserver counter for pages without rows) and returns as soon
+as the content has stopped changing.
+"""
+
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Upper bound on the time spent waiting for content after navigation
+READY_MAX_WAIT = float(os.getenv("READY_MAX_WAIT", "15"))
+READY_POLL_INTERVAL = float(os.getenv("READY_POLL_INTERVAL", "0.2"))
+# How long the row count must stay unchanged before the page counts as ready
+READY_STABLE_FOR = float(os.getenv("READY_STABLE_FOR", "0.6"))
+# How long a page without trend rows must be free of DOM mutations
+READY_QUIET_FOR = float(os.getenv("READY_QUIET_FOR", "2.0"))
+
+ROW_SELECTOR = "tr[jsname='oKdM2c']"
+
+# Installs a MutationObserver once per document and reports
+# [row count, mutations seen so far, document.readyState]
+PROBE_SCRIPT = """
+if (!window.__trendsMutations) {
+  window.__trendsMutations = {count: 0};
+  new MutationObserver(function (records) {
+    window.__trendsMutations.count += records.length;
+  }).observe(document.documentElement, {childList: true, subtree: true});
+}
+return [document.querySelectorAll(arguments[0]).length,
+        window.__trendsMutations.count,
+        document.readyState];
+"""
+
+SCROLL_SCRIPT = "window.scrollTo(0, document.body.scrollHeight);"
+
+
+@dataclass
+class ReadinessReport:
+    """Outcome of a readiness wait with the time spent in each phase (seconds)."""
+
+    ready: bool
+    row_count: int
+    reason: str
+    timings: Dict[str, float] = field(default_factory=dict)
+
+
+def wait_for_rows(
+    driver: Any,
+    max_wait: float = READY_MAX_WAIT,
+    poll_interval: float = READY_POLL_INTERVAL,
+    stable_for: float = READY_STABLE_FOR,
+    quiet_for: float = READY_QUIET_FOR,
+    selector: str = ROW_SELECTOR,
+    clock: Callable[[], float] = time.monotonic,
+    sleep: Callable[[float], None] = time.sleep,
+    cancelled: Optional[threading.Event] = None,
+) -> ReadinessReport:
+    """Wait until the trend rows have rendered and stopped changing.
+
+    The page is ready once at least one row exists and the row count has
+    been unchanged for ``stable_for`` seconds. The page is scrolled to the
+    bottom when rows first appear so lazily loaded rows are included in
+    the count. Layouts without trend rows are considered ready once the
+    document has loaded and no DOM mutations happened for ``quiet_for``
+    seconds. Gives up after ``max_wait`` seconds, or as soon as ``cancelled``
+    is set.
+    """
+    start = clock()
+    deadline = start + max_wait
+    timings: Dict[str, float] = {}
+
+    last_rows = -1
+    last_mutations = -1
+    rows_changed_at = start
+    mutations_changed_at = start
+    scrolled = False
+
+    while True:
+        now = clock()
+        if cancelled is not None and cancelled.is_set():
+            timings["settled"] = now - start
+            return ReadinessReport(False, max(last_rows, 0), "cancelled", timings)
+        try:
+            rows, mutations, ready_state = driver.execute_script(PROBE_SCRIPT, selector)
+        except Exception as e:
+            logger.debug("Readiness probe failed: %s", e)
+            rows, mutations, ready_state = 0, last_mutations, "loading"
+
+        if rows != last_rows:
+            last_rows, rows_changed_at = rows, now
+        if mutations != last_mutations:
+            last_mutations, mutations_changed_at = mutations, now
+
+        if rows > 0:
+            if "first_rows" not in timings:
+                timings["first_rows"] = now - start
+            if not scrolled:
+                driver.execute_script(SCROLL_SCRIPT)
+                scrolled = True
+            elif now - rows_changed_at >= stable_for:
+                timings["settled"] = now - start
+                return ReadinessReport(True, rows, "stable", timings)
+        elif ready_state == "complete" and now - mutations_changed_at >= quiet_for:
+            timings["settled"] = now - start
+            return ReadinessReport(True, 0, "quiet", timings)
+
+        if now >= deadline:
+            timings["settled"] = now - start
+            return ReadinessReport(False, max(rows, 0), "timeout", timings)
+
+        sleep(min(poll_interval, max(0.0, deadline - now)))
@@ -0,0 +1,143 @@
+"""Compact, unvalidated trends for the scraping and caching hot path.
+
+Parsers, the RSS and RPC decoders and the sample data build
+``TrendRecord``s: slotted objects without pydantic's per-instance
+``__dict__`` and validation. A fetch returns them in a ``TrendSnapshot``,
+which is what the cache, the event hub, queries, exports and history work
+with. They become the pydantic ``Trend`` and ``TrendsResponse`` models only
+where a response leaves the service, in the API, the CLI and batch
+results. ``to_json`` writes the same bytes as the models' ``model_dump_json``
+without building them.
+"""
+
+from datetime import datetime
+from typing import List, Optional, Union
+
+from pydantic_core import from_json, to_json
+
+from .models import Trend, TrendsResponse
+
+# Attribute order follows the models, so dicts and JSON come out identical
+TREND_FIELDS = tuple(Trend.model_fields)
+SNAPSHOT_FIELDS = tuple(TrendsResponse.model_fields)
+
+
+class TrendRecord:
+    """One trending topic, with the fields of ``Trend``."""
+
+    __slots__ = TREND_FIELDS
+
+    def __init__(self, title: str, search_volume: Optional[str] = None, ranking: Optional[int] = None,
+                 change_percentage: Optional[str] = None, related_queries: Optional[List[str]] = None,
+                 url: Optional[str] = None, search_volume_min: Optional[int] = None,
+                 change_percent: Optional[float] = None):
+        self.title = title
+        self.search_volume = search_volume
+        self.ranking = ranking
+        self.change_percentage = change_percentage
+        self.related_queries = related_queries
+        self.url = url
+        self.search_volume_min = search_volume_min
+        self.change_percent = change_percent
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, TrendRecord) and self.as_dict() == other.as_dict()
+
+    __hash__ = None
+
+    def __repr__(self) -> str:
+        return f"TrendRecord({self.title!r}, ranking={self.ranking!r})"
+
+    def as_dict(self) -> dict:
+        # Spelled out: about twice as fast as looping over TREND_FIELDS with getattr
+        return {
+            "title": self.title,
+            "search_volume": self.search_volume,
+            "ranking": self.ranking,
+            "change_percentage": self.change_percentage,
+            "related_queries": self.related_queries,
+            "url": self.url,
+            "search_volume_min": self.search_volume_min,
+            "change_percent": self.change_percent,
+        }
+
+    def copy(self) -> "TrendRecord":
+        """An independent copy, including the related queries list."""
+        related = None if self.related_queries is None else list(self.related_queries)
+        return TrendRecord(self.title, self.search_volume, self.ranking, self.change_percentage, related,
+                           self.url, self.search_volume_min, self.change_percent)
+
+    def __deepcopy__(self, memo) -> "TrendRecord":
+        return self.copy()
+
+    def to_model(self) -> Trend:
+        return Trend(**self.as_dict())
+
+    def to_json(self) -> bytes:
+        """Same bytes as ``to_model().model_dump_json()``."""
+        return to_json(self.as_dict())
+
+    @classmethod
+    def from_model(cls, trend: Trend) -> "TrendRecord":
+        return cls(**dict(trend))
+
+
+class TrendSnapshot:
+    """The topics of one fetch and where they came from, with the fields of ``TrendsResponse``."""
+
+    __slots__ = SNAPSHOT_FIELDS
+
+    def __init__(self, topics: List[TrendRecord], source_url: str, timestamp: datetime, total_trends: int,
+                 location: str, language: str, source_tier: Optional[str] = None,
+                 fetch_ms: Optional[float] = None):
+        self.topics = topics
+        self.source_url = source_url
+        self.timestamp = timestamp
+        self.total_trends = total_trends
+        self.location = location
+        self.language = language
+        self.source_tier = source_tier
+        self.fetch_ms = fetch_ms
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, TrendSnapshot) and self.as_dict() == other.as_dict()
+
+    __hash__ = None
+
+    def __repr__(self) -> str:
+        return f"TrendSnapshot({self.location!r}, {self.language!r}, {len(self.topics)} topics)"
+
+    def replace(self, **changes) -> "TrendSnapshot":
+        """A copy with ``changes`` applied; the topics themselves are shared."""
+        return TrendSnapshot(**{**{name: getattr(self, name) for name in SNAPSHOT_FIELDS}, **changes})
+
+    def as_dict(self, topics: bool = True) -> dict:
+        """Fields as plain values, the topics as dicts unless ``topics`` is False."""
+        values = {name: getattr(self, name) for name in SNAPSHOT_FIELDS}
+        if topics:
+            values["topics"] = [topic.as_dict() for topic in self.topics]
+        else:
+            del values["topics"]
+        return values
+
+    def to_model(self) -> TrendsResponse:
+        """The API model, validated once here rather than topic by topic while scraping."""
+        return TrendsResponse.model_validate(self.as_dict())
+
+    def to_json(self) -> bytes:
+        """Same bytes as ``to_model().model_dump_json()``."""
+        return to_json(self.as_dict())
+
+    @classmethod
+    def from_model(cls, response: TrendsResponse) -> "TrendSnapshot":
+        values = dict(response)
+        values["topics"] = [TrendRecord.from_model(topic) for topic in response.topics]
+        return cls(**values)
+
+    @classmethod
+    def from_json(cls, data: Union[str, bytes]) -> "TrendSnapshot":
+        """Read what ``to_json`` wrote, e.g. from the shared cache, without building models."""
+        values = from_json(data)
+        values["topics"] = [TrendRecord(**topic) for topic in values["topics"]]
+        values["timestamp"] = datetime.fromisoformat(values["timestamp"])
+        return cls(**values)
@@ -0,0 +1,192 @@
+"""Trending topics straight from the JSON the trending page loads itself.
+
+The table on trends.google.com/trending is filled from a ``batchexecute``
+RPC (id ``i0OFE``). Its response is decoded here directly into
+``TrendRecord``s, skipping the browser's DOM and the HTML parsers. The
+payload is either requested directly with a form POST or captured from a
+rendered page's network traffic through Chrome's performance log.
+
+A response starts with the ``)]}'`` guard line followed by one or more
+JSON envelopes, optionally each preceded by its length. Every
+``["wrb.fr", rpc_id, payload_json, ...]`` entry carries the result of one
+call as a JSON string. For ``i0OFE`` the payload's second element is the
+list of trends, one array per trend::
+
+    [keyword, news, geo, [started_at], [ended_at] | None, _, volume, _,
+     growth_percent, [related keywords], [category ids], news_tokens, normalized]
+"""
+
+import base64
+import json
+import logging
+import threading
+import time
+from typing import Any, Callable, Iterator, List, Optional, Tuple
+from urllib.parse import parse_qs, urlencode, urlparse
+
+from .models import TrendRequest
+from .records import TrendRecord
+
+logger = logging.getLogger(__name__)
+
+BATCHEXECUTE_URL = "https://trends.google.com/_/TrendsUi/data/batchexecute"
+TRENDING_RPC_ID = "i0OFE"
+# Window of the trending list when the request doesn't specify one
+DEFAULT_HOURS = 24
+
+XSSI_PREFIX = ")]}'"
+
+# Sent with direct calls so they look like the page's own XHR
+RPC_HEADERS = {
+    "Content-Type": "application/x-www-form-urlencoded;charset=UTF-8",
+    "Origin": "https://trends.google.com",
+    "Referer": "https://trends.google.com/trending",
+    "Sec-Fetch-Site": "same-origin",
+    "Sec-Fetch-Mode": "cors",
+    "Sec-Fetch-Dest": "empty",
+}
+
+# Positions within one trend array
+KEYWORD, STARTED, ENDED, VOLUME, GROWTH, RELATED, CATEGORIES = 0, 3, 4, 6, 8, 9, 10
+
+# TrendRequest.sort values of the trending page and how to order by them
+SORT_KEYS = {
+    "search-volume": (lambda item: _at(item, VOLUME) or 0, True),
+    "recency": (lambda item: (_at(item, STARTED) or [0])[0], True),
+    "title": (lambda item: item[KEYWORD].casefold(), False),
+}
+
+_decoder = json.JSONDecoder()
+
+
+class RpcError(ValueError):
+    """Raised for responses that don't contain the expected RPC result."""
+
+
+def _at(item: list, index: int) -> Any:
+    return item[index] if len(item) > index else None
+
+def iter_envelopes(text: str) -> Iterator[Any]:
+    """Decode the JSON values of a batchexecute response, skipping the guard and length lines."""
+    position = len(XSSI_PREFIX) if text.startswith(XSSI_PREFIX) else 0
+    end = len(text)
+    while True:
+        while position < end and text[position].isspace():
+            position += 1
+        if position >= end:
+            return
+        value, position = _decoder.raw_decode(text, position)
+        # Chunked responses put each envelope's length on a line of its own
+        if not isinstance(value, int):
+            yield value
+
+def iter_rpc_results(text: str) -> Iterator[Tuple[str, Optional[str]]]:
+    """``(rpc_id, payload_json)`` for every call answered in a response."""
+    for envelope in iter_envelopes(text):
+        for entry in envelope if isinstance(envelope, list) else ():
+            if isinstance(entry, list) and len(entry) > 2 and entry[0] == "wrb.fr":
+                yield entry[1], entry[2]
+
+def format_volume(volume: int) -> str:
+    """Compact display form of a volume lower bound, as the trending page shows it."""
+    for threshold, suffix in ((1_000_000_000, "B"), (1_000_000, "M"), (1_000, "K")):
+        if volume >= threshold and volume % threshold == 0:
+            return f"{volume // threshold}{suffix}+"
+    return f"{volume:,}+"
+
+def decode_trending(payload: Any, params: Optional[TrendRequest] = None) -> List[TrendRecord]:
+    """Trends from a decoded ``i0OFE`` payload, filtered and sorted like the trending page.
+
+    ``category``, ``status=active`` and ``sort`` of ``params`` are applied;
+    rankings follow the resulting order.
+    """
+    if not isinstance(payload, list) or len(payload) < 2 or not isinstance(payload[1], list):
+        raise RpcError("Trending payload has no list of trends")
+    items = [item for item in payload[1] if isinstance(item, list) and item and isinstance(item[KEYWORD], str)]
+
+    if params is not None and params.category and params.category.isdigit():
+        category = int(params.category)
+        items = [item for item in items if category in (_at(item, CATEGORIES) or ())]
+    if params is not None and params.status == "active":
+        items = [item for item in items if not _at(item, ENDED)]
+    if params is not None and params.sort in SORT_KEYS:
+        key, descending = SORT_KEYS[params.sort]
+        items.sort(key=key, reverse=descending)
+
+    trends = []
+    for ranking, item in enumerate(items, start=1):
+        volume, growth = _at(item, VOLUME), _at(item, GROWTH)
+        related = [keyword for keyword in (_at(item, RELATED) or ()) if keyword != item[KEYWORD]]
+        trends.append(TrendRecord(
+            title=item[KEYWORD],
+            ranking=ranking,
+            search_volume=format_volume(volume) if volume else None,
+            search_volume_min=volume or None,
+            change_percentage=f"+{growth:,.0f}%" if growth is not None else None,
+            change_percent=float(growth) if growth is not None else None,
+            related_queries=related or None,
+        ))
+    return trends
+
+def trends_from_response(text: str, params: Optional[TrendRequest] = None,
+                         rpc_id: str = TRENDING_RPC_ID) -> List[TrendRecord]:
+    """Decode the trending list out of a raw batchexecute response body."""
+    for result_id, payload in iter_rpc_results(text):
+        if result_id != rpc_id:
+            continue
+        if payload is None:
+            raise RpcError(f"RPC {rpc_id} returned an error")
+        return decode_trending(json.loads(payload), params)
+    raise RpcError(f"Response has no result for RPC {rpc_id}")
+
+def build_rpc_request(params: TrendRequest, rpc_id: str = TRENDING_RPC_ID) -> Tuple[str, dict]:
+    """URL and form fields of a direct ``i0OFE`` call for a request."""
+    arguments = [None, None, params.geo, 0, params.hl, params.hours or DEFAULT_HOURS, 1]
+    request = [[[rpc_id, json.dumps(arguments, separators=(",", ":")), None, "generic"]]]
+    query = {"rpcids": rpc_id, "source-path": "/trending", "hl": params.hl, "rt": "c"}
+    return f"{BATCHEXECUTE_URL}?{urlencode(query)}", {"f.req": json.dumps(request, separators=(",", ":"))}
+
+def is_rpc_url(url: str, rpc_id: str = TRENDING_RPC_ID) -> bool:
+    parsed = urlparse(url)
+    return parsed.path.endswith("/batchexecute") and rpc_id in parse_qs(parsed.query).get("rpcids", [""])[0].split(",")
+
+def iter_performance_events(driver: Any) -> Iterator[Tuple[str, dict]]:
+    """``(method, params)`` of the DevTools events buffered in Chrome's performance log."""
+    for entry in driver.get_log("performance"):
+        try:
+            message = json.loads(entry["message"])["message"]
+        except (KeyError, TypeError, ValueError):
+            continue
+        yield message.get("method", ""), message.get("params", {})
+
+def capture_rpc_bodies(
+    driver: Any,
+    rpc_id: str = TRENDING_RPC_ID,
+    max_wait: float = 15,
+    poll_interval: float = 0.1,
+    cancelled: Optional[threading.Event] = None,
+    clock: Callable[[], float] = time.monotonic,
+    sleep: Callable[[float], None] = time.sleep,
+) -> List[str]:
+    """Bodies of the page's ``rpc_id`` responses, read through the DevTools protocol.
+
+    Needs a driver started with performance logging. Returns as soon as at
+    least one response has finished loading, or empty-handed after
+    ``max_wait`` seconds or once ``cancelled`` is set.
+    """
+    deadline = clock() + max_wait
+    matching = set()
+    bodies: List[str] = []
+    while True:
+        for method, event in iter_performance_events(driver):
+            if method == "Network.responseReceived" and is_rpc_url(event.get("response", {}).get("url", ""), rpc_id):
+                matching.add(event["requestId"])
+            elif method == "Network.loadingFinished" and event.get("requestId") in matching:
+                result = driver.execute_cdp_cmd("Network.getResponseBody", {"requestId": event["requestId"]})
+                body = result.get("body", "")
+                if result.get("base64Encoded"):
+                    body = base64.b64decode(body).decode("utf-8")
+                bodies.append(body)
+        if bodies or clock() >= deadline or (cancelled is not None and cancelled.is_set()):
+            return bodies
+        sleep(poll_interval)
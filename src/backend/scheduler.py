@@ -0,0 +1,216 @@
+"""Background prefetching that keeps frequently requested regions warm in the cache."""
+
+import hashlib
+import logging
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, List, Optional
+
+from .cache import TrendsCache
+from .models import TrendRequest
+from .records import TrendSnapshot
+
+logger = logging.getLogger(__name__)
+
+PREFETCH_ENABLED = os.getenv("PREFETCH_ENABLED", "false").lower() == "true"
+PREFETCH_GEOS = os.getenv(
+    "PREFETCH_GEOS",
+    "US,GB,JP,IN,DE,FR,BR,CA,AU,KR,IT,ES,MX,ID,NL,TR,SA,HK,TW,SG",
+)
+PREFETCH_HL = os.getenv("PREFETCH_HL", "en")
+# Refresh interval in seconds before adaptation, and the bounds adaptation stays within
+PREFETCH_INTERVAL = float(os.getenv("PREFETCH_INTERVAL", "300"))
+PREFETCH_MIN_INTERVAL = float(os.getenv("PREFETCH_MIN_INTERVAL", "60"))
+PREFETCH_MAX_INTERVAL = float(os.getenv("PREFETCH_MAX_INTERVAL", "3600"))
+# Random spread applied to every interval, as a fraction of it
+PREFETCH_JITTER = float(os.getenv("PREFETCH_JITTER", "0.1"))
+PREFETCH_WORKERS = int(os.getenv("PREFETCH_WORKERS", "2"))
+
+def split_list(value: str) -> List[str]:
+    """Items of a comma-separated setting, stripped, without empty ones."""
+    return [item.strip() for item in value.split(",") if item.strip()]
+
+def default_prefetch_keys(geos: Optional[str] = None, hl: Optional[str] = None) -> List[TrendRequest]:
+    """Requests named by ``geos`` x ``hl``, defaulting to ``PREFETCH_GEOS`` x ``PREFETCH_HL``."""
+    return [
+        TrendRequest(geo=geo, hl=language)
+        for geo in split_list(geos or PREFETCH_GEOS)
+        for language in split_list(hl or PREFETCH_HL)
+    ]
+
+def content_digest(response: TrendSnapshot) -> str:
+    """Fingerprint of the data in a response, ignoring timestamps."""
+    digest = hashlib.sha1()
+    for trend in response.topics:
+        digest.update(f"{trend.ranking}\x1f{trend.title}\x1f{trend.search_volume}\x1e".encode("utf-8"))
+    return digest.hexdigest()
+
+
+@dataclass
+class PrefetchState:
+    """Schedule and history of one prefetched request."""
+
+    params: TrendRequest
+    interval: float
+    next_run: float
+    digest: Optional[str] = None
+    running: bool = False
+    refreshes: int = 0
+    changes: int = 0
+
+
+class PrefetchScheduler:
+    """Periodically refreshes a fixed set of requests into a ``TrendsCache``.
+
+    First runs are staggered across one base interval. After each refresh
+    the key's interval adapts: it shrinks when the data changed or the key
+    was requested since the last refresh, and grows when the data was
+    unchanged and nobody asked for it. Entries are stored with a TTL that
+    outlives the next refresh, so requests for hot keys never miss.
+    """
+
+    def __init__(
+        self,
+        cache: TrendsCache,
+        keys: List[TrendRequest],
+        interval: float = PREFETCH_INTERVAL,
+        min_interval: float = PREFETCH_MIN_INTERVAL,
+        max_interval: float = PREFETCH_MAX_INTERVAL,
+        jitter: float = PREFETCH_JITTER,
+        workers: int = PREFETCH_WORKERS,
+        clock: Callable[[], float] = time.monotonic,
+        rng: Optional[random.Random] = None,
+    ):
+        self.cache = cache
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.jitter = jitter
+        self.clock = clock
+        self.rng = rng or random.Random()
+        self.workers = max(1, workers)
+
+        now = clock()
+        self.states = [
+            PrefetchState(params, interval, now + interval * i / max(len(keys), 1))
+            for i, params in enumerate(keys)
+        ]
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._pool: Optional[ThreadPoolExecutor] = None
+
+    def _jittered(self, interval: float) -> float:
+        return interval * (1 + self.rng.uniform(-self.jitter, self.jitter))
+
+    def adapt(self, state: PrefetchState, changed: bool, requests: int) -> float:
+        """New interval for a key given whether its data changed and how often it was requested."""
+        interval = state.interval
+        if changed:
+            interval *= 0.75
+        else:
+            interval *= 1.5
+        if requests:
+            interval *= 0.75 if requests > 1 else 0.9
+        elif not changed:
+            # Nobody is asking and nothing moves: back off further
+            interval *= 1.5
+        return min(self.max_interval, max(self.min_interval, interval))
+
+    def refresh(self, state: PrefetchState) -> None:
+        """Fetch one key upstream, store it and reschedule it."""
+        try:
+            # Keep the entry fresh past the next refresh even if adapt() grows
+            # the interval by its maximum (2.25x) plus jitter
+            ttl = max(self.cache.ttl, state.interval * 2.5 + self.min_interval)
+            entry = self.cache.refresh(state.params, ttl=ttl)
+            digest = content_digest(entry.value)
+            changed = state.digest is not None and digest != state.digest
+            requests = self.cache.take_request_count(state.params)
+            with self._lock:
+                state.refreshes += 1
+                state.changes += int(changed)
+                state.interval = self.adapt(state, changed, requests)
+                state.digest = digest
+            logger.info(
+                "Prefetched %s/%s: %s, %s requests, next in %.0fs",
+                state.params.geo, state.params.hl, "changed" if changed else "unchanged", requests, state.interval,
+            )
+        except Exception as e:
+            logger.warning("Prefetch of %s/%s failed: %s", state.params.geo, state.params.hl, e)
+        finally:
+            with self._lock:
+                state.next_run = self.clock() + self._jittered(state.interval)
+                state.running = False
+
+    def due(self, now: Optional[float] = None) -> List[PrefetchState]:
+        """Claim every key whose refresh is due."""
+        now = self.clock() if now is None else now
+        with self._lock:
+            due = [s for s in self.states if not s.running and s.next_run <= now]
+            for state in due:
+                state.running = True
+        return due
+
+    def run_pending(self) -> int:
+        """Refresh every due key in the calling thread. Returns how many ran."""
+        due = self.due()
+        for state in due:
+            self.refresh(state)
+        return len(due)
+
+    def _loop(self) -> None:
+        while not self._stop.is_set():
+            for state in self.due():
+                self._pool.submit(self.refresh, state)
+            with self._lock:
+                pending = [s.next_run for s in self.states if not s.running]
+            wait = min(pending) - self.clock() if pending else 1.0
+            self._stop.wait(min(max(wait, 0.5), 30.0))
+
+    def start(self) -> None:
+        """Start refreshing in a background thread."""
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="prefetch")
+        self._thread = threading.Thread(target=self._loop, name="prefetch-scheduler", daemon=True)
+        self._thread.start()
+        logger.info("Prefetch scheduler started for %s keys", len(self.states))
+
+    def stop(self) -> None:
+        """Stop scheduling; refreshes already running are allowed to finish."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def run_forever(self) -> None:
+        """Run the scheduler in the foreground until interrupted."""
+        self.start()
+        try:
+            while not self._stop.wait(1.0):
+                pass
+        except KeyboardInterrupt:
+            logger.info("Stopping prefetch scheduler")
+        finally:
+            self.stop()
+
+    def stats(self) -> List[dict]:
+        with self._lock:
+            return [
+                {
+                    "geo": s.params.geo,
+                    "hl": s.params.hl,
+                    "interval": round(s.interval, 1),
+                    "refreshes": s.refreshes,
+                    "changes": s.changes,
+                }
+                for s in self.states
+            ]
@@ -1,33 +1,58 @@
 from urllib.parse import urlencode
-import requests
+from importlib.util import find_spec
 import logging
+import os
+import requests
 from datetime import datetime
-from typing import Optional
-from bs4 import BeautifulSoup
+from functools import lru_cache
+from typing import List, Optional, Tuple
+import threading
 import time
 import json
-from .models import TrendRequest, TrendsResponse, Trend
+from .browser_pool import BrowserPool
+from . import history
+from .debug_capture import get_debug_capture
+from .hedging import FETCH_DEADLINE, Deadline, Tier, race
+from .http_client import get_http_client
+from .metrics import observe_stage, record_tier, span, timed
+from .models import TrendRequest
 from .parser import parse_trending_html
+from .ratelimit import UpstreamUnavailable, get_upstream_guard
+from .readiness import READY_MAX_WAIT, wait_for_rows
+from .records import TrendRecord, TrendSnapshot
+from .rpc import RPC_HEADERS, build_rpc_request, capture_rpc_bodies, trends_from_response
 
 logger = logging.getLogger(__name__)
 
 BASE_URL = "https://trends.google.com/trending"
 REALTIME_URL = "https://trends.google.com/trends/trendingsearches/daily/rss"
 
-# Flag to control whether to use Selenium for JavaScript rendering
-USE_SELENIUM = False
-try:
-    from selenium import webdriver
-    from selenium.webdriver.chrome.service import Service
-    from selenium.webdriver.chrome.options import Options
-    from selenium.webdriver.common.by import By
-    from selenium.webdriver.support.ui import WebDriverWait
-    from selenium.webdriver.support import expected_conditions as EC
-    from webdriver_manager.chrome import ChromeDriverManager
-    USE_SELENIUM = True
+# Where topics come from: "dom" renders the page and parses its HTML, "rpc" calls the
+# page's batchexecute endpoint directly, "cdp" renders the page but decodes the
+# endpoint's response captured from Chrome's network log instead of the DOM
+DATA_SOURCE = os.getenv("TRENDS_DATA_SOURCE", "dom")
+
+# Tier fidelity: the page and its RPC carry volume, change and related queries,
+# the RSS feed only titles. A richer tier is waited for over a faster, poorer one
+FULL_DETAIL = 2
+TITLES_ONLY = 1
+
+# Longest each tier may take, further shortened to what is left of FETCH_DEADLINE
+PAGE_LOAD_TIMEOUT = 30
+HTTP_TIMEOUT = 15
+RSS_TIMEOUT = 10
+
+# Flag to control whether to use Selenium for JavaScript rendering. Selenium itself is
+# only imported when the first browser starts, so plain HTTP runs never load it
+USE_SELENIUM = (
+    os.getenv("USE_SELENIUM", "true").lower() == "true"
+    and find_spec("selenium") is not None
+    and find_spec("webdriver_manager") is not None
+)
+if USE_SELENIUM:
     logger.info("Selenium is available for JavaScript rendering")
-except ImportError:
-    logger.info("Selenium not available - will use basic HTTP requests only")
+else:
+    logger.info("Selenium not available or disabled - will use basic HTTP requests only")
 
 def build_trends_url(params: TrendRequest) -> str:
     """Construct the Google Trends URL from parameters."""
@@ -59,11 +84,12 @@ def get_headers() -> dict:
         'Cache-Control': 'max-age=0'
     }
 
-def fetch_with_selenium(url: str) -> str:
-    """Fetch content using Selenium to handle JavaScript rendering."""
-    if not USE_SELENIUM:
-        raise Exception("Selenium is not available")
-    
+def create_chrome_driver():
+    """Start a headless Chrome driver configured for scraping Google Trends."""
+    from selenium import webdriver
+    from selenium.webdriver.chrome.options import Options
+    from selenium.webdriver.chrome.service import Service
+
     chrome_options = Options()
     chrome_options.add_argument("--headless")  # Run in background
     chrome_options.add_argument("--no-sandbox")
@@ -78,201 +104,311 @@ def fetch_with_selenium(url: str) -> str:
     chrome_options.add_experimental_option("excludeSwitches", ["enable-automation"])
     chrome_options.add_experimental_option('useAutomationExtension', False)
     chrome_options.add_argument(f"--user-agent={get_headers()['User-Agent']}")
+    if DATA_SOURCE == "cdp":
+        # Network events are buffered in the performance log for capture_rpc_bodies
+        chrome_options.set_capability("goog:loggingPrefs", {"performance": "ALL"})
+
+    service = Service(get_chromedriver_path())
+    with span("selenium.launch"):
+        driver = webdriver.Chrome(service=service, options=chrome_options)
+
+    # Hide the webdriver property on every page the driver loads, not just the first
+    driver.execute_cdp_cmd(
+        "Page.addScriptToEvaluateOnNewDocument",
+        {"source": "Object.defineProperty(navigator, 'webdriver', {get: () => undefined})"},
+    )
+    driver.set_page_load_timeout(PAGE_LOAD_TIMEOUT)
+    return driver
+
+@lru_cache(maxsize=1)
+def get_chromedriver_path() -> str:
+    """Resolve the ChromeDriver binary once per process."""
+    from webdriver_manager.chrome import ChromeDriverManager
+
+    # Use WebDriverManager to handle ChromeDriver installation
+    with span("selenium.driver_install"):
+        return ChromeDriverManager().install()
+
+_browser_pool: Optional[BrowserPool] = None
+_browser_pool_lock = threading.Lock()
+
+def get_browser_pool() -> BrowserPool:
+    """Return the process-wide browser pool, creating it on first use."""
+    global _browser_pool
+    if _browser_pool is None:
+        with _browser_pool_lock:
+            if _browser_pool is None:
+                _browser_pool = BrowserPool(create_chrome_driver)
+    return _browser_pool
+
+def shutdown_browser_pool() -> None:
+    """Quit all pooled browsers, if a pool was ever created."""
+    global _browser_pool
+    with _browser_pool_lock:
+        if _browser_pool is not None:
+            _browser_pool.close()
+            _browser_pool = None
+
+def fetch_with_selenium(url: str, deadline: Optional[Deadline] = None,
+                        cancelled: Optional[threading.Event] = None) -> str:
+    """Fetch content using Selenium to handle JavaScript rendering.
+
+    Page load and readiness waits are cut short to fit ``deadline``. Once
+    ``cancelled`` is set the wait stops and an empty page is returned.
+    """
+    if not USE_SELENIUM:
+        raise Exception("Selenium is not available")
     
-    driver = None
+    guard = get_upstream_guard()
+    guard.acquire(url, max_wait=deadline.remaining() if deadline else None)
+    if cancelled is not None and cancelled.is_set():
+        return ""
     try:
-        # Use WebDriverManager to handle ChromeDriver installation
-        service = Service(ChromeDriverManager().install())
-        driver = webdriver.Chrome(service=service, options=chrome_options)
-        
-        # Execute script to remove webdriver property
-        driver.execute_script("Object.defineProperty(navigator, 'webdriver', {get: () => undefined})")
-        
-        driver.set_page_load_timeout(30)
-        
-        logger.info(f"Loading page with Selenium: {url}")
-        driver.get(url)
-        
-        # Wait for the page to load and check for multiple possible selectors
-        selectors_to_try = [
-            "table.enOdEe-wZVHld-zg7Cn",  # Original table selector
-            "[jsname='oKdM2c']",  # Row selector
-            ".jvkLtd",  # Trend cell
-            ".mZ3RIc",  # Title cell
-            "[data-ved]",  # Any element with data-ved (Google's tracking attribute)
-            "div[role='main']",  # Main content area
-            "div[role='article']",  # Article content
-        ]
-        
-        element_found = False
-        for selector in selectors_to_try:
+        # Waiting for a free browser counts against the deadline too
+        with get_browser_pool().browser(timeout=deadline.remaining() if deadline else None) as driver:
+            page_load_timeout = deadline.cap(PAGE_LOAD_TIMEOUT) if deadline else PAGE_LOAD_TIMEOUT
+            if page_load_timeout <= 0:
+                raise TimeoutError("Fetch deadline reached before the page was requested")
+            driver.set_page_load_timeout(page_load_timeout)
+            logger.info("Loading page with Selenium: %s", url)
+            started = time.monotonic()
             try:
-                WebDriverWait(driver, 10).until(
-                    EC.presence_of_element_located((By.CSS_SELECTOR, selector))
-                )
-                logger.info(f"Found element with selector: {selector}")
-                element_found = True
-                break
-            except:
-                logger.debug(f"Selector {selector} not found")
-                continue
-        
-        if not element_found:
-            logger.warning("No expected elements found, but continuing anyway")
-        
-        # Additional wait for dynamic content to load
-        time.sleep(5)
-        
-        # Try to scroll to load more content
-        driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-        time.sleep(2)
-        
-        # Get the page source after JavaScript execution
-        html_content = driver.page_source
-        logger.info(f"Retrieved {len(html_content)} characters of rendered HTML")
-        
-        # Save debug file
-        with open("debug_selenium_response.html", "w", encoding="utf-8") as f:
-            f.write(html_content)
-        logger.info("Selenium response saved to debug_selenium_response.html")
-        
-        return html_content
+                driver.get(url)
+            except Exception as e:
+                guard.record(url, error=e)
+                raise
+            navigation = time.monotonic() - started
+            
+            # Return as soon as the trend rows have rendered and stopped changing
+            max_wait = deadline.cap(READY_MAX_WAIT) if deadline else READY_MAX_WAIT
+            report = wait_for_rows(driver, max_wait=max_wait, cancelled=cancelled)
+            if report.reason == "cancelled":
+                logger.info("Selenium fetch cancelled, another tier answered first")
+                return ""
+            if not report.ready:
+                logger.warning("Page did not settle before the readiness deadline, continuing anyway")
+            
+            # Get the page source after JavaScript execution
+            started = time.monotonic()
+            html_content = driver.page_source
+            timings = {"navigation": navigation, **report.timings, "page_source": time.monotonic() - started}
+            
+            # The browser exposes no status code, but a captcha redirect is recognizable
+            guard.observe(url, None, html_content, driver.current_url)
+            logger.info("Retrieved %d characters of rendered HTML (%d rows, %s)", len(html_content), report.row_count, report.reason)
+            logger.info("Selenium phase timings: %s", timings)
+            for phase, seconds in timings.items():
+                observe_stage(f"selenium.{phase}", seconds)
+
+        # Sampled or requested captures are written off the request path
+        get_debug_capture().maybe_capture(html_content, "selenium")
         
         return html_content
         
     except Exception as e:
-        logger.error(f"Error with Selenium: {e}")
+        logger.error("Error with Selenium: %s", e)
         raise
-    finally:
-        if driver:
-            driver.quit()
 
-def fetch_trends(params: TrendRequest) -> TrendsResponse:
-    """Fetch and parse trending topics with enhanced error handling."""
+def fetch_rpc_with_selenium(url: str, params: TrendRequest, deadline: Optional[Deadline] = None,
+                            cancelled: Optional[threading.Event] = None) -> List[TrendRecord]:
+    """Render the page in Selenium and decode the trending RPC it makes, never reading the DOM."""
+    if not USE_SELENIUM:
+        raise Exception("Selenium is not available")
+
+    guard = get_upstream_guard()
+    guard.acquire(url, max_wait=deadline.remaining() if deadline else None)
+    if cancelled is not None and cancelled.is_set():
+        return []
+    with get_browser_pool().browser(timeout=deadline.remaining() if deadline else None) as driver:
+        page_load_timeout = deadline.cap(PAGE_LOAD_TIMEOUT) if deadline else PAGE_LOAD_TIMEOUT
+        if page_load_timeout <= 0:
+            raise TimeoutError("Fetch deadline reached before the page was requested")
+        driver.set_page_load_timeout(page_load_timeout)
+        # Drop network events left over from the browser's previous page
+        driver.get_log("performance")
+        logger.info("Loading page with Selenium to capture its RPC responses: %s", url)
+        try:
+            with span("selenium.navigation"):
+                driver.get(url)
+        except Exception as e:
+            guard.record(url, error=e)
+            raise
+        max_wait = deadline.cap(READY_MAX_WAIT) if deadline else READY_MAX_WAIT
+        with span("selenium.rpc_capture"):
+            bodies = capture_rpc_bodies(driver, max_wait=max_wait, cancelled=cancelled)
+        guard.observe(url, None, "", driver.current_url)
+
+    if not bodies:
+        logger.warning("No trending RPC response captured from the page")
+        return []
+    with span("rpc.decode"):
+        return trends_from_response(bodies[-1], params)
+
+def fetch_rpc_trends(params: TrendRequest, timeout: float = HTTP_TIMEOUT) -> List[TrendRecord]:
+    """Call the trending page's batchexecute endpoint directly and decode its JSON."""
+    rpc_url, form = build_rpc_request(params)
+    with span("rpc.fetch"):
+        response = get_http_client().post(rpc_url, form, timeout=timeout, headers=RPC_HEADERS)
+    if response.status_code >= 400:
+        raise requests.exceptions.HTTPError(f"{response.status_code} error for url: {rpc_url}", response=response)
+    with span("rpc.decode"):
+        return trends_from_response(response.text, params)
+
+@timed("fetch.total")
+def fetch_trends(params: TrendRequest) -> TrendSnapshot:
+    """Fetch and parse trending topics, racing the fallback tiers against one deadline.
+
+    The browser (or plain HTTP without Selenium) starts first and the cheaper
+    tiers are hedged alongside it after HEDGE_DELAY seconds. Topics from a
+    full-detail tier win at once; titles-only RSS topics are only used once
+    the full-detail tiers have failed or the deadline is close. Everything
+    fits in FETCH_DEADLINE seconds. ``UpstreamUnavailable`` is raised when
+    Google is throttling us and no tier got through.
+
+    Returns a ``TrendSnapshot``; callers that answer clients convert it to
+    a ``TrendsResponse`` with ``to_model()``.
+    """
     # Use provided URL if available, otherwise build from parameters
     if params.url:
         url = params.url
-        logger.info(f"Using provided URL: {url}")
+        logger.info("Using provided URL: %s", url)
     else:
         url = build_trends_url(params)
-        logger.info(f"Built URL from parameters: {url}")
+        logger.info("Built URL from parameters: %s", url)
     
-    try:
-        logger.info(f"Fetching trends from: {url}")
-        
-        # Prioritize Selenium if available since Google Trends requires JavaScript
-        if USE_SELENIUM:
-            logger.info("Using Selenium for JavaScript rendering")
-            try:
-                rendered_html = fetch_with_selenium(url)
-                topics = parse_trending_html(rendered_html)
-                
-                if topics:
-                    logger.info(f"Successfully extracted {len(topics)} trends using Selenium")
-                    return TrendsResponse(
-                        topics=topics,
-                        source_url=url,
-                        timestamp=datetime.now(),
-                        total_trends=len(topics),
-                        location=params.geo,
-                        language=params.hl
-                    )
-                else:
-                    logger.warning("Selenium fetch successful but no trends parsed")
-                    
-            except Exception as e:
-                logger.error(f"Selenium fetch failed: {e}")
-                logger.info("Falling back to basic HTTP request")
-        
-        # Fallback to basic HTTP request (usually won't work for Google Trends)
-        logger.info("Attempting basic HTTP request")
-        response = requests.get(url, headers=get_headers(), timeout=15)
-        response.raise_for_status()
-        
-        # Log some info about the response for debugging
-        logger.info(f"Response status: {response.status_code}")
-        logger.info(f"Response content length: {len(response.text)}")
-        
-        # Check if we got actual HTML content
-        content_type = response.headers.get('content-type', '')
-        if 'text/html' not in content_type:
-            logger.warning(f"Unexpected content type: {content_type}")
-        
-        # Check if the response contains the expected table structure
-        html_content = response.text
-        if "enOdEe-wZVHld-zg7Cn" in html_content and "jsname='oKdM2c'" in html_content:
-            logger.info("Found Google Trends table structure in basic HTTP response")
-            topics = parse_trending_html(html_content)
-        else:
-            logger.warning("Basic HTTP response doesn't contain expected table structure")
-            logger.info("Response preview: " + html_content[:500] + "...")
-            topics = []
-        
-        # If we didn't get any topics, try the RSS feed as fallback
-        if not topics:
-            logger.warning("No topics found from main URL, trying RSS feed")
-            topics = fetch_rss_trends(params)
-        
-        # If still no topics, try to extract anything useful from the HTML
-        if not topics and "google" in html_content.lower():
-            logger.warning("Attempting to extract any useful content from HTML")
-            topics = parse_trending_html(html_content)  # Force parsing attempt
-        
-        # Last resort: create some sample data to demonstrate functionality
-        if not topics:
-            logger.warning("No topics found from any source, using sample data")
-            topics = get_sample_trends()
-        
-        return TrendsResponse(
-            topics=topics,
-            source_url=url,
-            timestamp=datetime.now(),
-            total_trends=len(topics),
-            location=params.geo,
-            language=params.hl
-        )
-        
-    except requests.exceptions.RequestException as e:
-        logger.error(f"Error fetching trends: {e}")
-        # Return sample data in case of network error
+    logger.info("Fetching trends from: %s", url)
+    deadline = Deadline(FETCH_DEADLINE)
+    pages = {}
+
+    def selenium_tier(deadline: Deadline, cancelled: threading.Event) -> List[TrendRecord]:
+        rendered_html = fetch_with_selenium(url, deadline, cancelled)
+        return parse_trending_html(rendered_html, geo=params.geo) if rendered_html else []
+
+    def http_tier(deadline: Deadline, cancelled: threading.Event) -> List[TrendRecord]:
+        # Usually empty: the trending page is rendered by JavaScript
+        with span("http.fetch"):
+            html_content, topics = get_http_client().fetch_parsed(
+                url, parse_basic_response, timeout=deadline.cap(HTTP_TIMEOUT)
+            )
+        get_debug_capture().maybe_capture(html_content, "http")
+        pages["http"] = html_content
+        return topics
+
+    def rss_tier(deadline: Deadline, cancelled: threading.Event) -> List[TrendRecord]:
+        return fetch_rss_trends(params, timeout=deadline.cap(RSS_TIMEOUT))
+
+    def rpc_tier(deadline: Deadline, cancelled: threading.Event) -> List[TrendRecord]:
+        return fetch_rpc_trends(params, timeout=deadline.cap(HTTP_TIMEOUT))
+
+    def cdp_tier(deadline: Deadline, cancelled: threading.Event) -> List[TrendRecord]:
+        return fetch_rpc_with_selenium(url, params, deadline, cancelled)
+
+    # Prioritize Selenium if available since Google Trends requires JavaScript
+    if USE_SELENIUM:
+        tiers = [
+            Tier("selenium", selenium_tier, FULL_DETAIL),
+            Tier("rss", rss_tier, TITLES_ONLY),
+            Tier("http", http_tier, FULL_DETAIL),
+        ]
+    else:
+        tiers = [Tier("http", http_tier, FULL_DETAIL), Tier("rss", rss_tier, TITLES_ONLY)]
+    # The RPC only knows the trending list, so custom URLs always go through the page
+    if DATA_SOURCE == "rpc" and not params.url:
+        tiers.insert(0, Tier("rpc", rpc_tier, FULL_DETAIL))
+    elif DATA_SOURCE == "cdp" and USE_SELENIUM:
+        tiers[0] = Tier("cdp", cdp_tier, FULL_DETAIL)
+    result = race(tiers, deadline)
+    topics, tier = result.value, result.tier
+
+    # If no tier produced topics, try to extract anything useful from the HTML
+    html_content = pages.get("http", "")
+    if not topics and "google" in html_content.lower():
+        logger.warning("Attempting to extract any useful content from HTML")
+        topics = parse_trending_html(html_content, geo=params.geo)  # Force parsing attempt
+        tier = "text_heuristic"
+
+    if not topics:
+        # Throttled: let the caller serve cached data rather than samples
+        for error in result.errors.values():
+            if isinstance(error, UpstreamUnavailable):
+                logger.warning("Not fetching trends: %s", error)
+                raise error
+
+    # Last resort: create some sample data to demonstrate functionality
+    if not topics:
+        logger.warning("No topics found from any source, using sample data")
         topics = get_sample_trends()
-        return TrendsResponse(
-            topics=topics,
-            source_url=url,
-            timestamp=datetime.now(),
-            total_trends=len(topics),
-            location=params.geo,
-            language=params.hl
-        )
-    except Exception as e:
-        logger.error(f"Unexpected error: {e}")
-        raise
+        tier = "sample"
+
+    logger.info("Tier %s answered in %.0fms", tier, deadline.elapsed() * 1000)
+    record_tier(tier)
+    response = TrendSnapshot(
+        topics=topics,
+        source_url=url,
+        timestamp=datetime.now(),
+        total_trends=len(topics),
+        location=params.geo,
+        language=params.hl,
+        source_tier=tier,
+        fetch_ms=deadline.elapsed() * 1000,
+    )
+    # Sample data is not an observation worth keeping
+    if tier != "sample":
+        history.record(params, response)
+    return response
 
-def fetch_rss_trends(params: TrendRequest) -> list[Trend]:
+def parse_basic_response(response) -> Tuple[str, List[TrendRecord]]:
+    """Parse a plain HTTP response of the trends page into ``(html, topics)``."""
+    # Log some info about the response for debugging
+    logger.info("Response status: %s, content length: %d", response.status_code, len(response.text))
+    
+    # Check if we got actual HTML content
+    content_type = response.headers.get('content-type', '')
+    if 'text/html' not in content_type:
+        logger.warning("Unexpected content type: %s", content_type)
+    
+    # Check if the response contains the expected table structure
+    html_content = response.text
+    if "enOdEe-wZVHld-zg7Cn" in html_content and "jsname='oKdM2c'" in html_content:
+        logger.info("Found Google Trends table structure in basic HTTP response")
+        topics = parse_trending_html(html_content)
+    else:
+        logger.warning("Basic HTTP response doesn't contain expected table structure")
+        logger.debug("Response preview: %.500s...", html_content)
+        topics = []
+    return html_content, topics
+
+@timed("rss.parse")
+def parse_rss_response(response) -> List[TrendRecord]:
+    """Parse the trending searches RSS feed into trends."""
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(response.text, "xml")
+    items = soup.find_all("item")
+    
+    trends = []
+    for i, item in enumerate(items[:20]):  # Limit to 20 items
+        title_element = item.find("title")
+        if title_element:
+            title = title_element.get_text(strip=True)
+            trends.append(TrendRecord(title=title, ranking=i+1))
+    
+    return trends
+
+def fetch_rss_trends(params: TrendRequest, timeout: float = RSS_TIMEOUT) -> list[TrendRecord]:
     """Fallback method to fetch trends from RSS feed."""
     try:
         rss_url = f"{REALTIME_URL}?geo={params.geo}&hl={params.hl}"
-        response = requests.get(rss_url, headers=get_headers(), timeout=10)
-        response.raise_for_status()
-        
-        # Parse RSS content
-        soup = BeautifulSoup(response.text, "xml")
-        items = soup.find_all("item")
-        
-        trends = []
-        for i, item in enumerate(items[:20]):  # Limit to 20 items
-            title_element = item.find("title")
-            if title_element:
-                title = title_element.get_text(strip=True)
-                trends.append(Trend(title=title, ranking=i+1))
-        
-        return trends
+        with span("rss.fetch"):
+            return get_http_client().fetch_parsed(rss_url, parse_rss_response, timeout=timeout)
         
+    except UpstreamUnavailable:
+        raise
     except Exception as e:
-        logger.error(f"Error fetching RSS trends: {e}")
+        logger.error("Error fetching RSS trends: %s", e)
         return []
 
-def get_sample_trends() -> list[Trend]:
+def get_sample_trends() -> list[TrendRecord]:
     """Return sample trending topics for demonstration."""
     sample_topics = [
         "Artificial Intelligence",
@@ -288,7 +424,7 @@ def get_sample_trends() -> list[Trend]:
     ]
     
     return [
-        Trend(
+        TrendRecord(
             title=topic,
             ranking=i+1,
             search_volume=f"{1000 - i*50}K searches",
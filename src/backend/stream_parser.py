@@ -0,0 +1,116 @@
+"""Streaming extraction of trend rows that never builds the full document.
+
+The HTML is tokenized incrementally with the standard library's
+``html.parser``. Only elements inside a ``tr[jsname='oKdM2c']`` row are
+turned into a (small) lxml subtree, which is handed to the compiled
+extractor in ``lxml_parser`` and discarded as soon as its ``TrendRecord`` is
+yielded. libxml2's own push parser is not used because it keeps the
+whole input buffered, which defeats the purpose for very large pages.
+"""
+
+from html.parser import HTMLParser
+from typing import Iterable, Iterator, List, Union
+
+from lxml import etree
+
+from .lxml_parser import extract_trend_from_row
+from .normalize import normalize_trends
+from .records import TrendRecord
+
+STREAM_CHUNK_SIZE = 64 * 1024
+
+# Elements that never have an end tag
+VOID_ELEMENTS = frozenset([
+    "area", "base", "br", "col", "embed", "hr", "img", "input",
+    "link", "meta", "param", "source", "track", "wbr",
+])
+
+
+class RowTokenizer(HTMLParser):
+    """Tokenizer that builds subtrees for trend rows and skips everything else."""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.rows: List[etree._Element] = []
+        self._builder = None
+        self._open: List[str] = []
+
+    def handle_starttag(self, tag, attrs):
+        if self._builder is None:
+            if tag != "tr" or ("jsname", "oKdM2c") not in attrs:
+                return
+            self._builder = etree.TreeBuilder()
+        # Later duplicates win, as in BeautifulSoup; None values become empty strings
+        self._builder.start(tag, {k: v or "" for k, v in attrs})
+        if tag in VOID_ELEMENTS:
+            self._builder.end(tag)
+        else:
+            self._open.append(tag)
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+        if self._builder is not None and tag not in VOID_ELEMENTS:
+            self.handle_endtag(tag)
+
+    def handle_endtag(self, tag):
+        if self._builder is None or tag not in self._open:
+            return
+        # Close any unclosed descendants along with the matching tag
+        while self._open:
+            open_tag = self._open.pop()
+            self._builder.end(open_tag)
+            if open_tag == tag:
+                break
+        if not self._open:
+            self.rows.append(self._builder.close())
+            self._builder = None
+
+    def handle_data(self, data):
+        if self._builder is not None:
+            self._builder.data(data)
+
+    def handle_comment(self, data):
+        if self._builder is not None:
+            self._builder.comment(data)
+
+
+def _chunks(source: Union[str, bytes, Iterable[Union[str, bytes]]], chunk_size: int) -> Iterator[str]:
+    if isinstance(source, (str, bytes)):
+        source = [source]
+    for piece in source:
+        if isinstance(piece, bytes):
+            piece = piece.decode("utf-8", errors="replace")
+        for start in range(0, len(piece), chunk_size):
+            yield piece[start:start + chunk_size]
+
+
+def iter_table_trends(
+    source: Union[str, bytes, Iterable[Union[str, bytes]]],
+    chunk_size: int = STREAM_CHUNK_SIZE,
+) -> Iterator[TrendRecord]:
+    """Yield trends from the ``tr[jsname='oKdM2c']`` rows as the HTML streams in.
+
+    ``source`` may be a whole document or any iterable of chunks, such as
+    ``response.iter_content(decode_unicode=True)`` or an open file. Only
+    the row currently being parsed is kept, so peak memory stays flat no
+    matter how large the page is. Results match ``parse_trending_html``.
+    """
+    tokenizer = RowTokenizer()
+    ranking = 0
+
+    def drain():
+        nonlocal ranking
+        rows, tokenizer.rows = tokenizer.rows, []
+        for row in rows:
+            ranking += 1
+            trend = extract_trend_from_row(row, ranking)
+            if trend:
+                # Rows are yielded one at a time, so normalize here rather than per page
+                normalize_trends([trend])
+                yield trend
+
+    for chunk in _chunks(source, chunk_size):
+        tokenizer.feed(chunk)
+        yield from drain()
+    tokenizer.close()
+    yield from drain()
@@ -6,6 +6,13 @@ export interface TrendRequest {
   sort?: string;
   status?: string;
   url?: string;
+  // Applied by the backend to the cached result; changing these never triggers a new scrape
+  min_volume?: number;
+  title_contains?: string;
+  order_by?: string;
+  limit?: number;
+  offset?: number;
+  fields?: string;
 }
 
 export interface Trend {
@@ -15,6 +22,8 @@ export interface Trend {
   change_percentage?: string;
   related_queries?: string[];
   url?: string;
+  search_volume_min?: number;
+  change_percent?: number;
 }
 
 export interface TrendsResponse {
@@ -24,6 +33,8 @@ export interface TrendsResponse {
   total_trends: number;
   location: string;
   language: string;
+  source_tier?: string;
+  fetch_ms?: number;
 }
 
 export async function fetchTrends(params: TrendRequest): Promise<TrendsResponse> {
@@ -1,5 +1,56 @@
 import os
 import sys
+from datetime import datetime
+
+import pytest
 
 # ensure src directory is importable
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
+
+# keep test fetches out of the trends history database
+os.environ.setdefault("HISTORY_ENABLED", "false")
+
+from src.backend.records import TrendRecord, TrendSnapshot  # noqa: E402
+
+
+class FakeClock:
+    """Time that only moves when a test moves it; ``sleep`` advances it instead of waiting."""
+
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+def build_response(topics=("Topic 1",), geo="US", hl="en", timestamp=datetime(2024, 1, 1), **fields):
+    """A ``TrendSnapshot`` of ``topics``, given as titles or ``TrendRecord`` objects.
+
+    Titles are ranked in order and get ``fields`` (e.g. ``search_volume``).
+    """
+    trends = [
+        topic if isinstance(topic, TrendRecord) else TrendRecord(title=topic, ranking=i, **fields)
+        for i, topic in enumerate(topics, start=1)
+    ]
+    return TrendSnapshot(
+        topics=trends,
+        source_url=f"https://trends.google.com/trending?geo={geo}",
+        timestamp=timestamp,
+        total_trends=len(trends),
+        location=geo,
+        language=hl,
+    )
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def make_response():
+    """Factory fixture: ``make_response(topics, geo=..., hl=..., timestamp=..., **trend_fields)``."""
+    return build_response
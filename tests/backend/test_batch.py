@@ -0,0 +1,53 @@
+import asyncio
+import threading
+import time
+
+from src.backend.batch import iter_batch, stream_batch, upstream_host
+from src.backend.models import TrendRequest
+
+
+def test_upstream_host():
+    assert upstream_host(TrendRequest(geo="US")) == "trends.google.com"
+    assert upstream_host(TrendRequest(url="https://example.com/page")) == "example.com"
+
+
+def test_stream_batch_reports_errors_per_item(make_response):
+    async def load(params):
+        if params.geo == "XX":
+            raise ValueError("bad region")
+        await asyncio.sleep(0.05 if params.geo == "US" else 0)
+        return make_response([], geo=params.geo, hl=params.hl), "MISS"
+
+    async def collect():
+        requests = [TrendRequest(geo=g) for g in ("US", "XX", "JP")]
+        return [item async for item in stream_batch(requests, load)]
+
+    items = asyncio.run(collect())
+    assert [item.request.geo for item in items][-1] == "US"
+    by_geo = {item.request.geo: item for item in items}
+    assert by_geo["XX"].error == "ValueError: bad region"
+    assert by_geo["XX"].result is None
+    assert by_geo["JP"].result.location == "JP"
+    assert by_geo["JP"].cache == "MISS"
+
+
+def test_iter_batch_caps_concurrency_per_host(make_response):
+    active = 0
+    peak = 0
+    lock = threading.Lock()
+
+    def fetch(params):
+        nonlocal active, peak
+        with lock:
+            active += 1
+            peak = max(peak, active)
+        time.sleep(0.02)
+        with lock:
+            active -= 1
+        return make_response([], geo=params.geo, hl=params.hl)
+
+    requests = [TrendRequest(geo=f"G{i}") for i in range(12)]
+    items = list(iter_batch(requests, fetch, per_host=3))
+    assert sorted(item.index for item in items) == list(range(12))
+    assert all(item.error is None for item in items)
+    assert peak <= 3
@@ -0,0 +1,35 @@
+from benchmarks.corpus import make_rss_feed, page_of_size
+from benchmarks.harness import Benchmark, BenchmarkResult, compare, discover
+from src.backend.parser import parse_trending_html
+from src.backend.scraper import parse_rss_response
+
+
+class FakeResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+def test_corpus_pages_parse():
+    assert len(parse_trending_html(page_of_size(0.05, rows=30))) == 30
+    assert len(parse_rss_response(FakeResponse(make_rss_feed(items=5)))) == 5
+
+
+def test_benchmark_records_statistics():
+    benchmark = Benchmark("sample", rounds=3)
+    assert benchmark(sum, [1, 2, 3]) == 6
+    assert benchmark.result.rounds == 3
+    assert benchmark.result.min_ms <= benchmark.result.median_ms
+
+
+def test_suites_are_discovered():
+    names = discover()
+    assert "parser.table_lxml_5mb" in names
+    assert "scraper.fetch_table_page" in names
+
+
+def test_compare_flags_regressions():
+    results = [BenchmarkResult("a", 5, 1, 13, 13, 0), BenchmarkResult("b", 5, 1, 13, 13, 0)]
+    baseline = {"a": {"median_ms": 10}, "b": {"median_ms": 10}}
+    regressions = compare(results, baseline, {"default": 0.25, "benchmarks": {"b": 0.5}})
+    assert len(regressions) == 1
+    assert regressions[0].startswith("a:")
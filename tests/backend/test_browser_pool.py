@@ -0,0 +1,93 @@
+import pytest
+
+from src.backend.browser_pool import BrowserPool, BrowserPoolTimeout
+
+
+class FakeDriver:
+    def __init__(self):
+        self.alive = True
+        self.quit_called = False
+
+    def execute_script(self, script):
+        if not self.alive:
+            raise RuntimeError("session deleted")
+        return 1
+
+    def quit(self):
+        self.quit_called = True
+
+
+def make_pool(**kwargs):
+    drivers = []
+
+    def factory():
+        driver = FakeDriver()
+        drivers.append(driver)
+        return driver
+
+    return BrowserPool(factory, **kwargs), drivers
+
+
+def test_browsers_are_reused():
+    pool, drivers = make_pool(size=2)
+    with pool.browser() as first:
+        pass
+    with pool.browser() as second:
+        pass
+    assert first is second
+    assert len(drivers) == 1
+
+
+def test_warm_up_fills_pool():
+    pool, drivers = make_pool(size=3)
+    assert pool.warm_up() == 3
+    assert pool.stats()["idle"] == 3
+    assert len(drivers) == 3
+
+
+def test_checkout_times_out_when_exhausted():
+    pool, _ = make_pool(size=1)
+    held = pool.checkout()
+    with pytest.raises(BrowserPoolTimeout):
+        pool.checkout(timeout=0.05)
+    pool.checkin(held)
+
+
+def test_browser_recycled_after_max_pages():
+    pool, drivers = make_pool(size=1, max_pages=2)
+    for _ in range(3):
+        with pool.browser():
+            pass
+    assert drivers[0].quit_called
+    assert len(drivers) == 2
+    assert pool.stats()["recycled"] == 1
+
+
+def test_unhealthy_browser_replaced_on_checkout():
+    pool, drivers = make_pool(size=1)
+    pool.warm_up()
+    drivers[0].alive = False
+    with pool.browser() as driver:
+        assert driver is drivers[1]
+    assert drivers[0].quit_called
+
+
+def test_interrupted_browser_is_checked_in_and_discarded():
+    pool, drivers = make_pool(size=1)
+    with pytest.raises(KeyboardInterrupt):
+        with pool.browser():
+            raise KeyboardInterrupt
+    assert drivers[0].quit_called
+    assert pool.stats()["in_use"] == 0
+    # The slot is free again
+    with pool.browser() as driver:
+        assert driver is drivers[1]
+
+
+def test_close_quits_idle_browsers():
+    pool, drivers = make_pool(size=2)
+    pool.warm_up()
+    pool.close()
+    assert all(d.quit_called for d in drivers)
+    with pytest.raises(RuntimeError):
+        pool.checkout()
@@ -0,0 +1,129 @@
+import threading
+import time
+
+import pytest
+
+from src.backend.cache import (
+    HIT,
+    MISS,
+    STALE,
+    CacheBackend,
+    CacheEntry,
+    LRUCache,
+    SQLiteBackend,
+    TrendsCache,
+    cache_key,
+)
+from src.backend.models import TrendRequest
+
+
+def test_cache_key_distinguishes_parameters():
+    assert cache_key(TrendRequest(geo="US")) != cache_key(TrendRequest(geo="GB"))
+    assert cache_key(TrendRequest(geo="US", hours=4)) != cache_key(TrendRequest(geo="US"))
+    assert cache_key(TrendRequest(geo="US")) == cache_key(TrendRequest(geo="US"))
+
+
+def test_hit_after_miss_and_expiry(clock, make_response):
+    calls = []
+    cache = TrendsCache(lambda p: calls.append(p) or make_response(), ttl=60, stale_ttl=0, clock=clock)
+    params = TrendRequest(geo="US")
+
+    assert cache.get(params)[1] == MISS
+    assert cache.get(params)[1] == HIT
+    clock.now += 61
+    assert cache.get(params)[1] == MISS
+    assert len(calls) == 2
+
+
+def test_stale_while_revalidate(clock, make_response):
+    titles = iter(["old", "new"])
+    cache = TrendsCache(lambda p: make_response([next(titles)]), ttl=60, stale_ttl=120, clock=clock)
+    params = TrendRequest(geo="US")
+
+    cache.get(params)
+    clock.now += 90
+    value, status, _ = cache.get(params)
+    assert status == STALE
+    assert value.topics[0].title == "old"
+
+    cache._revalidator.shutdown(wait=True)
+    value, status, _ = cache.get(params)
+    assert status == HIT
+    assert value.topics[0].title == "new"
+
+
+def test_concurrent_misses_share_one_load(make_response):
+    calls = []
+    release = threading.Event()
+
+    def loader(params):
+        calls.append(params)
+        release.wait(timeout=5)
+        return make_response()
+
+    cache = TrendsCache(loader)
+    params = TrendRequest(geo="US")
+    threads = [threading.Thread(target=cache.get, args=(params,)) for _ in range(20)]
+    for t in threads:
+        t.start()
+    time.sleep(0.1)
+    release.set()
+    for t in threads:
+        t.join()
+
+    assert len(calls) == 1
+    assert cache.stats()["coalesced"] == 19
+
+
+def test_lru_evicts_oldest_entry(make_response):
+    lru = LRUCache(max_entries=2)
+    for key in ("a", "b", "c"):
+        lru.set(key, CacheEntry(make_response(), 0, 60, 0))
+    assert lru.get("a") is None
+    assert lru.get("c") is not None
+
+
+def test_sqlite_backend_shared_between_caches(tmp_path, make_response):
+    path = str(tmp_path / "cache.sqlite3")
+    params = TrendRequest(geo="JP")
+    writer = TrendsCache(lambda p: make_response(["shared"], geo="JP"), shared=SQLiteBackend(path))
+    writer.get(params)
+
+    reader = TrendsCache(lambda p: make_response(["upstream"], geo="JP"), shared=SQLiteBackend(path))
+    value, status, _ = reader.get(params)
+    assert status == HIT
+    assert value.topics[0].title == "shared"
+
+
+def test_local_only_lookup_never_reads_the_shared_backend(tmp_path, make_response):
+    path = str(tmp_path / "cache.sqlite3")
+    params = TrendRequest(geo="JP")
+    TrendsCache(lambda p: make_response(["shared"], geo="JP"), shared=SQLiteBackend(path)).get(params)
+
+    reader = TrendsCache(lambda p: make_response(["upstream"], geo="JP"), shared=SQLiteBackend(path))
+    assert reader.get_cached(params, local_only=True) is None
+    assert reader.get_cached(params)[1] == HIT
+    # Promoted into the local LRU, so now answered without the backend
+    assert reader.get_cached(params, local_only=True)[1] == HIT
+
+
+def test_incomplete_backend_fails_on_construction():
+    class GetOnly(CacheBackend):
+        def get(self, key):
+            return None
+
+    with pytest.raises(TypeError):
+        GetOnly()
+
+
+def test_each_request_counts_once_as_demand(make_response):
+    cache = TrendsCache(lambda p: make_response())
+    params = TrendRequest(geo="US")
+    cache.get(params)
+    assert cache.take_request_count(params) == 1
+
+    cache.invalidate(params)
+    # As the API does: a lookup, then the load on a miss
+    assert cache.get_cached(params) is None
+    cache.get(params, count=False)
+    assert cache.take_request_count(params) == 1
@@ -0,0 +1,57 @@
+import os
+
+from src.backend import debug_capture
+from src.backend.debug_capture import CaptureStore, DebugCapture
+
+
+def test_store_is_content_addressed(tmp_path):
+    store = CaptureStore(str(tmp_path), max_files=10, max_bytes=10_000)
+    first = store.write("<html>same</html>")
+    second = store.write("<html>same</html>")
+    third = store.write("<html>other</html>")
+
+    assert first == second
+    assert first != third
+    assert len(os.listdir(tmp_path)) == 2
+
+
+def test_store_rotates_oldest_captures(tmp_path):
+    store = CaptureStore(str(tmp_path), max_files=2, max_bytes=10_000)
+    paths = []
+    for i in range(3):
+        path = store.write(f"<html>{i}</html>")
+        os.utime(path, (i, i))
+        paths.append(path)
+    store.rotate()
+
+    assert not os.path.exists(paths[0])
+    assert os.path.exists(paths[1]) and os.path.exists(paths[2])
+
+
+def test_sampling_and_on_demand_capture(tmp_path):
+    capture = DebugCapture(CaptureStore(str(tmp_path)), sample_rate=3)
+    sampled = [capture.maybe_capture(f"<p>{i}</p>") for i in range(6)]
+    assert sampled == [False, False, True, False, False, True]
+
+    never = DebugCapture(CaptureStore(str(tmp_path)), sample_rate=0)
+    assert not never.maybe_capture("<p>unsampled</p>")
+    token = debug_capture.requested.set(True)
+    try:
+        assert never.maybe_capture("<p>requested</p>")
+    finally:
+        debug_capture.requested.reset(token)
+
+    assert capture.flush() and never.flush()
+    assert len(os.listdir(tmp_path)) == 3
+    assert capture.stats()["captured"] == 2
+    capture.close()
+    never.close()
+
+
+def test_capture_drops_instead_of_blocking(tmp_path):
+    capture = DebugCapture(CaptureStore(str(tmp_path)), queue_size=1)
+    # Writer not started yet, so the queue fills up
+    capture._thread = object()
+    assert capture.capture("<p>1</p>")
+    assert not capture.capture("<p>2</p>")
+    assert capture.stats()["dropped"] == 1
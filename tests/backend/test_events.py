@@ -0,0 +1,101 @@
+import asyncio
+
+import pytest
+
+from src.backend.diff import diff_snapshots
+from src.backend.events import RESYNC, EventHub
+
+
+def test_diff_snapshots(make_response):
+    before = make_response(["A", "B", "C"], search_volume="1K+")
+    after = make_response(["B", "A", "D"], search_volume="5K+")
+    after.topics[0].search_volume, after.topics[2].search_volume = "1K+", None
+    events = [(e.type, e.title, e.previous_ranking, e.ranking) for e in diff_snapshots(before, after)]
+    assert events == [
+        ("rank_changed", "B", 2, 1),
+        ("rank_changed", "A", 1, 2),
+        ("volume_changed", "A", 1, 2),
+        ("entered", "D", None, 3),
+        ("exited", "C", 3, None),
+    ]
+    assert diff_snapshots(None, after) == []
+    assert diff_snapshots(after, after) == []
+
+
+def test_hub_fans_out_events_to_subscribers_of_the_key(make_response):
+    async def run():
+        hub = EventHub()
+        first, second = hub.subscribe("US"), hub.subscribe("US")
+        other = hub.subscribe("JP")
+        hub.publish("US", make_response(["A"]))
+        hub.publish("US", make_response(["B"]))
+        await asyncio.sleep(0)
+
+        for subscription in (first, second):
+            assert [(await subscription.get(timeout=1))[0] for _ in range(2)] == ["entered", "exited"]
+        assert other.queue.empty()
+
+        hub.unsubscribe(second)
+        assert hub.stats()["subscribers"] == 2
+
+    asyncio.run(run())
+
+
+def test_publishing_the_same_snapshot_is_a_noop(make_response):
+    hub = EventHub()
+    current = make_response(["A"])
+    hub.publish("US", current)
+    assert hub.publish("US", current) == []
+
+
+def test_slow_subscriber_resyncs_instead_of_replaying_stale_events(make_response):
+    async def run():
+        hub = EventHub(max_queue=2)
+        subscription = hub.subscribe("US")
+        hub.publish("US", make_response(["A"]))
+        hub.publish("US", make_response(["B", "C"]))
+        # One more event after the overflow
+        hub.publish("US", make_response(["B", "C", "D"]))
+        await asyncio.sleep(0)
+
+        assert subscription.dropped == 4
+        assert (await subscription.get(timeout=1))[0] == RESYNC
+        # The reloaded state already contains everything queued before the resync
+        with pytest.raises(asyncio.TimeoutError):
+            await subscription.get(timeout=0.01)
+
+        hub.publish("US", make_response(["B", "C"]))
+        await asyncio.sleep(0)
+        kind, event = await subscription.get(timeout=1)
+        assert (kind, event.title) == ("exited", "D")
+
+    asyncio.run(run())
+
+
+def test_failed_resync_is_retried_instead_of_ending_the_stream(monkeypatch, make_response):
+    from src.backend import api
+
+    current = make_response(["A"])
+    loads = []
+
+    async def load_trends(params):
+        loads.append(params)
+        if len(loads) == 1:
+            raise RuntimeError("upstream down")
+        return current, None, None
+
+    monkeypatch.setattr(api, "load_trends", load_trends)
+    monkeypatch.setattr(api, "EVENTS_POLL_INTERVAL", 0.01)
+
+    async def run():
+        subscription = EventHub().subscribe("US")
+        subscription.resync()
+        stream = api.trend_events(None, subscription, current)
+        assert (await stream.__anext__())[0] == "snapshot"
+        # The failed reload is reported as an idle tick and the resync stays pending
+        assert await stream.__anext__() == (None, None)
+        assert await stream.__anext__() == (RESYNC, current.to_json().decode("utf-8"))
+        assert len(loads) == 2
+        await stream.aclose()
+
+    asyncio.run(run())
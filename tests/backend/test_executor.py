@@ -0,0 +1,35 @@
+import asyncio
+import threading
+
+import pytest
+
+from src.backend.executor import BoundedExecutor, ServiceBusy
+
+
+def test_run_executes_off_event_loop():
+    executor = BoundedExecutor(max_workers=1, max_queue=0)
+
+    async def main():
+        return await executor.run(threading.get_ident)
+
+    assert asyncio.run(main()) != threading.get_ident()
+    executor.shutdown()
+
+
+def test_rejects_when_saturated():
+    executor = BoundedExecutor(max_workers=1, max_queue=1, retry_after=7)
+    release = threading.Event()
+
+    async def main():
+        running = [asyncio.ensure_future(executor.run(release.wait, 5)) for _ in range(2)]
+        await asyncio.sleep(0.05)
+        with pytest.raises(ServiceBusy) as excinfo:
+            await executor.run(release.wait, 5)
+        assert excinfo.value.retry_after == 7
+        release.set()
+        await asyncio.gather(*running)
+
+    asyncio.run(main())
+    assert executor.stats()["pending"] == 0
+    assert executor.stats()["rejected"] == 1
+    executor.shutdown()
@@ -0,0 +1,55 @@
+import csv
+import gzip
+import io
+import json
+import pytest
+
+from src.backend import export
+from src.backend.records import TrendRecord
+
+
+def topics(count=250):
+    return [
+        TrendRecord(title=f"Topic {i}", ranking=i, search_volume="10K+ searches",
+                    related_queries=[f"q{i}", "x, y"] if i % 2 else None)
+        for i in range(1, count + 1)
+    ]
+
+
+def test_streamed_json_matches_model_dump(make_response):
+    data = make_response(topics())
+    chunks = list(export.export(data, "json"))
+    assert len(chunks) > 2
+    assert b"".join(chunks).decode() == data.to_model().model_dump_json()
+
+    empty = make_response(topics(0))
+    assert b"".join(export.export(empty, "json")).decode() == empty.to_model().model_dump_json()
+
+
+def test_ndjson_and_csv(make_response):
+    data = make_response(topics(3))
+    lines = b"".join(export.export(data, "ndjson")).decode().splitlines()
+    assert [json.loads(line)["title"] for line in lines] == ["Topic 1", "Topic 2", "Topic 3"]
+
+    rows = list(csv.DictReader(io.StringIO(b"".join(export.export(data, "csv")).decode())))
+    assert rows[0]["title"] == "Topic 1"
+    assert rows[0]["related_queries"] == "q1; x, y"
+    assert rows[1]["related_queries"] == ""
+
+
+def test_gzip_compression_round_trips(make_response):
+    data = make_response(topics())
+    compressed = b"".join(export.export(data, "json", "gzip"))
+    assert gzip.decompress(compressed).decode() == data.to_model().model_dump_json()
+    assert export.filename("trends", "json", "gzip") == "trends.json.gz"
+
+
+def test_filename_cannot_break_the_header():
+    assert export.filename('trends_U"S\r\nX-Evil: 1', "csv") == "trends_U_S__X-Evil__1.csv"
+
+
+def test_unknown_options_are_rejected():
+    with pytest.raises(export.ExportUnavailable):
+        export.check_export("xml")
+    with pytest.raises(export.ExportUnavailable):
+        export.check_export("json", "lz4")
@@ -0,0 +1,232 @@
+import threading
+import time
+
+import pytest
+
+from src.backend import scraper
+from src.backend.browser_pool import BrowserPoolTimeout
+from src.backend.hedging import Deadline, RaceResult, Tier, race
+from src.backend.models import TrendRequest
+from src.backend.ratelimit import UpstreamUnavailable
+from src.backend.readiness import wait_for_rows
+from src.backend.records import TrendRecord
+
+
+def sleeper(seconds, value, started=None):
+    def run(deadline, cancelled):
+        if started is not None:
+            started.append(value)
+        cancelled.wait(seconds)
+        return value if not cancelled.is_set() else []
+    return run
+
+
+def test_hedged_tier_wins_over_slow_primary_and_cancels_it():
+    started = []
+    begin = time.monotonic()
+    result = race(
+        [Tier("slow", sleeper(5, ["slow"], started)), Tier("fast", sleeper(0.01, ["fast"], started))],
+        Deadline(10),
+        hedge_delay=0.05,
+    )
+    assert result.tier == "fast"
+    assert result.value == ["fast"]
+    assert started == [["slow"], ["fast"]]
+    assert time.monotonic() - begin < 1
+
+
+def test_next_tier_starts_immediately_after_an_empty_result():
+    result = race(
+        [Tier("empty", lambda d, c: []), Tier("failing", lambda d, c: 1 / 0), Tier("rss", lambda d, c: ["x"])],
+        Deadline(10),
+        hedge_delay=5,
+    )
+    assert result.tier == "rss"
+    assert list(result.errors) == ["failing"]
+
+
+def test_richer_tier_is_waited_for_over_a_faster_poorer_one():
+    result = race(
+        [Tier("page", sleeper(0.2, ["page"]), fidelity=2), Tier("rss", sleeper(0, ["rss"]), fidelity=1)],
+        Deadline(10),
+        hedge_delay=0.01,
+    )
+    assert result.tier == "page"
+
+
+def test_poorer_result_is_taken_once_richer_tiers_fail():
+    def failing(deadline, cancelled):
+        time.sleep(0.1)
+        raise RuntimeError("browser crashed")
+
+    result = race(
+        [Tier("page", failing, fidelity=2), Tier("rss", sleeper(0, ["rss"]), fidelity=1), Tier("http", lambda d, c: [], fidelity=2)],
+        Deadline(10),
+        hedge_delay=0.01,
+    )
+    assert (result.tier, result.value) == ("rss", ["rss"])
+    assert list(result.errors) == ["page"]
+
+
+def test_poorer_result_is_taken_when_the_deadline_is_close():
+    begin = time.monotonic()
+    result = race(
+        [Tier("page", sleeper(5, ["page"]), fidelity=2), Tier("rss", sleeper(0, ["rss"]), fidelity=1)],
+        Deadline(0.5),
+        hedge_delay=0.01,
+        fallback_margin=0.3,
+    )
+    assert result.tier == "rss"
+    assert time.monotonic() - begin < 0.45
+
+
+def test_deadline_bounds_the_race():
+    begin = time.monotonic()
+    result = race([Tier("slow", sleeper(5, ["slow"]))], Deadline(0.1), hedge_delay=0)
+    assert result.tier is None
+    assert time.monotonic() - begin < 1
+
+
+class ProbeDriver:
+    def execute_script(self, script, *args):
+        return [0, 0, "loading"]
+
+
+def test_readiness_wait_stops_when_cancelled():
+    cancelled = threading.Event()
+    cancelled.set()
+    report = wait_for_rows(ProbeDriver(), max_wait=5, cancelled=cancelled)
+    assert not report.ready
+    assert report.reason == "cancelled"
+
+
+class RaceRecorder:
+    """Stands in for ``race``: notes the tiers, runs the named ones and answers with ``result``."""
+
+    def __init__(self, result=None, run=()):
+        self.result = result or RaceResult(None, None, {})
+        self.run = run
+        self.tiers = []
+
+    def __call__(self, tiers, deadline):
+        self.tiers = [(tier.name, tier.fidelity) for tier in tiers]
+        for tier in tiers:
+            if tier.name in self.run:
+                tier.run(deadline, threading.Event())
+        return self.result
+
+
+class PageClient:
+    """HTTP client whose trending page has no table, as without JavaScript."""
+
+    def __init__(self, html=""):
+        self.html = html
+
+    def fetch_parsed(self, url, parse, timeout):
+        return self.html, []
+
+
+@pytest.fixture
+def fetch(monkeypatch):
+    """``fetch(race, selenium=..., source=..., **params)`` runs fetch_trends against fakes."""
+    monkeypatch.setattr(scraper, "get_http_client", lambda: PageClient())
+
+    def run(race, selenium=True, source="dom", **params):
+        monkeypatch.setattr(scraper, "race", race)
+        monkeypatch.setattr(scraper, "USE_SELENIUM", selenium)
+        monkeypatch.setattr(scraper, "DATA_SOURCE", source)
+        return scraper.fetch_trends(TrendRequest(geo="US", **params))
+    return run
+
+
+@pytest.mark.parametrize("selenium, source, url, expected", [
+    (True, "dom", None, [("selenium", 2), ("rss", 1), ("http", 2)]),
+    (False, "dom", None, [("http", 2), ("rss", 1)]),
+    (True, "rpc", None, [("rpc", 2), ("selenium", 2), ("rss", 1), ("http", 2)]),
+    (False, "rpc", None, [("rpc", 2), ("http", 2), ("rss", 1)]),
+    # The RPC only serves the trending list, not custom URLs
+    (True, "rpc", "https://trends.google.com/trending?geo=JP", [("selenium", 2), ("rss", 1), ("http", 2)]),
+    (True, "cdp", None, [("cdp", 2), ("rss", 1), ("http", 2)]),
+    (False, "cdp", None, [("http", 2), ("rss", 1)]),
+])
+def test_tiers_follow_selenium_and_data_source(fetch, selenium, source, url, expected):
+    recorder = RaceRecorder()
+    response = fetch(recorder, selenium=selenium, source=source, url=url)
+    assert recorder.tiers == expected
+    # Nothing answered: samples rather than an error
+    assert response.source_tier == "sample"
+    assert response.topics == scraper.get_sample_trends()
+
+
+def test_throttling_is_raised_instead_of_serving_samples(fetch):
+    throttled = UpstreamUnavailable("trends.google.com", 30, "captcha")
+    with pytest.raises(UpstreamUnavailable) as e:
+        fetch(RaceRecorder(RaceResult(None, None, {"http": RuntimeError("boom"), "rss": throttled})))
+    assert e.value is throttled
+
+
+def test_text_heuristic_reads_the_plain_http_page(fetch, monkeypatch):
+    html = "<html><body><p>google</p>" + "".join(f"<p>Topic number {i}</p>" * 2 for i in range(3)) + "</body></html>"
+    monkeypatch.setattr(scraper, "get_http_client", lambda: PageClient(html))
+    response = fetch(RaceRecorder(run=("http",)), selenium=False)
+    assert response.source_tier == "text_heuristic"
+    assert [t.title for t in response.topics] == ["Topic number 0", "Topic number 1", "Topic number 2"]
+
+
+def test_rendered_page_wins_over_faster_rss(fetch, monkeypatch):
+    detailed = [TrendRecord(title="Topic", ranking=1, search_volume="10K+", change_percentage="+500%")]
+
+    def render(url, deadline, cancelled):
+        time.sleep(0.2)
+        return "<html>rendered</html>"
+
+    monkeypatch.setattr(scraper, "fetch_with_selenium", render)
+    monkeypatch.setattr(scraper, "parse_trending_html", lambda html, geo=None: detailed)
+    monkeypatch.setattr(scraper, "fetch_rss_trends", lambda params, timeout: [TrendRecord(title="Topic", ranking=1)])
+
+    def hedged(tiers, deadline):
+        return race(tiers, deadline, hedge_delay=0.01)
+
+    response = fetch(hedged)
+    assert response.source_tier == "selenium"
+    assert response.topics == detailed
+
+    # Without the page, RSS titles are better than samples
+    monkeypatch.setattr(scraper, "fetch_with_selenium", lambda url, deadline, cancelled: 1 / 0)
+    assert fetch(hedged).source_tier == "rss"
+
+
+class PoolRecorder:
+    """Browser pool that notes the checkout timeouts it is asked for and has no browser to give."""
+
+    def __init__(self):
+        self.timeouts = []
+
+    def browser(self, timeout=None):
+        self.timeouts.append(timeout)
+        raise BrowserPoolTimeout("No browser available")
+
+
+class OpenGuard:
+    def acquire(self, url, max_wait=None):
+        pass
+
+
+def test_selenium_checkout_respects_deadline_and_cancellation(monkeypatch):
+    pool = PoolRecorder()
+    monkeypatch.setattr(scraper, "USE_SELENIUM", True)
+    monkeypatch.setattr(scraper, "get_browser_pool", lambda: pool)
+    monkeypatch.setattr(scraper, "get_upstream_guard", lambda: OpenGuard())
+    params = TrendRequest(geo="US")
+
+    cancelled = threading.Event()
+    cancelled.set()
+    assert scraper.fetch_with_selenium("https://example.com", Deadline(5), cancelled) == ""
+    assert scraper.fetch_rpc_with_selenium("https://example.com", params, Deadline(5), cancelled) == []
+    assert pool.timeouts == []
+
+    for fetch in (lambda: scraper.fetch_with_selenium("https://example.com", Deadline(5), threading.Event()),
+                  lambda: scraper.fetch_rpc_with_selenium("https://example.com", params, Deadline(5))):
+        with pytest.raises(BrowserPoolTimeout):
+            fetch()
+    assert all(0 < timeout <= 5 for timeout in pool.timeouts) and len(pool.timeouts) == 2
@@ -0,0 +1,102 @@
+from datetime import datetime, timedelta
+
+from src.backend.history import HistoryStore
+from src.backend.models import TrendRequest
+
+BASE = datetime(2024, 1, 1, 12)
+
+
+def test_append_and_query_by_range_geo_and_title(tmp_path, make_response):
+    store = HistoryStore(str(tmp_path / "history.sqlite3"))
+    store.append(TrendRequest(geo="US"), make_response(["Alpha", "Beta"], timestamp=BASE))
+    store.append(TrendRequest(geo="US"), make_response(["Beta", "Gamma"], timestamp=BASE + timedelta(hours=1)))
+    store.append(TrendRequest(geo="JP"), make_response(["Alpha"], timestamp=BASE + timedelta(hours=2), geo="JP"))
+
+    assert len(store.query()) == 5
+    assert [p.title for p in store.query(geo="US", start=BASE + timedelta(minutes=30))] == ["Beta", "Gamma"]
+
+    beta = store.query(title="Beta")
+    assert [(p.ranking, p.fetched_at) for p in beta] == [(2, BASE), (1, BASE + timedelta(hours=1))]
+    assert [p.geo for p in store.query(title="Alpha")] == ["US", "JP"]
+    assert store.query(title="Unknown") == []
+
+    # Titles are stored once however often they are seen
+    assert store.stats() == {"snapshots": 3, "titles": 3}
+    store.close()
+
+
+def test_title_ids_survive_reopen(tmp_path, make_response):
+    path = str(tmp_path / "history.sqlite3")
+    store = HistoryStore(path)
+    store.append(TrendRequest(geo="US"), make_response(["Alpha"], timestamp=BASE))
+    store.close()
+
+    reopened = HistoryStore(path)
+    reopened.append(TrendRequest(geo="US"), make_response(["Alpha", "Delta"], timestamp=BASE + timedelta(hours=1)))
+    assert [p.title for p in reopened.iter_points(title="Alpha")] == ["Alpha", "Alpha"]
+    assert reopened.stats()["titles"] == 2
+    reopened.close()
+
+
+def test_summarize_aggregates_numeric_columns(tmp_path, make_response):
+    store = HistoryStore(str(tmp_path / "history.sqlite3"))
+    first = make_response(["Alpha", "Beta"], timestamp=BASE)
+    first.topics[0].search_volume_min, first.topics[0].change_percent = 1000, 10.0
+    second = make_response(["Beta", "Alpha"], timestamp=BASE + timedelta(hours=1))
+    second.topics[1].search_volume_min, second.topics[1].change_percent = 5000, 30.0
+    store.append(TrendRequest(geo="US"), first)
+    store.append(TrendRequest(geo="US"), second)
+
+    alpha, beta = store.summarize(geo="US")
+    assert (alpha.title, alpha.appearances, alpha.best_ranking, alpha.max_search_volume) == ("Alpha", 2, 1, 5000)
+    assert alpha.avg_change_percent == 20.0
+    assert (beta.title, beta.max_search_volume, beta.avg_change_percent) == ("Beta", None, None)
+    assert [s.title for s in store.summarize(order_by="last_seen", limit=1)] in (["Alpha"], ["Beta"])
+    store.close()
+
+
+def test_records_match_points_and_share_strings(tmp_path, make_response):
+    store = HistoryStore(str(tmp_path / "history.sqlite3"))
+    first = make_response(["Alpha", "Beta"], timestamp=BASE)
+    first.topics[0].search_volume_min, first.topics[0].change_percent = 1000, 12.5
+    store.append(TrendRequest(geo="US", category="17"), first)
+    store.append(TrendRequest(geo="US"), make_response(["Alpha"], timestamp=BASE + timedelta(hours=1)))
+
+    records = list(store.iter_records())
+    points = store.query()
+    assert [record.to_model() for record in records] == points
+    assert [record.to_json().decode() for record in records] == [point.model_dump_json() for point in points]
+    assert (records[0].category, records[2].category) == ("17", None)
+    # Repeated strings are one object however many rows carry them
+    assert records[0].title is records[2].title
+    assert records[0].geo is records[1].geo
+    store.close()
+
+
+def test_old_snapshots_are_pruned_as_new_ones_arrive(tmp_path, make_response):
+    store = HistoryStore(str(tmp_path / "history.sqlite3"), max_age_days=1)
+    store.append(TrendRequest(geo="US"), make_response(["Alpha", "Beta"], timestamp=BASE))
+    store.append(TrendRequest(geo="US"), make_response(["Beta"], timestamp=BASE + timedelta(hours=12)))
+    assert store.stats() == {"snapshots": 2, "titles": 2}
+
+    store.append(TrendRequest(geo="US"), make_response(["Gamma"], timestamp=BASE + timedelta(days=2)))
+    assert store.stats() == {"snapshots": 1, "titles": 1}
+    assert [p.title for p in store.query()] == ["Gamma"]
+    # Titles pruned away get fresh ids when they come back
+    store.append(TrendRequest(geo="US"), make_response(["Alpha"], timestamp=BASE + timedelta(days=2, hours=1)))
+    assert [p.title for p in store.query()] == ["Gamma", "Alpha"]
+    store.close()
+
+
+def test_submitted_snapshots_are_written_in_the_background(tmp_path, make_response):
+    store = HistoryStore(str(tmp_path / "history.sqlite3"))
+    assert store.submit(TrendRequest(geo="US"), make_response(["Alpha"], timestamp=BASE))
+    assert store.flush()
+    assert [p.title for p in store.query()] == ["Alpha"]
+
+    # Closing writes out whatever is still queued
+    store.submit(TrendRequest(geo="US"), make_response(["Beta"], timestamp=BASE + timedelta(hours=1)))
+    store.close()
+    reopened = HistoryStore(str(tmp_path / "history.sqlite3"))
+    assert reopened.stats()["snapshots"] == 2
+    reopened.close()
@@ -0,0 +1,70 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from src.backend.http_client import HttpClient
+from src.backend.records import TrendRecord
+
+
+class Handler(BaseHTTPRequestHandler):
+    body = b"<rss><channel><item><title>Topic</title></item></channel></rss>"
+    hits = []
+
+    def do_GET(self):
+        Handler.hits.append(self.headers.get("If-None-Match"))
+        if self.path == "/missing":
+            self.send_response(404)
+            self.end_headers()
+            return
+        if self.headers.get("If-None-Match") == '"v1"':
+            self.send_response(304)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("ETag", '"v1"')
+        self.send_header("Content-Length", str(len(self.body)))
+        self.end_headers()
+        self.wfile.write(self.body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    Handler.hits = []
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+
+
+def test_not_modified_reuses_parsed_result(server):
+    client = HttpClient(retries=0)
+    parses = []
+
+    def parse(response):
+        parses.append(response.text)
+        return [TrendRecord(title="parsed", related_queries=["a"])]
+
+    first = client.fetch_parsed(f"{server}/feed", parse, timeout=5)
+    first[0].ranking = 1
+    first[0].related_queries.append("b")
+    second = client.fetch_parsed(f"{server}/feed", parse, timeout=5)
+    third = client.fetch_parsed(f"{server}/feed", parse, timeout=5)
+
+    # Callers own their copy: changes to one never reach the cached result
+    assert second == third == [TrendRecord(title="parsed", related_queries=["a"])]
+    assert second[0] is not third[0]
+    assert len(parses) == 1
+    assert Handler.hits == [None, '"v1"', '"v1"']
+    assert client.stats()["not_modified"] == 2
+
+
+def test_error_status_raises_request_exception(server):
+    client = HttpClient(retries=0)
+    with pytest.raises(requests.exceptions.RequestException):
+        client.fetch_parsed(f"{server}/missing", lambda r: r.text, timeout=5)
@@ -0,0 +1,198 @@
+import threading
+from queue import Queue
+
+import pytest
+
+from src.backend.cache import SQLiteBackend, TrendsCache
+from src.backend.executor import ServiceBusy, get_scrape_executor
+from src.backend.jobqueue import (
+    DONE,
+    FAILED,
+    JOB_MAX_WAITERS,
+    JobFailed,
+    JobQueue,
+    QueueLoader,
+    SQLiteJobQueue,
+    close_job_queue,
+    get_job_wait_executor,
+    run_jobs,
+    stop_processes,
+)
+from src.backend.models import TrendRequest
+from src.backend.ratelimit import UpstreamUnavailable
+
+
+def test_identical_jobs_are_deduplicated_while_in_flight(tmp_path):
+    queue = SQLiteJobQueue(str(tmp_path / "jobs.sqlite3"))
+    hk = queue.enqueue(TrendRequest(geo="HK"))
+    assert queue.enqueue(TrendRequest(geo="HK")).id == hk.id
+    us = queue.enqueue(TrendRequest(geo="US"))
+    assert us.id != hk.id
+
+    claimed = queue.claim("w1")
+    assert (claimed.id, claimed.attempts) == (hk.id, 1)
+    # Still deduplicated while running, but no longer once finished
+    assert queue.enqueue(TrendRequest(geo="HK")).id == hk.id
+    queue.complete(hk.id)
+    assert queue.get(hk.id).status == DONE
+    assert queue.enqueue(TrendRequest(geo="HK")).id != hk.id
+
+    assert queue.claim("w2").params.geo == "US"
+    assert queue.stats()["running"] == 1
+
+
+def test_incomplete_queue_fails_on_construction():
+    class EnqueueOnly(JobQueue):
+        def enqueue(self, params):
+            raise RuntimeError
+
+    with pytest.raises(TypeError):
+        EnqueueOnly()
+
+
+def test_expired_lease_hands_the_job_to_another_worker(tmp_path, clock):
+    queue = SQLiteJobQueue(str(tmp_path / "jobs.sqlite3"), lease=60, max_attempts=2, clock=clock)
+    job = queue.enqueue(TrendRequest(geo="HK"))
+    assert queue.claim("w1").id == job.id
+    assert queue.claim("w2") is None
+
+    clock.now += 61
+    assert queue.claim("w2").attempts == 2
+    clock.now += 61
+    # Out of attempts: failed rather than retried forever
+    assert queue.claim("w3") is None
+    assert queue.get(job.id).status == FAILED
+
+
+class RecordingQueue(SQLiteJobQueue):
+    """Shares the queue file like another process would, noting the jobs it was handed."""
+
+    def __init__(self, path, enqueued):
+        super().__init__(path)
+        self.enqueued = enqueued
+
+    def enqueue(self, params):
+        job = super().enqueue(params)
+        self.enqueued.put(job.id)
+        return job
+
+
+def test_workers_deliver_results_through_the_shared_cache(tmp_path, make_response):
+    queue_path, cache_path = str(tmp_path / "jobs.sqlite3"), str(tmp_path / "cache.sqlite3")
+    calls = []
+    scraped = threading.Event()
+
+    def fetch(params):
+        calls.append(params.geo)
+        scraped.wait(5)
+        return make_response(geo=params.geo)
+
+    enqueued = Queue()
+    # Two API processes, each with its own connections and in-process cache
+    apis = [
+        TrendsCache(QueueLoader(RecordingQueue(queue_path, enqueued), SQLiteBackend(cache_path), timeout=5),
+                    shared=SQLiteBackend(cache_path))
+        for _ in range(2)
+    ]
+    results = []
+    waiters = [threading.Thread(target=lambda api=api: results.append(api.get(TrendRequest(geo="HK")))) for api in apis]
+    stop = threading.Event()
+    worker_cache = TrendsCache(fetch, shared=SQLiteBackend(cache_path))
+    worker = threading.Thread(target=run_jobs, args=(SQLiteJobQueue(queue_path), worker_cache, stop, "w1", 0.01))
+    try:
+        for waiter in waiters:
+            waiter.start()
+        # Both requests are queued before the scrape may finish: one job between them
+        assert enqueued.get(timeout=5) == enqueued.get(timeout=5)
+        worker.start()
+        scraped.set()
+        for waiter in waiters:
+            waiter.join(5)
+    finally:
+        stop.set()
+        if worker.is_alive():
+            worker.join(5)
+
+    assert calls == ["HK"]
+    assert [response.location for response, _, _ in results] == ["HK", "HK"]
+
+
+def test_worker_failures_reach_the_waiting_request(tmp_path):
+    queue_path, cache_path = str(tmp_path / "jobs.sqlite3"), str(tmp_path / "cache.sqlite3")
+
+    def fetch(params):
+        if params.geo == "US":
+            raise UpstreamUnavailable("trends.google.com", 30, "captcha")
+        raise RuntimeError("parser exploded")
+
+    stop = threading.Event()
+    worker = threading.Thread(
+        target=run_jobs,
+        args=(SQLiteJobQueue(queue_path), TrendsCache(fetch, shared=SQLiteBackend(cache_path)), stop, "w1", 0.01),
+    )
+    worker.start()
+    loader = QueueLoader(SQLiteJobQueue(queue_path), SQLiteBackend(cache_path), timeout=5)
+    try:
+        # Throttling surfaces as UpstreamUnavailable so the API can serve last known data
+        with pytest.raises(UpstreamUnavailable) as e:
+            loader(TrendRequest(geo="US"))
+        assert e.value.retry_after == 30
+        assert e.value.reason == "captcha"
+        with pytest.raises(JobFailed, match="parser exploded"):
+            loader(TrendRequest(geo="HK"))
+    finally:
+        stop.set()
+        worker.join(5)
+
+
+def test_request_gives_up_when_no_worker_runs(tmp_path):
+    loader = QueueLoader(SQLiteJobQueue(str(tmp_path / "jobs.sqlite3")), SQLiteBackend(str(tmp_path / "cache.sqlite3")), timeout=0)
+    with pytest.raises(ServiceBusy, match="No scrape worker"):
+        loader(TrendRequest(geo="HK"))
+
+
+
+def test_job_waits_are_bounded_apart_from_scrapes():
+    waits = get_job_wait_executor()
+    assert waits is not get_scrape_executor()
+    assert waits.max_workers == JOB_MAX_WAITERS
+    close_job_queue()
+    assert get_job_wait_executor() is not waits
+    close_job_queue()
+
+
+class StuckProcess:
+    """A worker that ignores the stop event, and optionally SIGTERM too."""
+
+    def __init__(self, clock, name, ignores_terminate=False):
+        self.clock = clock
+        self.name = name
+        self.ignores_terminate = ignores_terminate
+        self.alive = True
+        self.signals = []
+
+    def join(self, timeout=None):
+        self.clock.now += timeout or 0
+
+    def is_alive(self):
+        return self.alive
+
+    def terminate(self):
+        self.signals.append("terminate")
+        self.alive = self.ignores_terminate
+
+    def kill(self):
+        self.signals.append("kill")
+        self.alive = False
+
+
+def test_stuck_workers_share_one_shutdown_deadline(clock):
+    processes = [StuckProcess(clock, f"scraper-{i}") for i in range(3)]
+    processes.append(StuckProcess(clock, "scraper-3", ignores_terminate=True))
+    stopping = threading.Event()
+
+    stop_processes(processes, stopping, timeout=120, kill_timeout=5, clock=clock)
+
+    assert stopping.is_set()
+    assert clock.now - 1000 == 125  # not 4 x 120
+    assert [p.signals for p in processes] == [["terminate"]] * 3 + [["terminate", "kill"]]
@@ -0,0 +1,45 @@
+from src.backend import metrics
+
+
+def test_span_records_stage_duration():
+    before = metrics.STAGE_SECONDS.count(stage="test.span")
+    with metrics.span("test.span"):
+        pass
+    assert metrics.STAGE_SECONDS.count(stage="test.span") == before + 1
+
+
+def test_disabled_span_is_noop(monkeypatch):
+    monkeypatch.setattr(metrics, "METRICS_ENABLED", False)
+    with metrics.span("test.disabled"):
+        pass
+    metrics.record_tier("test-disabled")
+    assert metrics.STAGE_SECONDS.count(stage="test.disabled") == 0
+    assert metrics.FALLBACK_TIER.value(tier="test-disabled") == 0
+
+
+def test_timed_decorator_records_calls():
+    @metrics.timed("test.timed")
+    def work(x):
+        return x * 2
+
+    assert work(21) == 42
+    assert metrics.STAGE_SECONDS.count(stage="test.timed") == 1
+
+
+def test_render_prometheus_text_format():
+    registry = metrics.Registry()
+    histogram = registry.register(metrics.Histogram("h_seconds", "A histogram", ["stage"], buckets=(0.1, 1.0)))
+    histogram.observe(0.05, stage="parse")
+    histogram.observe(0.5, stage="parse")
+    registry.register(metrics.CallbackMetric("c_total", "A callback", "counter", lambda: {("hit",): 3}, ["result"]))
+    registry.register(metrics.CallbackMetric("broken", "Raises", "gauge", lambda: 1 / 0))
+
+    text = registry.render()
+    assert "# TYPE h_seconds histogram" in text
+    assert 'h_seconds_bucket{stage="parse",le="0.1"} 1' in text
+    assert 'h_seconds_bucket{stage="parse",le="1.0"} 2' in text
+    assert 'h_seconds_bucket{stage="parse",le="+Inf"} 2' in text
+    assert 'h_seconds_count{stage="parse"} 2' in text
+    assert 'c_total{result="hit"} 3' in text
+    # A failing callback leaves the metric empty instead of breaking the scrape
+    assert "# TYPE broken gauge\n" in text
@@ -0,0 +1,58 @@
+import pytest
+
+from src.backend.records import TrendRecord
+from src.backend.normalize import normalize_trends, parse_change, parse_volume
+from src.backend.parser import parse_trending_html
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("500K+ searches", 500_000),
+    ("2M+", 2_000_000),
+    ("1.5M+ searches", 1_500_000),
+    ("20,000+ searches", 20_000),
+    ("1 234", 1_234),
+    ("1,5 Mio.+", 1_500_000),
+    ("5 mil+ búsquedas", 5_000),
+    ("10万+", 100_000),
+    ("2천+", 2_000),
+    ("200 тыс.+", 200_000),
+    ("Breakout", None),
+    (None, None),
+])
+def test_parse_volume(text, expected):
+    assert parse_volume(text) == expected
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("+25%", 25.0),
+    ("-1,000%", -1000.0),
+    ("↑ 1.000 %", 1000.0),
+    ("+1.5%", 1.5),
+    ("1,234.5%", 1234.5),
+    ("Breakout", None),
+])
+def test_parse_change(text, expected):
+    assert parse_change(text) == expected
+
+
+def test_normalize_trends_in_place():
+    trends = [
+        TrendRecord(title="a", search_volume="100K+ searches", change_percentage="+50%"),
+        TrendRecord(title="b", search_volume="100K+ searches"),
+    ]
+    normalize_trends(trends)
+    assert [(t.search_volume_min, t.change_percent) for t in trends] == [(100_000, 50.0), (100_000, None)]
+
+
+def test_parser_emits_numeric_fields():
+    html = """
+    <table><tr jsname='oKdM2c'>
+      <td class="jvkLtd"><div class="mZ3RIc">Topic</div></td>
+      <td class="dQOTjf"><div class="lqv0Cb">50K+</div>
+        <div class="wqrjjc"><div class="TXt85b">+300%</div></div></td>
+    </tr></table>
+    """
+    [trend] = parse_trending_html(html)
+    assert trend.search_volume == "50K+ searches"
+    assert trend.search_volume_min == 50_000
+    assert trend.change_percent == 300.0
@@ -48,3 +48,104 @@ def test_parse_malformed_html():
     trends = parse_trending_html("<div>Random content</div>")
     # Should return some trends or empty list, not crash
     assert isinstance(trends, list)
+
+FULL_TABLE_HTML = """
+<html><head><script>var rows = "<tr jsname='oKdM2c'>";</script></head><body>
+<table class='enOdEe-wZVHld-zg7Cn'><tbody>
+<tr jsname='oKdM2c'>
+  <td class='jvkLtd'><div class='mZ3RIc'> Rock &amp; Roll <!-- note --></div></td>
+  <td class='enOdEe dQOTjf'><div class='lqv0Cb'>500K+</div>
+    <div class='wqrjjc'><div class='TXt85b'>1,000%</div></div></td>
+  <td class='xm9Xec'><button data-term='guitar'>guitar</button><button data-term='Rock &amp; Roll'>x</button></td>
+  <td><a href='/trends/explore?q=rock'>Explore</a></td>
+</tr>
+<tr jsname='oKdM2c'><td class='xm9Xec'><button>no title here</button></td></tr>
+<tr jsname='oKdM2c'>
+  <td class='jvkLtd'><div class='mZ3RIc'>Weather<style>.x{}</style></div></td>
+  <td class='dQOTjf'><div class='lqv0Cb'>10K+ searches</div></td>
+  <td class='xm9Xec'><button><span>storm</span> warning</button><button>ab</button></td>
+  <td><a href='https://example.com/weather'>Other</a></td>
+</tr>
+</tbody></table></body></html>
+"""
+
+def test_parser_backends_identical():
+    """The lxml and BeautifulSoup backends produce the same trends."""
+    bs4_trends = parse_trending_html(FULL_TABLE_HTML, backend="bs4")
+    lxml_trends = parse_trending_html(FULL_TABLE_HTML, backend="lxml")
+    assert lxml_trends == bs4_trends
+    assert [t.title for t in lxml_trends] == ["Rock & Roll", "Weather"]
+    assert lxml_trends[0].search_volume == "500K+ searches"
+    assert lxml_trends[0].related_queries == ["guitar"]
+    assert lxml_trends[0].url == "https://trends.google.com/trends/explore?q=rock"
+    assert lxml_trends[1].related_queries == ["stormwarning"]
+    assert lxml_trends[1].ranking == 3
+
+def test_streaming_extraction_matches_dom():
+    """Streaming extraction gives the same trends, even from tiny chunks."""
+    from src.backend.stream_parser import iter_table_trends
+
+    expected = parse_trending_html(FULL_TABLE_HTML, backend="bs4")
+    chunks = (FULL_TABLE_HTML[i:i + 7] for i in range(0, len(FULL_TABLE_HTML), 7))
+    streamed = iter_table_trends(chunks)
+    assert next(streamed) == expected[0]
+    assert list(streamed) == expected[1:]
+    assert parse_trending_html(FULL_TABLE_HTML, backend="stream") == expected
+
+LEGACY_HTML = """
+<div class='trending-searches-content'>
+  <div class='feed-item'><h3>Solar Eclipse</h3><span class='volume'>2M+</span><a href='https://example.com/e'>more</a></div>
+  <div class='feed-item'><h3>Election Night</h3><span class='change'>+40%</span></div>
+</div>
+"""
+
+def test_selector_plans_match_in_one_pass():
+    """Fallback layouts pick the first plan in order and read every field."""
+    from src.backend.parser import SELECTOR_PLANS, layout_fingerprint
+
+    fingerprint = layout_fingerprint(LEGACY_HTML)
+    assert [p.marker for i, p in enumerate(SELECTOR_PLANS) if fingerprint >> i & 1] == [
+        "trending-searches-content", "feed-item",
+    ]
+    trends = parse_trending_html(LEGACY_HTML, geo="GB")
+    assert [(t.title, t.ranking) for t in trends] == [("Solar Eclipse", 1), ("Election Night", 2)]
+    assert trends[0].search_volume == "2M+"
+    assert trends[0].url == "https://example.com/e"
+    assert trends[1].change_percentage == "+40%"
+
+def test_winning_plan_is_remembered_per_geo_and_layout(monkeypatch):
+    """Later parses of the same layout go straight to the plan that worked."""
+    from src.backend import parser
+
+    parser._plan_cache.clear()
+    assert parse_trending_html(SAMPLE_REALTIME_HTML, geo="US")
+    key = ("US", parser.layout_fingerprint(SAMPLE_REALTIME_HTML))
+    assert parser.SELECTOR_PLANS[parser._plan_cache[key]].selector == "div[jsname='oKdM2c']"
+
+    def no_full_match(*args):
+        raise AssertionError("cached plan should be used")
+    monkeypatch.setattr(parser, "match_plans", no_full_match)
+    assert [t.title for t in parse_trending_html(SAMPLE_REALTIME_HTML, geo="US")] == ["AI Technology", "Climate Change"]
+
+def test_stale_cached_plan_falls_back_to_the_cascade():
+    from src.backend import parser
+
+    parser._plan_cache.clear()
+    # Same fingerprint, but the remembered plan no longer yields anything
+    key = ("US", parser.layout_fingerprint(LEGACY_HTML))
+    parser._plan_cache[key] = 0
+    assert [t.title for t in parse_trending_html(LEGACY_HTML, geo="US")] == ["Solar Eclipse", "Election Night"]
+    assert parser.SELECTOR_PLANS[parser._plan_cache[key]].selector == ".trending-searches-content div"
+
+def test_text_heuristic_reads_visible_text_only():
+    """The last-resort extraction skips scripts, styles, comments and page chrome."""
+    html = (
+        "<html><head><style>.headline { color: red }</style></head><body>"
+        "<script>Secret Topic</script><!-- Hidden Comment -->"
+        "<p>Settings</p><p>MENU</p><p>x = 1</p><p>https://example.com</p>"
+        + "".join(f"<p>Topic number {i}</p><p>Topic number {i}</p>" for i in range(30))
+        + "</body></html>"
+    )
+    trends = parse_trending_html(html)
+    assert [t.title for t in trends] == [f"Topic number {i}" for i in range(20)]
+    assert [t.ranking for t in trends] == list(range(1, 21))
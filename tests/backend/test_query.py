@@ -0,0 +1,60 @@
+import pytest
+
+from src.backend.models import TrendQuery
+from src.backend.records import TrendRecord
+from src.backend.query import InvalidQuery, apply_query, dump_json, index_for, validate_query
+
+
+@pytest.fixture
+def response(make_response):
+    return make_response([
+        TrendRecord(title="Beta launch", ranking=1, search_volume_min=1000, change_percent=50.0),
+        TrendRecord(title="alpha", ranking=2, search_volume_min=50000),
+        TrendRecord(title="Gamma", ranking=3),
+        TrendRecord(title="Delta beta", ranking=4, search_volume_min=1000, change_percent=900.0),
+    ])
+
+
+def titles(response):
+    return [topic.title for topic in response.topics]
+
+
+def test_empty_query_returns_the_cached_response(response):
+    assert apply_query(response, TrendQuery()) is response
+
+
+def test_filter_sort_and_page(response):
+    assert titles(apply_query(response, TrendQuery(title_contains="BETA"))) == ["Beta launch", "Delta beta"]
+    assert titles(apply_query(response, TrendQuery(min_volume=5000))) == ["alpha"]
+
+    # Ties keep the upstream order and missing values sort last in both directions
+    assert titles(apply_query(response, TrendQuery(order_by="-search_volume_min"))) == [
+        "alpha", "Beta launch", "Delta beta", "Gamma"]
+    assert titles(apply_query(response, TrendQuery(order_by="search_volume_min"))) == [
+        "Beta launch", "Delta beta", "alpha", "Gamma"]
+    assert titles(apply_query(response, TrendQuery(order_by="title"))) == [
+        "alpha", "Beta launch", "Delta beta", "Gamma"]
+
+    page = apply_query(response, TrendQuery(order_by="ranking", offset=1, limit=2))
+    assert titles(page) == ["alpha", "Gamma"]
+    assert page.total_trends == 4
+    # The cached response itself is never modified
+    assert len(response.topics) == 4
+
+
+def test_sort_orders_are_computed_once_per_response(response):
+    apply_query(response, TrendQuery(order_by="-change_percent"))
+    order = index_for(response).order("change_percent", descending=True)
+    assert order == [3, 0, 1, 2]
+    apply_query(response, TrendQuery(order_by="-change_percent", limit=1))
+    assert index_for(response).order("change_percent", descending=True) is order
+
+
+def test_field_projection_and_validation(response):
+    payload = dump_json(response, "title,ranking")
+    assert '"title":"alpha","ranking":2}' in payload
+    assert "search_volume" not in payload
+
+    for bad in (TrendQuery(order_by="url"), TrendQuery(fields="title,nope"), TrendQuery(limit=-1)):
+        with pytest.raises(InvalidQuery):
+            validate_query(bad)
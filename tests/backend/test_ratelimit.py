@@ -0,0 +1,188 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from src.backend.http_client import HttpClient
+from src.backend.ratelimit import (
+    CLOSED,
+    HALF_OPEN,
+    OPEN,
+    CircuitBreaker,
+    Limiter,
+    LocalLimiter,
+    SQLiteLimiter,
+    UpstreamGuard,
+    UpstreamUnavailable,
+    looks_like_captcha,
+)
+
+
+def test_local_bucket_allows_burst_then_spaces_requests(clock):
+    limiter = LocalLimiter(clock)
+    assert [limiter.try_acquire("a", rate=2, burst=3) for _ in range(3)] == [0, 0, 0]
+    assert limiter.try_acquire("a", rate=2, burst=3) == pytest.approx(0.5)
+    # Hosts have separate buckets
+    assert limiter.try_acquire("b", rate=2, burst=3) == 0
+    clock.now += 0.5
+    assert limiter.try_acquire("a", rate=2, burst=3) == 0
+
+
+def test_sqlite_buckets_are_shared_between_processes(tmp_path, clock):
+    path = str(tmp_path / "limits.sqlite3")
+    first, second = SQLiteLimiter(path, clock), SQLiteLimiter(path, clock)
+    try:
+        assert first.try_acquire("a", rate=1, burst=2) == 0
+        assert second.try_acquire("a", rate=1, burst=2) == 0
+        assert first.try_acquire("a", rate=1, burst=2) == pytest.approx(1.0)
+        clock.now += 1
+        assert second.try_acquire("a", rate=1, burst=2) == 0
+    finally:
+        first.close()
+        second.close()
+
+
+def test_breaker_opens_after_threshold_and_backs_off_exponentially(clock):
+    breaker = CircuitBreaker(failure_threshold=2, base_backoff=10, max_backoff=25, jitter=0.5,
+                             clock=clock, rand=lambda: 1.0)
+    breaker.record_failure("503 error")
+    assert breaker.state == CLOSED
+    breaker.record_failure("503 error")
+    assert breaker.state == OPEN
+    # Full jitter draw halves the 10s backoff
+    assert breaker.retry_after() == pytest.approx(5)
+    assert not breaker.allow()
+
+    clock.now += 5
+    assert breaker.allow()
+    assert breaker.state == HALF_OPEN
+    assert not breaker.allow()
+    breaker.record_failure("503 error")
+    assert breaker.retry_after() == pytest.approx(10)
+
+    clock.now += 10
+    assert breaker.allow()
+    breaker.record_failure("503 error")
+    # Capped at max_backoff before jitter
+    assert breaker.retry_after() == pytest.approx(12.5)
+
+    clock.now += 12.5
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CLOSED
+    assert breaker.trips == 0
+
+
+def test_lost_probe_is_retried_after_base_backoff(clock):
+    breaker = CircuitBreaker(base_backoff=10, jitter=0, clock=clock)
+    breaker.record_failure("captcha", trip=True)
+    clock.now += 10
+    assert breaker.allow()
+    assert not breaker.allow()
+    clock.now += 10
+    assert breaker.allow()
+
+
+def make_guard(clock, **kwargs):
+    return UpstreamGuard(
+        LocalLimiter(clock), rate=1, burst=1,
+        breaker_factory=lambda: CircuitBreaker(base_backoff=30, jitter=0, clock=clock),
+        sleep=clock.sleep,
+        **kwargs,
+    )
+
+
+def test_guard_waits_for_a_token_up_to_max_wait(clock):
+    guard = make_guard(clock, max_wait=5)
+    guard.acquire("https://trends.google.com/trending")
+    guard.acquire("https://trends.google.com/trending")
+    assert clock.now == pytest.approx(1001)
+    assert guard.stats()["waited_seconds"] == pytest.approx(1)
+
+    guard.max_wait = 0.5
+    with pytest.raises(UpstreamUnavailable, match="rate limited"):
+        guard.acquire("https://trends.google.com/trending")
+    # A caller's own budget, e.g. what is left of a fetch deadline, shortens the wait too
+    guard.max_wait = 5
+    with pytest.raises(UpstreamUnavailable, match="rate limited"):
+        guard.acquire("https://trends.google.com/trending", max_wait=0.5)
+    assert clock.now == pytest.approx(1001)
+
+
+def test_throttling_opens_breaker_and_slows_the_rate(clock):
+    guard = make_guard(clock)
+    url = "https://trends.google.com/trending"
+    guard.acquire(url)
+    with pytest.raises(UpstreamUnavailable) as excinfo:
+        guard.observe(url, 429)
+    assert excinfo.value.retry_after == 30
+
+    assert guard.current_rate("trends.google.com") == 0.5
+    assert guard.retry_after("trends.google.com") == 30
+    with pytest.raises(UpstreamUnavailable, match="429"):
+        guard.check("trends.google.com")
+    # Other hosts are unaffected
+    guard.acquire("https://example.com/")
+
+    clock.now += 30
+    guard.acquire(url)
+    guard.observe(url, 200, "<html>rows</html>")
+    assert guard.retry_after("trends.google.com") == 0
+    assert guard.current_rate("trends.google.com") == pytest.approx(0.55)
+    assert guard.stats()["hosts"]["trends.google.com"]["state"] == CLOSED
+
+
+def test_server_errors_open_breaker_after_threshold(clock):
+    guard = make_guard(clock)
+    for _ in range(3):
+        guard.record("https://trends.google.com/trending", status=503)
+    assert guard.breaker("trends.google.com").state == OPEN
+    # Plain server errors don't slow the rate down
+    assert guard.current_rate("trends.google.com") == 1
+
+
+def test_limiter_without_try_acquire_fails_on_construction():
+    class Unlimited(Limiter):
+        pass
+
+    with pytest.raises(TypeError):
+        Unlimited()
+
+
+def test_captcha_detection():
+    assert looks_like_captcha("", "https://www.google.com/sorry/index?continue=x")
+    assert looks_like_captcha("<p>Our systems have detected unusual traffic from your computer network.</p>")
+    assert looks_like_captcha('<form id="captcha-form">')
+    assert not looks_like_captcha("<html><table><tr><td>Topic</td></tr></table></html>",
+                                  "https://trends.google.com/trending")
+
+
+class ThrottlingHandler(BaseHTTPRequestHandler):
+    hits = 0
+
+    def do_GET(self):
+        ThrottlingHandler.hits += 1
+        self.send_response(429)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+def test_http_client_stops_calling_a_throttling_host(clock):
+    ThrottlingHandler.hits = 0
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), ThrottlingHandler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    client = HttpClient(retries=0, guard=make_guard(clock))
+    url = f"http://127.0.0.1:{httpd.server_address[1]}/trending"
+    try:
+        with pytest.raises(UpstreamUnavailable):
+            client.get(url, timeout=5)
+        with pytest.raises(UpstreamUnavailable, match="retry after 30s"):
+            client.get(url, timeout=5)
+        assert ThrottlingHandler.hits == 1
+    finally:
+        client.close()
+        httpd.shutdown()
@@ -0,0 +1,58 @@
+from src.backend.readiness import SCROLL_SCRIPT, wait_for_rows
+
+
+class ScriptedDriver:
+    """Driver whose probe results follow a timeline of (seconds_in, rows, mutations, state)."""
+
+    def __init__(self, clock, timeline):
+        self.clock = clock
+        self.start = clock.now
+        self.timeline = timeline
+        self.scrolled = False
+
+    def execute_script(self, script, *args):
+        if script == SCROLL_SCRIPT:
+            self.scrolled = True
+            return None
+        current = self.timeline[0]
+        for entry in self.timeline:
+            if entry[0] <= self.clock.now - self.start:
+                current = entry
+        return list(current[1:])
+
+
+def wait(driver, clock, **kwargs):
+    return wait_for_rows(driver, poll_interval=0.1, stable_for=0.5, quiet_for=1.0,
+                         clock=clock, sleep=clock.sleep, **kwargs)
+
+
+def test_ready_once_row_count_is_stable(clock):
+    driver = ScriptedDriver(clock, [(0, 0, 0, "loading"), (1.0, 10, 5, "complete"), (1.5, 25, 9, "complete")])
+    report = wait(driver, clock, max_wait=10)
+    assert report.ready
+    assert report.reason == "stable"
+    assert report.row_count == 25
+    assert driver.scrolled
+    assert 0.9 < report.timings["first_rows"] < 1.2
+    assert report.timings["settled"] < 2.5
+
+
+def test_page_without_rows_ready_when_quiet(clock):
+    driver = ScriptedDriver(clock, [(0, 0, 3, "loading"), (0.5, 0, 8, "complete")])
+    report = wait(driver, clock, max_wait=10)
+    assert report.ready
+    assert report.reason == "quiet"
+    assert report.timings["settled"] < 2
+
+
+def test_gives_up_at_max_wait(clock):
+    mutations = iter(range(1000))
+
+    class BusyDriver:
+        def execute_script(self, script, *args):
+            return [0, next(mutations), "complete"]
+
+    report = wait(BusyDriver(), clock, max_wait=3)
+    assert not report.ready
+    assert report.reason == "timeout"
+    assert 3 <= report.timings["settled"] < 3.2
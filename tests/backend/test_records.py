@@ -0,0 +1,36 @@
+from src.backend.models import Trend, TrendsResponse
+from src.backend.records import TREND_FIELDS, TrendRecord, TrendSnapshot
+
+
+def full_record(rank=1):
+    return TrendRecord(title=f"Topic {rank}", search_volume="20K+", ranking=rank, change_percentage="+150%",
+                       related_queries=["a", "b"], url="https://example.com", search_volume_min=20000,
+                       change_percent=150.0)
+
+
+def test_record_fields_follow_the_model():
+    record = full_record()
+    assert tuple(record.as_dict()) == TREND_FIELDS
+    assert record.to_model() == Trend(**record.as_dict())
+    assert TrendRecord.from_model(record.to_model()) == record
+    assert not hasattr(record, "__dict__")
+
+
+def test_json_matches_the_models(make_response):
+    snapshot = make_response([full_record(1), TrendRecord(title="Bare")])
+    snapshot.source_tier, snapshot.fetch_ms = "http", 12.5
+    model = snapshot.to_model()
+    assert isinstance(model, TrendsResponse)
+    assert snapshot.to_json() == model.model_dump_json().encode()
+    assert snapshot.topics[0].to_json() == model.topics[0].model_dump_json().encode()
+
+
+def test_snapshot_round_trips(make_response):
+    snapshot = make_response([full_record(1), full_record(2)])
+    assert TrendSnapshot.from_json(snapshot.to_json()) == snapshot
+    assert TrendSnapshot.from_json(snapshot.to_json().decode()) == snapshot
+    assert TrendSnapshot.from_model(snapshot.to_model()) == snapshot
+
+    trimmed = snapshot.replace(topics=snapshot.topics[:1], total_trends=1)
+    assert (len(trimmed.topics), trimmed.total_trends, len(snapshot.topics)) == (1, 1, 2)
+    assert trimmed.topics[0] is snapshot.topics[0]
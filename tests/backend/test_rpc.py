@@ -0,0 +1,101 @@
+import json
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+from src.backend.models import TrendRequest
+from src.backend.rpc import (
+    RpcError,
+    build_rpc_request,
+    capture_rpc_bodies,
+    format_volume,
+    is_rpc_url,
+    trends_from_response,
+)
+
+FIXTURE = (Path(__file__).parent / "fixtures" / "batchexecute_i0OFE.txt").read_text(encoding="utf-8")
+
+
+def test_decodes_recorded_response():
+    trends = trends_from_response(FIXTURE)
+    assert [t.title for t in trends] == [
+        "champions league draw", "heat advisory", "fourth of july fireworks", "nba free agency", "café münchen",
+    ]
+    first = trends[0]
+    assert first.ranking == 1
+    assert first.search_volume == "500K+"
+    assert first.search_volume_min == 500000
+    assert first.change_percentage == "+1,000%"
+    assert first.change_percent == 1000.0
+    # The keyword itself is not a related query
+    assert first.related_queries == ["ucl draw", "champions league"]
+    assert trends[2].search_volume == "2M+"
+    assert trends[4].related_queries is None
+
+
+def test_applies_category_status_and_sort_like_the_page():
+    trends = trends_from_response(FIXTURE, TrendRequest(geo="US", category="17", sort="search-volume"))
+    assert [(t.title, t.ranking) for t in trends] == [("champions league draw", 1), ("nba free agency", 2)]
+
+    active = trends_from_response(FIXTURE, TrendRequest(geo="US", status="active", sort="title"))
+    assert [t.title for t in active] == ["café münchen", "champions league draw", "heat advisory", "nba free agency"]
+
+
+def test_unchunked_response_and_errors():
+    payload = json.dumps([None, [["topic", None, "US", [1], None, None, 1500, None, 20, [], []]]])
+    body = ")]}'\n\n" + json.dumps([["wrb.fr", "i0OFE", payload, None, None, None, "generic"]])
+    trends = trends_from_response(body)
+    assert trends[0].search_volume == "1,500+"
+
+    with pytest.raises(RpcError, match="returned an error"):
+        trends_from_response(")]}'\n" + json.dumps([["wrb.fr", "i0OFE", None, None, None, [3], "generic"]]))
+    with pytest.raises(RpcError, match="no result"):
+        trends_from_response(")]}'\n" + json.dumps([["wrb.fr", "other", "[]"]]))
+
+
+def test_build_rpc_request():
+    url, form = build_rpc_request(TrendRequest(geo="JP", hl="ja", hours=4))
+    assert is_rpc_url(url)
+    assert parse_qs(urlparse(url).query)["rpcids"] == ["i0OFE"]
+    call = json.loads(form["f.req"])[0][0]
+    assert call[0] == "i0OFE"
+    assert json.loads(call[1]) == [None, None, "JP", 0, "ja", 4, 1]
+
+
+def test_format_volume():
+    assert format_volume(100) == "100+"
+    assert format_volume(20000) == "20K+"
+    assert format_volume(1000000) == "1M+"
+
+
+class PerformanceLogDriver:
+    """Replays DevTools network events the way ChromeDriver's performance log reports them."""
+
+    def __init__(self, batches, bodies):
+        self.batches = list(batches)
+        self.bodies = bodies
+
+    def get_log(self, name):
+        assert name == "performance"
+        events = self.batches.pop(0) if self.batches else []
+        return [{"message": json.dumps({"message": {"method": m, "params": p}})} for m, p in events]
+
+    def execute_cdp_cmd(self, command, args):
+        assert command == "Network.getResponseBody"
+        return {"body": self.bodies[args["requestId"]], "base64Encoded": False}
+
+
+def test_captures_rpc_response_from_performance_log():
+    url, _ = build_rpc_request(TrendRequest(geo="US"))
+    driver = PerformanceLogDriver(
+        [
+            [("Network.responseReceived", {"requestId": "1", "response": {"url": "https://trends.google.com/trending"}})],
+            [("Network.responseReceived", {"requestId": "2", "response": {"url": url}})],
+            [("Network.loadingFinished", {"requestId": "1"}), ("Network.loadingFinished", {"requestId": "2"})],
+        ],
+        {"2": FIXTURE},
+    )
+    bodies = capture_rpc_bodies(driver, max_wait=5, sleep=lambda s: None)
+    assert bodies == [FIXTURE]
+    assert len(trends_from_response(bodies[0])) == 5
@@ -0,0 +1,60 @@
+import random
+
+from src.backend.cache import HIT, TrendsCache
+from src.backend.models import TrendRequest
+from src.backend.scheduler import PrefetchScheduler, default_prefetch_keys
+
+
+def make_loader(make_response, titles):
+    def loader(params):
+        return make_response(titles[:1], geo=params.geo, hl=params.hl)
+    return loader
+
+
+def make_scheduler(loader, keys, clock):
+    cache = TrendsCache(loader, ttl=60, stale_ttl=0, clock=clock)
+    scheduler = PrefetchScheduler(cache, keys, interval=100, min_interval=10, max_interval=1000,
+                                  jitter=0.1, clock=clock, rng=random.Random(0))
+    return cache, scheduler
+
+
+def test_first_runs_are_staggered(clock, make_response):
+    start = clock.now
+    keys = [TrendRequest(geo=g) for g in ("US", "GB", "JP", "DE")]
+    _, scheduler = make_scheduler(make_loader(make_response, ["a"]), keys, clock)
+    assert [s.next_run - start for s in scheduler.states] == [0, 25, 50, 75]
+    assert scheduler.run_pending() == 1
+    clock.now += 50
+    assert scheduler.run_pending() == 2
+
+
+def test_prefetched_keys_are_cache_hits(clock, make_response):
+    params = TrendRequest(geo="US")
+    cache, scheduler = make_scheduler(make_loader(make_response, ["a"]), [params], clock)
+    scheduler.run_pending()
+    clock.now += 150
+    assert cache.get(params)[1] == HIT
+
+
+def test_interval_adapts_to_changes_and_demand(clock, make_response):
+    titles = ["a"]
+    params = TrendRequest(geo="US")
+    cache, scheduler = make_scheduler(make_loader(make_response, titles), [params], clock)
+    state = scheduler.states[0]
+
+    scheduler.refresh(state)
+    scheduler.refresh(state)
+    assert state.interval > 100  # unchanged and unrequested: back off
+
+    previous = state.interval
+    titles[0] = "b"
+    cache.get_cached(params)
+    cache.get_cached(params)
+    scheduler.refresh(state)
+    assert state.interval < previous
+    assert state.changes == 1
+
+
+def test_prefetch_keys_ignore_spaces_and_empty_items():
+    keys = default_prefetch_keys(" US, GB,,", "en, ja ")
+    assert [(k.geo, k.hl) for k in keys] == [("US", "en"), ("US", "ja"), ("GB", "en"), ("GB", "ja")]
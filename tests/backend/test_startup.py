@@ -0,0 +1,47 @@
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+from src.backend import cli, scraper
+
+ROOT = Path(__file__).resolve().parents[2]
+
+
+def loaded_modules(code, **env):
+    """Top-level packages a fresh interpreter has imported after running ``code``."""
+    script = f"{code}\nimport json, sys\nprint(json.dumps(sorted({{m.split('.')[0] for m in sys.modules}})))"
+    result = subprocess.run(
+        [sys.executable, "-c", script], cwd=ROOT, check=True, capture_output=True, text=True,
+        env={**os.environ, **env},
+    )
+    return set(json.loads(result.stdout.splitlines()[-1]))
+
+
+def test_cli_import_leaves_heavy_dependencies_for_first_use():
+    modules = loaded_modules("import src.backend.cli")
+    assert not modules & {"selenium", "webdriver_manager", "fastapi", "starlette", "uvicorn", "bs4", "soupsieve", "httpx"}
+
+
+def test_export_imports_optional_encoders_on_first_use():
+    modules = loaded_modules("from src.backend import export\nprint(export.HAS_PYARROW, export.HAS_BROTLI, export.HAS_ZSTD)")
+    assert not modules & {"pyarrow", "brotli", "zstandard"}
+
+
+def test_no_browser_never_imports_selenium():
+    code = "from src.backend import scraper\nprint(scraper.USE_SELENIUM)"
+    result = subprocess.run(
+        [sys.executable, "-c", code], cwd=ROOT, check=True, capture_output=True, text=True,
+        env={**os.environ, "USE_SELENIUM": "false"},
+    )
+    assert result.stdout.strip() == "False"
+    assert "selenium" not in loaded_modules(code, USE_SELENIUM="false")
+
+
+def test_disable_browser(monkeypatch):
+    monkeypatch.setenv("USE_SELENIUM", "true")
+    monkeypatch.setattr(scraper, "USE_SELENIUM", True)
+    cli.disable_browser()
+    assert scraper.USE_SELENIUM is False
+    assert os.environ["USE_SELENIUM"] == "false"